@@ -0,0 +1,89 @@
+"""Benchmark of the bulk ASCII RAW parser against the kupicelib line by line reader.
+
+The PI_Filter.raw test file, an AC analysis with complex values, is converted to the
+ASCII format written with the ``-ascii`` switch and scaled up to the requested number of
+points by repeating its points. The file is then read with both readers. Example::
+
+    python raw_read_ascii_benchmark.py --points 1000000
+"""
+from __future__ import annotations
+
+import argparse
+import re
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+from kupicelib.raw.raw_read import RawRead as ReferenceRawRead
+
+from kuPyLTSpice.raw.raw_read import RawRead, find_binary_start
+
+TESTFILES = Path(__file__).parent / "testfiles"
+
+
+def format_value(value: complex | float) -> str:
+    if np.iscomplexobj(value):
+        return f"{value.real:.15e},{value.imag:.15e}"
+    return f"{value:.15e}"
+
+
+def make_scaled_ascii_raw(source: Path, destination: Path, points: int) -> None:
+    """Writes the source RAW file in ASCII format, with its points repeated until the
+    requested number of points is reached."""
+    source_raw = RawRead(source, verbose=False)
+    content = source.read_bytes()
+    header = content[: find_binary_start(source, source_raw.encoding)].decode(
+        source_raw.encoding
+    )
+    header = header.replace("Binary:", "Values:")
+    header = re.sub(r"No. Points:\s*\d+", f"No. Points: {points}", header)
+    traces = [source_raw.get_trace(name).data for name in source_raw.get_trace_names()]
+    # Everything after the point index is the same on each repetition
+    bodies = [
+        "".join(f"\t{format_value(data[point])}\n" for data in traces)
+        for point in range(source_raw.nPoints)
+    ]
+    with open(destination, "w", encoding="utf_8") as raw_file:
+        raw_file.write(header)
+        for start in range(0, points, 100_000):
+            raw_file.write(
+                "".join(
+                    f"{point}{bodies[point % len(bodies)]}"
+                    for point in range(start, min(start + 100_000, points))
+                )
+            )
+
+
+def time_reader(reader: type[ReferenceRawRead], raw_file: Path) -> float:
+    start = time.perf_counter()
+    raw = reader(raw_file, verbose=False)
+    raw.get_wave("V(n002)")
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--points", type=int, default=1_000_000)
+    parser.add_argument(
+        "--skip-reference",
+        action="store_true",
+        help="Don't time the kupicelib reader, which is very slow on large files",
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        raw_file = Path(tmp) / "PI_Filter_ascii.raw"
+        make_scaled_ascii_raw(TESTFILES / "PI_Filter.raw", raw_file, args.points)
+        size_mb = raw_file.stat().st_size / 1e6
+        print(f"ASCII file with {args.points} points ({size_mb:.0f} MB)")
+        new_time = time_reader(RawRead, raw_file)
+        print(f"Bulk parser:        {new_time:8.3f} s")
+        if not args.skip_reference:
+            reference_time = time_reader(ReferenceRawRead, raw_file)
+            print(f"Line by line reader: {reference_time:8.3f} s")
+            print(f"Speed-up: {reference_time / new_time:.1f}x")
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
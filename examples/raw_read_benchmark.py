@@ -0,0 +1,77 @@
+"""Benchmark of the single pass RAW decoder against the kupicelib point by point reader.
+
+The PI_Filter.raw test file is scaled up to the requested number of points by repeating
+its binary records, and then read with both readers. Example::
+
+    python raw_read_benchmark.py --points 10000000
+"""
+from __future__ import annotations
+
+import argparse
+import re
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+from kupicelib.raw.raw_read import RawRead as ReferenceRawRead
+
+from kuPyLTSpice.raw.raw_read import RawRead, find_binary_start
+
+TESTFILES = Path(__file__).parent / "testfiles"
+
+
+def make_scaled_raw(source: Path, destination: Path, points: int) -> None:
+    """Writes a copy of the source RAW file with the binary records repeated until the
+    requested number of points is reached."""
+    header_raw = RawRead(source, headeronly=True)
+    binary_start = find_binary_start(source, header_raw.encoding)
+    content = source.read_bytes()
+    header = content[:binary_start].decode(header_raw.encoding)
+    header = re.sub(r"No. Points:\s*\d+", f"No. Points: {points:12}", header)
+    records = np.frombuffer(content[binary_start:], dtype=np.uint8).reshape(
+        header_raw.nPoints, -1
+    )
+    chunk_points = 100_000
+    chunk = np.resize(records, (chunk_points, records.shape[1]))
+    with open(destination, "wb") as raw_file:
+        raw_file.write(header.encode(header_raw.encoding))
+        written = 0
+        while written < points:
+            count = min(chunk_points, points - written)
+            raw_file.write(chunk[:count].tobytes())
+            written += count
+
+
+def time_reader(reader: type[ReferenceRawRead], raw_file: Path) -> float:
+    start = time.perf_counter()
+    raw = reader(raw_file, verbose=False)
+    raw.get_wave("V(n002)")
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--points", type=int, default=10_000_000)
+    parser.add_argument(
+        "--skip-reference",
+        action="store_true",
+        help="Don't time the kupicelib reader, which is very slow on large files",
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        raw_file = Path(tmp) / "PI_Filter_scaled.raw"
+        make_scaled_raw(TESTFILES / "PI_Filter.raw", raw_file, args.points)
+        size_mb = raw_file.stat().st_size / 1e6
+        print(f"File with {args.points} points ({size_mb:.0f} MB)")
+        new_time = time_reader(RawRead, raw_file)
+        print(f"Single pass reader: {new_time:8.3f} s")
+        if not args.skip_reference:
+            reference_time = time_reader(ReferenceRawRead, raw_file)
+            print(f"Point by point reader: {reference_time:8.3f} s")
+            print(f"Speed-up: {reference_time / new_time:.1f}x")
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
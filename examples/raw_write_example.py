@@ -1,14 +1,17 @@
 from __future__ import annotations
 
+from collections.abc import Iterator
 from pathlib import Path
-from typing import TYPE_CHECKING, cast
+from typing import TYPE_CHECKING
 
 import numpy as np
 
+from kuPyLTSpice.raw.raw_write import RawStreamWrite
+
 if TYPE_CHECKING:
-    from kupicelib.raw.raw_read import RawRead as RawReadType
-    from kupicelib.raw.raw_write import RawWrite as RawWriteType
-    from kupicelib.raw.raw_write import Trace as TraceType
+    from kuPyLTSpice.raw.raw_read import RawRead as RawReadType
+    from kuPyLTSpice.raw.raw_write import RawWrite as RawWriteType
+    from kuPyLTSpice.raw.raw_write import Trace as TraceType
 else:  # pragma: no cover
     from kuPyLTSpice import RawRead as RawReadType
     from kuPyLTSpice import RawWrite as RawWriteType
@@ -23,9 +26,9 @@ TESTFILES = Path(__file__).parent / "testfiles"
 
 def _add_basic_traces(writer: RawWriteType) -> tuple[TraceType, TraceType, TraceType]:
     time_values = np.arange(0.0, 3e-3, 997e-11, dtype=float)
-    time_trace = Trace("time", time_values.tolist())
-    sine_trace = Trace("N001", np.sin(2 * np.pi * time_values * 10000).tolist())
-    cosine_trace = Trace("N002", np.cos(2 * np.pi * time_values * 9970).tolist())
+    time_trace = Trace("time", time_values)
+    sine_trace = Trace("N001", np.sin(2 * np.pi * time_values * 10000))
+    cosine_trace = Trace("N002", np.cos(2 * np.pi * time_values * 9970))
     writer.add_trace(time_trace)
     writer.add_trace(sine_trace)
     writer.add_trace(cosine_trace)
@@ -52,31 +55,36 @@ def _read_trace_metadata(trace_path: Path) -> tuple[str, int]:
                 break
     return raw_type, wave_size
 
-def _iter_trace_data(trace_path: Path, rows: int) -> list[tuple[float, float]]:
+def _iter_trace_chunks(
+    trace_path: Path, rows: int, chunk_rows: int = 100_000
+) -> Iterator[np.ndarray]:
     with trace_path.open(encoding="utf-8") as handle:
         for line in handle:
             if line.startswith("Time,Ampl"):
                 break
-        data = np.genfromtxt(handle, dtype="float,float", delimiter=",", max_rows=rows)
-    result: list[tuple[float, float]] = []
-    for row in data.tolist():
-        pair = cast(tuple[float, float], tuple(map(float, row)))
-        result.append(pair)
-    return result
+        while rows > 0:
+            data = np.loadtxt(handle, delimiter=",", max_rows=min(rows, chunk_rows), ndmin=2)
+            if len(data) == 0:
+                break
+            rows -= len(data)
+            yield data
 
 
 def test_trc2raw() -> None:
-    """Convert a Teledyne-Lecroy trace file to an LTSpice raw file."""
+    """Convert a Teledyne-Lecroy trace file to an LTSpice raw file.
+
+    The file is converted in chunks, so that only a chunk of points is in memory.
+    """
     trace_file = TESTFILES / "Current_Lock_Front_Right_8V.trc"
     raw_type, wave_size = _read_trace_metadata(trace_file)
     if raw_type != "transient" or wave_size <= 0:
         return
 
-    data = list(_iter_trace_data(trace_file, wave_size))
-    writer = RawWrite()
-    writer.add_trace(Trace("time", [row[0] for row in data]))
-    writer.add_trace(Trace("Ampl", [row[1] for row in data]))
-    writer.save(TESTFILES / "teste_trc.raw")
+    with RawStreamWrite(TESTFILES / "teste_trc.raw") as writer:
+        writer.add_trace("time")
+        writer.add_trace("Ampl")
+        for data in _iter_trace_chunks(trace_file, wave_size):
+            writer.append(data[:, 0], data[:, 1])
 
 
 def test_axis_sync() -> None:
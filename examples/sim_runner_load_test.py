@@ -0,0 +1,122 @@
+"""Load test of SimRunner with a fake simulator, which replays the canned files of the
+testfiles directory instead of running LTspice, so that it runs on any machine.
+
+The jobs are submitted one after the other, as a script would do, and the time spent in
+each stage of a job is reported:
+
+- submit: the call to SimRunner.run(), which waits for a free slot, or to
+  SimRunner.submit() with --submit, which queues the job
+- queue: from the submission to the start of the simulation thread
+- launch: from the start of the thread to the call of the simulator
+- simulate: the simulator latency
+- finish: from the end of the simulation to the end of the thread (callback included)
+- drain: from the end of the last job to the return of wait_completion()
+
+Example::
+
+    python sim_runner_load_test.py --jobs 10000 --parallel 8 --latency 0.01
+"""
+from __future__ import annotations
+
+import argparse
+import logging
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from kuPyLTSpice.sim.fake_simulator import FakeSimulator
+from kuPyLTSpice.sim.sim_runner import SimRunner
+
+TESTFILES = Path(__file__).parent / "testfiles"
+
+
+def print_stage(name: str, durations: list[float]) -> None:
+    values = np.array(durations) * 1e3
+    if values.size == 0:
+        return
+    print(
+        f"{name:>9}: mean {values.mean():9.3f} ms  p50 {np.percentile(values, 50):9.3f} ms  "
+        f"p95 {np.percentile(values, 95):9.3f} ms  max {values.max():9.3f} ms"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--jobs", type=int, default=10_000)
+    parser.add_argument("--parallel", type=int, default=4, help="Parallel simulations")
+    parser.add_argument("--latency", type=float, default=0.0, help="Minimum latency (s)")
+    parser.add_argument("--max-latency", type=float, default=None, help="Maximum latency (s)")
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument(
+        "--output-points", type=int, default=None, help="Points of a synthetic RAW file"
+    )
+    parser.add_argument("--raw", type=Path, default=TESTFILES / "TRAN_1.raw")
+    parser.add_argument("--log", type=Path, default=TESTFILES / "TRAN_1.log")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--submit", action="store_true", help="Queue the jobs with submit()")
+    parser.add_argument("--verbose", action="store_true", help="Show the simulation logs")
+    args = parser.parse_args()
+    if not args.verbose:
+        logging.getLogger("kupicelib").setLevel(logging.CRITICAL)
+
+    latency = args.latency if args.max_latency is None else (args.latency, args.max_latency)
+    simulator = FakeSimulator.create(
+        args.raw,
+        args.log,
+        latency=latency,
+        failure_rate=args.failure_rate,
+        output_points=args.output_points,
+        seed=args.seed,
+    )
+    with tempfile.TemporaryDirectory() as tmp:
+        netlist = Path(tmp) / "load.net"
+        netlist.write_text("* Load test\n.tran 1m\n.end\n")
+        runner = SimRunner(
+            simulator=simulator, parallel_sims=args.parallel, output_folder=f"{tmp}/runs"
+        )
+        submitted = []
+        start = time.time()
+        for _ in range(args.jobs):
+            submit_time = time.time()
+            task = runner.submit(netlist) if args.submit else runner.run(netlist)
+            submitted.append((submit_time, time.time(), task))
+        all_ok = runner.wait_completion()
+        end = time.time()
+
+        runs = {run.netlist_file.name: run for run in simulator.records}
+        stages: dict[str, list[float]] = {
+            name: [] for name in ("submit", "queue", "launch", "simulate", "finish")
+        }
+        for submit_time, returned_time, task in submitted:
+            stages["submit"].append(returned_time - submit_time)
+            if task is None or task.start_time is None:
+                continue
+            stages["queue"].append(task.start_time - submit_time)
+            run = runs.get(task.netlist_file.name)
+            if run is not None and task.stop_time is not None:
+                stages["launch"].append(run.start - task.start_time)
+                stages["simulate"].append(run.end - run.start)
+                stages["finish"].append(task.stop_time - run.end)
+        last_stop = max(
+            (task.stop_time for _, _, task in submitted if task and task.stop_time),
+            default=end,
+        )
+
+        elapsed = end - start
+        rejected = sum(task is None for _, _, task in submitted)
+        mode = "submit" if args.submit else "run"
+        print(f"{args.jobs} jobs with {mode}(), {args.parallel} parallel, latency {latency} s")
+        print(
+            f"{elapsed:.2f} s, {args.jobs / elapsed:.1f} jobs/s "
+            f"({runner.okSim} ok, {runner.failSim} failed, {rejected} not started, "
+            f"all ok: {all_ok})"
+        )
+        for name, durations in stages.items():
+            print_stage(name, durations)
+        print(f"{'drain':>9}: {(end - last_stop) * 1e3:9.3f} ms")
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
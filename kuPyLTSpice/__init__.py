@@ -10,10 +10,9 @@ from kupicelib.editor.spice_editor import (
     SpiceEditor as _SpiceEditor,
 )
 from kupicelib.log.ltsteps import LTSpiceLogReader as _LTSpiceLogReader
-from kupicelib.raw.raw_read import RawRead as _RawRead
-from kupicelib.raw.raw_write import RawWrite as _RawWrite
-from kupicelib.raw.raw_write import Trace as _Trace
 
+from kuPyLTSpice.raw.raw_read import RawRead as _RawRead
+from kuPyLTSpice.raw.raw_write import RawWrite, Trace
 from kuPyLTSpice.sim.ltspice_simulator import LTspice
 from kuPyLTSpice.sim.sim_batch import SimCommander
 from kuPyLTSpice.sim.sim_runner import SimRunner
@@ -23,8 +22,6 @@ SpiceCircuit = _SpiceCircuit
 SpiceEditor = _SpiceEditor
 LTSpiceLogReader = _LTSpiceLogReader
 RawRead = _RawRead
-RawWrite = _RawWrite
-Trace = _Trace
 
 __all__ = [
     "AscEditor",
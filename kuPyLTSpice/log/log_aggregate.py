@@ -0,0 +1,277 @@
+#!/usr/bin/env python
+
+# -------------------------------------------------------------------------------
+#    ____        _   _____ ____        _
+#   |  _ \ _   _| | |_   _/ ___| _ __ (_) ___ ___
+#   | |_) | | | | |   | | \___ \| '_ \| |/ __/ _ \
+#   |  __/| |_| | |___| |  ___) | |_) | | (_|  __/
+#   |_|    \__, |_____|_| |____/| .__/|_|\___\___|
+#          |___/                |_|
+#
+# Name:        log_aggregate.py
+# Purpose:     Merge the log files of many simulation runs into one dataset
+#
+# Licence:     refer to the LICENSE file
+# -------------------------------------------------------------------------------
+"""Reads the log files of a batch of simulations, for example the runs of a Monte-Carlo
+analysis, and merges their steps and measurements into a single
+:py:class:`kuPyLTSpice.log.logfile_data.LogfileData`.
+
+The files are parsed in a pool of processes. A ``run_id`` step column gives, for each
+row, the position of its log file in :py:attr:`LogAggregator.files`. Step parameters
+and measurements that are missing from a log are masked in its rows.
+
+The parsed files are kept in a cache, with the size and the modification time of each
+file, so that reading the directory again only parses the new and the modified logs.
+The cache can be saved to a file, to be reused by another session.
+
+Example::
+
+    from kuPyLTSpice.log.log_aggregate import LogAggregator
+
+    aggregator = LogAggregator(cache_file="./temp/logs.cache")
+    data = aggregator.read("./temp")  # All the .log files of the directory
+    vout = data.dataset["vout"]
+    worst = aggregator.files[data.stepset["run_id"][np.nanargmax(vout.values)]]
+    aggregator.save()
+"""
+from __future__ import annotations
+
+import dataclasses
+import glob
+import logging
+import os
+import pickle
+from collections.abc import Iterable
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+from kupicelib.utils.detect_encoding import EncodingDetectError
+
+from kuPyLTSpice.log.logfile_data import LogColumn, LogfileData
+from kuPyLTSpice.log.ltsteps import LTSpiceLogReader
+
+__all__ = ["LogAggregator", "aggregate_logs", "expand_log_files"]
+
+_logger = logging.getLogger("kupicelib.LTSteps")
+
+CACHE_VERSION = 1
+
+
+def expand_log_files(log_files: str | Path | Iterable[str | Path]) -> list[Path]:
+    """Converts a directory, a glob pattern or a list of files into a list of paths. A
+    directory gives its .log files. Directories and patterns are expanded in sorted order.
+
+    :param log_files: A directory, a glob pattern like "./temp/*.log", or a list of files
+    :type log_files: str | Path | Iterable[str | Path]
+    :return: The list of files
+    :rtype: list[Path]
+    """
+    if isinstance(log_files, str | Path):
+        if Path(log_files).is_dir():
+            log_files = Path(log_files) / "*.log"
+        return [Path(name) for name in sorted(glob.glob(str(log_files)))]
+    return [Path(name) for name in log_files]
+
+
+@dataclasses.dataclass
+class _ParsedLog:
+    """The columns read from a log file, as kept in the cache."""
+
+    rows: int
+    stepset: dict[str, LogColumn]
+    dataset: dict[str, LogColumn]
+
+
+def _parse_log(log_file: Path, encoding: str | None) -> _ParsedLog | None:
+    """Reads a single log file. This is the work done in the pool."""
+    try:
+        log = LTSpiceLogReader(log_file, encoding=encoding)
+    except FileNotFoundError:
+        _logger.warning("Log file not found: %s", log_file)
+        return None
+    except EncodingDetectError:
+        _logger.warning("Log file %s couldn't be read", log_file)
+        return None
+    columns = [*log.stepset.values(), *log.dataset.values()]
+    return _ParsedLog(
+        max((len(column) for column in columns), default=0), log.stepset, dict(log.dataset)
+    )
+
+
+def _merge(parts: list[tuple[int, _ParsedLog]], names: Iterable[str], step: bool):
+    """Joins the columns of the logs, masking the rows of the logs without them."""
+    merged = {}
+    for name in names:
+        columns = []
+        for _, parsed in parts:
+            column = (parsed.stepset if step else parsed.dataset).get(name)
+            if column is None:
+                column = LogColumn.from_array(np.zeros(parsed.rows), np.ones(parsed.rows, bool))
+            elif len(column) < parsed.rows:
+                missing = parsed.rows - len(column)
+                padding = LogColumn.from_array(np.zeros(missing), np.ones(missing, bool))
+                column = LogColumn.concatenate([column, padding])
+            columns.append(column)
+        merged[name] = LogColumn.concatenate(columns)
+    return merged
+
+
+class LogAggregator:
+    """Reads many log files into one dataset, keeping the parsed files in a cache.
+
+    :param cache_file: File where :py:meth:`save` writes the cache, and from which it is
+        loaded if it exists. The cache is kept in memory only if not given.
+    :type cache_file: str | Path, optional
+    :param max_workers: Maximum number of processes. Defaults to the number of CPUs
+    :type max_workers: int, optional
+    :param use_processes: Parse the files in a process pool. With False, a thread pool is
+        used, which only helps when reading the files is slower than parsing them.
+    :type use_processes: bool, optional
+    :param run_column: Name of the step column with the position of the log file of
+        each row
+    :type run_column: str, optional
+    """
+
+    def __init__(
+        self,
+        cache_file: str | Path | None = None,
+        max_workers: int | None = None,
+        use_processes: bool = True,
+        run_column: str = "run_id",
+    ) -> None:
+        self.cache_file = None if cache_file is None else Path(cache_file)
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.use_processes = use_processes
+        self.run_column = run_column
+        self.files: list[Path] = []
+        """The log files of the last read, in the order of the run ids"""
+        self.parsed_count = 0
+        """Number of files parsed by the last read, the others coming from the cache"""
+        self._cache: dict[str, tuple[int, int, _ParsedLog | None]] = {}
+        if self.cache_file is not None and self.cache_file.exists():
+            self._load()
+
+    def _load(self) -> None:
+        assert self.cache_file is not None
+        try:
+            with open(self.cache_file, "rb") as fin:
+                version, cache = pickle.load(fin)
+        except (OSError, pickle.UnpicklingError, EOFError, ValueError) as err:
+            _logger.warning("Ignoring invalid log cache '%s': %s", self.cache_file, err)
+            return
+        if version == CACHE_VERSION:
+            self._cache = cache
+
+    def save(self) -> None:
+        """Writes the cache to the cache file.
+
+        :raises ValueError: If no cache file was given
+        """
+        if self.cache_file is None:
+            raise ValueError("No cache file was given")
+        tmp_file = self.cache_file.with_name(f"{self.cache_file.name}.{os.getpid()}.tmp")
+        try:
+            with open(tmp_file, "wb") as fout:
+                pickle.dump((CACHE_VERSION, self._cache), fout, pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_file, self.cache_file)
+        finally:
+            tmp_file.unlink(missing_ok=True)
+
+    def _parse(self, files: list[Path], encoding: str | None) -> list[_ParsedLog | None]:
+        """Parses the files that aren't in the cache, and returns all the parsed files."""
+        keys = []
+        todo = []
+        for log_file in files:
+            path = os.path.abspath(log_file)
+            try:
+                stat = os.stat(path)
+                key = (path, stat.st_size, stat.st_mtime_ns)
+            except FileNotFoundError:
+                key = (path, -1, -1)
+            keys.append(key)
+            entry = self._cache.get(key[0])
+            if entry is None or entry[:2] != key[1:]:
+                todo.append(log_file)
+        self.parsed_count = len(todo)
+        _logger.info("Parsing %d of %d log files", len(todo), len(files))
+        if len(todo) > 1 and self.max_workers > 1:
+            executor: Executor
+            if self.use_processes:
+                executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            else:
+                executor = ThreadPoolExecutor(max_workers=self.max_workers)
+            chunksize = max(1, len(todo) // (4 * self.max_workers))
+            with executor:
+                results = list(
+                    executor.map(_parse_log, todo, [encoding] * len(todo), chunksize=chunksize)
+                )
+        else:
+            results = [_parse_log(log_file, encoding) for log_file in todo]
+        parsed = dict(zip(map(str, todo), results, strict=True))
+        for log_file, key in zip(files, keys, strict=True):
+            if str(log_file) in parsed:
+                self._cache[key[0]] = (key[1], key[2], parsed[str(log_file)])
+        return [self._cache[key[0]][2] for key in keys]
+
+    def read(
+        self, log_files: str | Path | Iterable[str | Path], encoding: str | None = None
+    ) -> LogfileData:
+        """Reads the log files and merges them.
+
+        :param log_files: A directory, a glob pattern or a list of log files
+        :type log_files: str | Path | Iterable[str | Path]
+        :param encoding: Encoding of the files. Detected for each file if not given.
+        :type encoding: str, optional
+        :raises FileNotFoundError: If no files are found
+        :return: The steps and the measurements of all the files. The run id step column
+            comes first.
+        :rtype: LogfileData
+        """
+        self.files = expand_log_files(log_files)
+        if not self.files:
+            raise FileNotFoundError(f"No log files found in {log_files}")
+        parts = [
+            (run_id, parsed)
+            for run_id, parsed in enumerate(self._parse(self.files, encoding))
+            if parsed is not None and parsed.rows > 0
+        ]
+        data = LogfileData()
+        if not parts:
+            return data
+        step_names = dict.fromkeys(name for _, parsed in parts for name in parsed.stepset)
+        measure_names = dict.fromkeys(name for _, parsed in parts for name in parsed.dataset)
+        run_ids = np.concatenate([np.full(parsed.rows, run_id) for run_id, parsed in parts])
+        data.stepset = {
+            self.run_column: LogColumn.from_array(run_ids),
+            **_merge(parts, step_names, step=True),
+        }
+        data.dataset.update(_merge(parts, measure_names, step=False))
+        data.step_count = len(run_ids)
+        data.measure_count = len(data.dataset)
+        return data
+
+
+def aggregate_logs(
+    log_files: str | Path | Iterable[str | Path],
+    encoding: str | None = None,
+    max_workers: int | None = None,
+    use_processes: bool = True,
+) -> LogfileData:
+    """Reads and merges log files in a process pool, without keeping a cache. See
+    :py:class:`LogAggregator`.
+
+    :param log_files: A directory, a glob pattern or a list of log files
+    :type log_files: str | Path | Iterable[str | Path]
+    :param encoding: Encoding of the files. Detected for each file if not given.
+    :type encoding: str, optional
+    :param max_workers: Maximum number of processes. Defaults to the number of CPUs
+    :type max_workers: int, optional
+    :param use_processes: Use a process pool instead of a thread pool
+    :type use_processes: bool, optional
+    :return: The steps and the measurements of all the files, with a run_id step column
+    :rtype: LogfileData
+    """
+    aggregator = LogAggregator(max_workers=max_workers, use_processes=use_processes)
+    return aggregator.read(log_files, encoding)
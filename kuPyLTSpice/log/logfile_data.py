@@ -8,13 +8,488 @@
 #
 # Licence:     refer to the LICENSE file
 # -------------------------------------------------------------------------------
+"""Columnar storage of the step parameters and of the measurements of a log file.
+
+Each step parameter and each measurement is kept in a :py:class:`LogColumn`, a NumPy
+array that grows as values are appended. Integers are stored as ``int64``, real values
+as ``float64`` and the complex values of AC measurements as ``complex128``, the array
+being promoted as needed. Values that are not numbers, such as the text of a failed
+measurement, are *masked*: they are kept aside and ignored by the statistics.
+
+A column behaves as the list it replaces, so that code indexing ``log.dataset["vout"]``
+keeps working, while :py:attr:`LogColumn.values` and :py:attr:`LogColumn.mask` give
+the arrays for vectorized processing.
+"""
+from __future__ import annotations
 
 import logging
+import math
+from collections import OrderedDict
+from collections.abc import Iterable, Iterator, Sequence
+from typing import Any
 
-from kupicelib.log.logfile_data import LogfileData, LTComplex
+import numpy as np
+from kupicelib.log.logfile_data import LogfileData as _LogfileData
+from kupicelib.log.logfile_data import LTComplex, NumericType, ValueType, try_convert_value
 
 _logger = logging.getLogger("kupicelib.LTSteps")
-_logger.info("This module is deprecated. Use kupicelib.log.logfile_data instead")
 
-# Re-export the classes
-__all__ = ["LTComplex", "LogfileData"]
+__all__ = ["LTComplex", "LogColumn", "LogfileData"]
+
+# Promotion order of the column types
+_DTYPES = (np.dtype(np.int64), np.dtype(np.float64), np.dtype(np.complex128))
+_EMPTY_VALUES = np.zeros(0, dtype=_DTYPES[0])
+_EMPTY_MASK = np.zeros(0, dtype=bool)
+
+
+def _dtype_of(value: Any) -> np.dtype | None:
+    """Returns the array type needed for a value, or None if it isn't a number."""
+    if isinstance(value, (bool, np.bool_)):
+        return _DTYPES[0]
+    if isinstance(value, (int, np.integer)):
+        return _DTYPES[0] if -(2**63) <= value < 2**63 else _DTYPES[1]
+    if isinstance(value, (float, np.floating)):
+        return _DTYPES[1]
+    if isinstance(value, (complex, np.complexfloating)):
+        return _DTYPES[2]
+    return None
+
+
+_COLUMN_DTYPES: dict[np.dtype, np.dtype | None] = {}
+
+
+def _column_dtype(dtype: np.dtype) -> np.dtype | None:
+    """Returns the column type able to hold an array, or None if there is none."""
+    if dtype not in _COLUMN_DTYPES:
+        _COLUMN_DTYPES[dtype] = next(
+            (column_type for column_type in _DTYPES if np.can_cast(dtype, column_type)), None
+        )
+    return _COLUMN_DTYPES[dtype]
+
+
+class LogColumn(Sequence):
+    """The values of a step parameter or of a measurement.
+
+    The appended values are buffered, and converted together when the column is read.
+    The complex values read from a log are returned as :py:class:`LTComplex`, formatted
+    as the first one appended (polar in dB, polar or cartesian), with the 6 significant
+    digits written by LTSpice.
+
+    :param values: Initial values
+    :type values: Iterable, optional
+    """
+
+    def __init__(self, values: Iterable[Any] = ()) -> None:
+        self._values = _EMPTY_VALUES  # Replaced, never written, by the first flush
+        self._mask = _EMPTY_MASK
+        self._size = 0
+        self._pending: list[Any] = list(values)
+        """Values appended since the last read"""
+        self._objects: dict[int, Any] = {}
+        """Masked values, by position"""
+        self._complex_format: str | None = None
+
+    @classmethod
+    def from_array(cls, values: np.ndarray, mask: np.ndarray | None = None) -> LogColumn:
+        """Creates a column from an array of numbers. Masked values read as None.
+
+        :param values: Values of the column
+        :type values: numpy.ndarray
+        :param mask: True where the value is missing
+        :type mask: numpy.ndarray, optional
+        :return: The column
+        :rtype: LogColumn
+        """
+        values = np.asarray(values)
+        dtype = _column_dtype(values.dtype)
+        if dtype is None:
+            raise TypeError(f"Unsupported array type {values.dtype}")
+        column = cls()
+        column._values = values.astype(dtype)
+        column._mask = np.zeros(len(values), dtype=bool)
+        column._size = len(values)
+        if mask is not None and np.any(mask):
+            column._promote(_DTYPES[1])
+            column._mask[:] = mask
+            column._values[column._mask] = np.nan
+            column._objects = dict.fromkeys(np.flatnonzero(column._mask).tolist())
+        return column
+
+    @classmethod
+    def concatenate(cls, columns: Iterable[LogColumn]) -> LogColumn:
+        """Joins columns end to end, keeping their masked values.
+
+        :param columns: The columns to join
+        :type columns: Iterable[LogColumn]
+        :return: The joined column
+        :rtype: LogColumn
+        """
+        values: list[Any] = []
+        objects: dict[int, Any] = {}
+        complex_format = None
+        for column in columns:
+            column.flush()
+            for index, value in column._objects.items():
+                objects[len(values) + index] = value
+            values.extend(column._values[: column._size].tolist())
+            complex_format = complex_format or column._complex_format
+        joined = cls()
+        joined.__setstate__((values, objects, complex_format))
+        return joined
+
+    def __getstate__(self) -> tuple[list[Any], dict[int, Any], str | None]:
+        # Lists are much faster to pickle than many small arrays
+        self.flush()
+        return self._values[: self._size].tolist(), self._objects, self._complex_format
+
+    def __setstate__(self, state: tuple[list[Any], dict[int, Any], str | None]) -> None:
+        values, self._objects, self._complex_format = state
+        self._values = np.array(values) if values else np.zeros(0, dtype=_DTYPES[0])
+        self._size = len(values)
+        self._mask = np.zeros(self._size, dtype=bool)
+        self._mask[list(self._objects)] = True
+        self._pending = []
+
+    @property
+    def values(self) -> np.ndarray:
+        """The values as an array, NaN where masked. This is a view of the column, that
+        isn't updated when the column grows."""
+        self.flush()
+        return self._values[: self._size]
+
+    @property
+    def mask(self) -> np.ndarray:
+        """True for the values that aren't numbers, such as failed measurements."""
+        self.flush()
+        return self._mask[: self._size]
+
+    @property
+    def dtype(self) -> np.dtype:
+        """The array type of the numerical values"""
+        self.flush()
+        return self._values.dtype
+
+    @property
+    def masked_values(self) -> dict[int, Any]:
+        """The values that aren't numbers, by position"""
+        self.flush()
+        return self._objects
+
+    def _promote(self, dtype: np.dtype) -> None:
+        if _DTYPES.index(dtype) > _DTYPES.index(self._values.dtype):
+            self._values = self._values.astype(dtype)
+
+    def _reserve(self, size: int) -> None:
+        if size > len(self._values):
+            capacity = max(size, 2 * len(self._values))
+            values = np.zeros(capacity, dtype=self._values.dtype)
+            values[: self._size] = self._values[: self._size]
+            mask = np.zeros(capacity, dtype=bool)
+            mask[: self._size] = self._mask[: self._size]
+            self._values, self._mask = values, mask
+
+    def flush(self) -> None:
+        """Stores the values appended since the last read in the arrays."""
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, []
+        try:
+            values = np.array(pending)
+        except ValueError:  # Values with several fields
+            values = np.array(pending, dtype=object)
+        dtype = _column_dtype(values.dtype) if values.ndim == 1 else None
+        if dtype is None:  # Text, or values of different kinds, classified one by one
+            for value in pending:
+                self._store(value)
+            return
+        if dtype.kind == "c":
+            self._detect_complex_format(pending)
+        if self._size == 0:
+            self._values = values.astype(dtype, copy=False)
+            self._mask = np.zeros(len(values), dtype=bool)
+        else:
+            self._promote(dtype)
+            self._reserve(self._size + len(values))
+            self._values[self._size : self._size + len(values)] = values
+        self._size += len(values)
+
+    def _detect_complex_format(self, values: list[Any]) -> None:
+        if self._complex_format is None:
+            value = next((value for value in values if isinstance(value, LTComplex)), None)
+            if value is None:
+                pass
+            elif value.unit == "dB":
+                self._complex_format = "({:.6g}dB,{:.6g}°)"
+            elif "°" in value.strvalue:
+                self._complex_format = "({:.6g},{:.6g}°)"
+            else:
+                self._complex_format = "({:.6g},{:.6g})"
+
+    def _store(self, value: Any) -> None:
+        dtype = _dtype_of(value)
+        if dtype is None:
+            dtype = _DTYPES[1]  # Masked values are set to NaN
+            self._objects[self._size] = value
+        elif dtype.kind == "c":
+            self._detect_complex_format([value])
+        self._promote(dtype)
+        self._reserve(self._size + 1)
+        if self._size in self._objects:
+            self._values[self._size] = np.nan
+            self._mask[self._size] = True
+        else:
+            self._values[self._size] = value
+        self._size += 1
+
+    def append(self, value: Any) -> None:
+        """Adds a value at the end of the column. Values that aren't numbers are masked.
+
+        :param value: The value to add
+        :type value: Any
+        """
+        self._pending.append(value)
+
+    def extend(self, values: Iterable[Any]) -> None:
+        """Adds values at the end of the column.
+
+        :param values: The values to add
+        :type values: Iterable
+        """
+        self._pending.extend(values)
+
+    def _ltcomplex(self, value: complex) -> LTComplex:
+        """Returns the value as an LTComplex, formatted as the values of the log."""
+        ans = LTComplex(f"({value.real!r},{value.imag!r})")
+        assert self._complex_format is not None
+        if self._complex_format.startswith("({:.6g}dB"):
+            magnitude = 20 * math.log10(abs(value)) if value else -math.inf
+            ans.strvalue = self._complex_format.format(magnitude, ans.ph)
+        elif self._complex_format.endswith("°)"):
+            ans.strvalue = self._complex_format.format(abs(value), ans.ph)
+        else:
+            ans.strvalue = self._complex_format.format(value.real, value.imag)
+        return ans
+
+    def tolist(self) -> list[ValueType]:
+        """Returns the values as a list, as stored by the kupicelib LogfileData."""
+        self.flush()
+        values = self.values.tolist()
+        if self._complex_format is not None:
+            values = [self._ltcomplex(value) for value in values]
+        for index, value in self._objects.items():
+            values[index] = value
+        return values
+
+    def __len__(self) -> int:
+        return self._size + len(self._pending)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self.tolist()[index]
+        self.flush()
+        if index < 0:
+            index += self._size
+        if not 0 <= index < self._size:
+            raise IndexError("LogColumn index out of range")
+        if index in self._objects:
+            return self._objects[index]
+        value = self._values[index].item()
+        if self._complex_format is not None:
+            return self._ltcomplex(value)
+        return value
+
+    def __iter__(self) -> Iterator[ValueType]:
+        return iter(self.tolist())
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, LogColumn):
+            other = other.tolist()
+        if not isinstance(other, Sequence) or isinstance(other, str):
+            return NotImplemented
+        return self.tolist() == list(other)
+
+    def __add__(self, other: Iterable[Any]) -> list[ValueType]:
+        return self.tolist() + list(other)
+
+    def __radd__(self, other: Iterable[Any]) -> list[ValueType]:
+        return list(other) + self.tolist()
+
+    def __repr__(self) -> str:
+        return f"LogColumn({self.tolist()!r})"
+
+    def formatted(self) -> list[str]:
+        """Returns the values as text, as written by :py:meth:`LogfileData.export_data`."""
+        if self._complex_format is not None:
+            text = [str(value) for value in self.tolist()]
+        else:
+            text = self.values.astype(str).tolist()
+            for index, value in self._objects.items():
+                text[index] = f"{value}"
+        return text
+
+
+class LogfileData(_LogfileData):
+    """Holds the steps and the measurements of a log file in :py:class:`LogColumn`
+    arrays. See :py:class:`kupicelib.log.logfile_data.LogfileData` for the methods.
+
+    The statistics, the searches on the step values and the export are computed on
+    the arrays. Failed measurements and other values that aren't numbers are ignored by
+    :py:meth:`max_measure_value`, :py:meth:`min_measure_value` and
+    :py:meth:`avg_measure_value`.
+
+    :param step_set: Values of the step parameters
+    :type step_set: dict, optional
+    :param dataset: Values of the measurements
+    :type dataset: dict, optional
+    """
+
+    def __init__(
+        self,
+        step_set: dict[str, list[Any]] | None = None,
+        dataset: dict[str, list[Any]] | None = None,
+    ) -> None:
+        super().__init__(step_set, dataset)
+        self.stepset = {name: LogColumn(values) for name, values in self.stepset.items()}
+        self.dataset = OrderedDict(
+            (name, LogColumn(values)) for name, values in self.dataset.items()
+        )
+
+    def _column(self, name: str) -> LogColumn:
+        """Returns a step parameter or a measurement as a column. The lists set by user
+        code are converted in place."""
+        name = name.lower()
+        for data in (self.stepset, self.dataset):
+            if name in data:
+                if not isinstance(data[name], LogColumn):
+                    data[name] = LogColumn(data[name])
+                return data[name]
+        raise IndexError(f"'{name}' is not a valid step variable or measurement name")
+
+    def _equal_to(self, param: str, value: str | int | float) -> np.ndarray:
+        """Returns True for the steps where the parameter is equal to the value."""
+        column = self._column(param)
+        value = try_convert_value(value)
+        if _dtype_of(value) is None:
+            equal = np.zeros(len(column), dtype=bool)
+            for index, item in column.masked_values.items():
+                equal[index] = item == value
+            return equal
+        return (column.values == value) & ~column.mask
+
+    def steps_with_parameter_equal_to(self, param: str, value: str | int | float) -> list[int]:
+        return np.flatnonzero(self._equal_to(param, value)).tolist()
+
+    def steps_with_conditions(self, **conditions) -> list[int]:
+        selected = None
+        for param, value in conditions.items():
+            equal = self._equal_to(param, value)
+            if selected is None:
+                selected = equal
+            else:
+                size = min(len(selected), len(equal))
+                selected = selected[:size] & equal[:size]
+        return [] if selected is None else np.flatnonzero(selected).tolist()
+
+    def _numbers(
+        self, measure: str, steps: int | Iterable[int] | None
+    ) -> tuple[LogColumn, np.ndarray]:
+        """Returns the measurement and the valid values at the given steps."""
+        column = self._column(measure)
+        if steps is None:
+            selection: Any = slice(None)
+        elif isinstance(steps, int):
+            selection = [steps]
+        else:
+            selection = np.fromiter(steps, dtype=np.int64)
+        values = column.values[selection]
+        if len(values) == 0:
+            raise ValueError(f"No values found for measure {measure}")
+        return column, values[~column.mask[selection]]
+
+    def max_measure_value(
+        self, measure: str, steps: int | Iterable[int] | None = None
+    ) -> ValueType:
+        column, values = self._numbers(measure, steps)
+        if len(values) == 0:  # Only text, compared as the base class does
+            return super().max_measure_value(measure, steps)
+        if column.dtype.kind == "c":
+            raise TypeError(f"The complex values of {measure} can't be ordered")
+        return values.max().item()
+
+    def min_measure_value(
+        self, measure: str, steps: int | Iterable[int] | None = None
+    ) -> ValueType:
+        column, values = self._numbers(measure, steps)
+        if len(values) == 0:
+            return super().min_measure_value(measure, steps)
+        if column.dtype.kind == "c":
+            raise TypeError(f"The complex values of {measure} can't be ordered")
+        return values.min().item()
+
+    def avg_measure_value(
+        self, measure: str, steps: int | Iterable[int] | None = None
+    ) -> NumericType:
+        _, values = self._numbers(measure, steps)
+        if len(values) == 0:
+            raise ValueError(f"No numeric values found for measure {measure}")
+        return values.mean().item()
+
+    def obtain_amplitude_and_phase_from_complex_values(self):
+        for param in list(self.dataset.keys()):
+            column = self._column(param)
+            if len(column) > 0 and isinstance(column[0], LTComplex):
+                self.dataset[param + "_mag"] = LogColumn.from_array(
+                    np.abs(column.values), column.mask
+                )
+                self.dataset[param + "_ph"] = LogColumn.from_array(
+                    np.angle(column.values, deg=True), column.mask
+                )
+
+    def export_data(
+        self,
+        export_file: str,
+        encoding=None,
+        append_with_line_prefix=None,
+        value_separator: str = "\t",
+        line_terminator: str = "\n",
+    ):
+        columns = [self._column(name) for name in (*self.stepset, *self.dataset)]
+        if any(len(column) and isinstance(column[0], list) for column in columns):
+            # Values with several fields are expanded into several columns by the base class
+            return super().export_data(
+                export_file, encoding, append_with_line_prefix, value_separator, line_terminator
+            )
+        if len(self.dataset) == 0:
+            _logger.warning("Empty data set. Exiting without writing file.")
+            return
+        if encoding is None:
+            encoding = self.encoding if hasattr(self, "encoding") else "utf-8"
+
+        data_size = len(columns[0])
+        for column in self.stepset.values():
+            if len(column) != data_size:
+                raise Exception("Data size mismatch. Not all measurements have the same length.")
+        for name, column in self.dataset.items():
+            if len(column) != data_size:
+                _logger.error(
+                    f"Data size mismatch. Not all measurements have the same length."
+                    f' Expected {data_size}. "{name}" has {len(column)}'
+                )
+
+        header = ["step", *self.stepset, *self.dataset]
+        table = [[str(index) for index in range(1, data_size + 1)]]
+        for column in columns:
+            text = column.formatted()[:data_size]
+            text.extend([""] * (data_size - len(text)))
+            table.append(text)
+        if append_with_line_prefix is not None:
+            # When appending a file, the user info is written in the first column
+            header.insert(0, "user info")
+            table.insert(0, [append_with_line_prefix] * data_size)
+
+        mode = "w" if append_with_line_prefix is None else "a"
+        with open(export_file, mode, encoding=encoding) as fout:
+            fout.write(value_separator.join(header) + line_terminator)
+            fout.writelines(
+                value_separator.join(row) + line_terminator for row in zip(*table, strict=True)
+            )
@@ -9,18 +9,477 @@
 #
 # Licence:     refer to the LICENSE file
 # -------------------------------------------------------------------------------
+from __future__ import annotations
+
+import codecs
+import dataclasses
 import logging
+import os
+import re
+from collections.abc import Iterator
+from pathlib import Path
+from typing import Any
 
-from kupicelib.log.ltsteps import (
-    LTSpiceExport,
-    LTSpiceLogReader,
-    reformat_LTSpice_export,
-)
+import numpy as np
+from kupicelib.log.logfile_data import try_convert_value
+from kupicelib.log.ltsteps import FourierData, HarmonicData
+from kupicelib.log.ltsteps import LTSpiceExport as _LTSpiceExport
+from kupicelib.log.ltsteps import LTSpiceLogReader as _LTSpiceLogReader
+
+from kuPyLTSpice.log.logfile_data import LogColumn, LogfileData
+from kuPyLTSpice.utils.detect_encoding import detect_encoding
 
 _logger = logging.getLogger("kupicelib.LTSteps")
 _logger.info(
     "This module is maintained for backward compatibility. Use kupicelib.log.ltsteps instead"
 )
 
-# Re-export the classes
-__all__ = ["LTSpiceExport", "LTSpiceLogReader", "reformat_LTSpice_export"]
+__all__ = [
+    "LTSpiceExport",
+    "LTSpiceLogReader",
+    "LogInfo",
+    "probe_log",
+    "reformat_LTSpice_export",
+]
+
+# Same expression as LTSpiceLogReader, for the measures of simulations without steps
+_STEPLESS_MEASURE = re.compile(
+    r"^(?P<name>\w+)(:\s+.*)?=(?P<value>[\d(inf)E+\-\(\)dB,°(-/\w]+)"
+    r"( FROM (?P<from>[\d\.E+-]*) TO (?P<to>[\d\.E+-]*)|( at (?P<at>[\d\.E+-]*)))?",
+    re.IGNORECASE,
+)
+
+
+EXPORT_CHUNK_SIZE = 4 * 1024 * 1024
+"""Number of characters of an export file read at a time"""
+
+# Lines of step information, found in a whole chunk with a single scan
+_STEP_LINE = re.compile(r"^Step Information:[^\n]*(?:\n|$)", re.MULTILINE)
+
+
+def _scan_export(fin, chunk_size: int) -> Iterator[tuple[bool, str]]:
+    """Reads the body of an export file by chunks, and yields its step information
+    lines, flagged True, and the blocks of data lines between them, flagged False. The
+    blocks only hold complete lines, except the last one of the file."""
+    pending = ""
+    while True:
+        chunk = fin.read(chunk_size)
+        text = pending + chunk
+        if chunk:
+            cut = text.rfind("\n") + 1
+            text, pending = text[:cut], text[cut:]
+        start = 0
+        for match in _STEP_LINE.finditer(text):
+            if match.start() > start:
+                yield False, text[start : match.start()]
+            yield True, match.group()
+            start = match.end()
+        if start < len(text):
+            yield False, text[start:]
+        if not chunk:
+            return
+
+
+def _prefix_lines(block: str, prefix: str) -> str:
+    """Writes a prefix at the start of each line of a block."""
+    prefixed = prefix + block.replace("\n", "\n" + prefix)
+    return prefixed[: -len(prefix)] if block.endswith("\n") else prefixed
+
+
+def reformat_LTSpice_export(
+    export_file: str | Path, tabular_file: str | Path, chunk_size: int = EXPORT_CHUNK_SIZE
+) -> None:
+    """Reads an LTSpice File Export file and writes it back with the run number and the
+    step parameters in the first columns of each line. See
+    :py:func:`kupicelib.log.ltsteps.reformat_LTSpice_export`.
+
+    The file is processed by chunks of ``chunk_size`` characters: the step information
+    lines of a chunk are found with a single regular expression scan, and the lines
+    between them are prefixed all at once, so that the memory used doesn't depend on the
+    size of the file. The output is the same as the kupicelib function.
+
+    :param export_file: Filename of the .txt file generated by the "Export Data as Text"
+    :type export_file: str | Path
+    :param tabular_file: Filename of the tab separated values (TSV) file to write
+    :type tabular_file: str | Path
+    :param chunk_size: Number of characters read at a time
+    :type chunk_size: int, optional
+    :return: Nothing
+    """
+    encoding = detect_encoding(export_file)
+    regx = re.compile(r"Step Information: ([\w=\d\. \-]+) +\((?:Run|Step): (\d*)/\d*\)\n")
+    with open(export_file, encoding=encoding) as fin, open(
+        tabular_file, "w", encoding=encoding
+    ) as fout:
+        headers = fin.readline()
+        go_header = True
+        prefix = "0\t\t"  # Lines before the first step
+        for is_step, text in _scan_export(fin, chunk_size):
+            if not is_step:
+                fout.write(_prefix_lines(text, prefix))
+                continue
+            match = regx.match(text)
+            if match is None:
+                continue
+            step, run_no = match.groups()
+            params = [param.split("=") for param in step.split()]
+            param_values = "\t".join(param[1] for param in params)
+            prefix = f"{run_no}\t{param_values}\t"
+            if go_header:
+                param_header = "\t".join(param[0] for param in params)
+                msg = f"Run\t{param_header}\t{headers}"
+                fout.write(msg)
+                _logger.debug(msg)
+                go_header = False
+
+
+def _convert_block(block: str, column_count: int) -> list[np.ndarray] | list[list[Any]]:
+    """Converts the data lines of a block into columns. The numbers are converted all at
+    once. Blocks with other values, such as the complex values of an AC analysis, are
+    converted value by value."""
+    try:
+        values = np.array(block.split(), dtype=np.float64)
+    except ValueError:
+        values = None
+    if values is not None and values.size % column_count == 0:
+        return list(values.reshape(-1, column_count).T)
+    columns: list[list[Any]] = [[] for _ in range(column_count)]
+    for line in block.splitlines():
+        if line:
+            for column, value in zip(columns, line.split("\t"), strict=False):
+                column.append(try_convert_value(value))
+    return columns
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, int | float | complex)
+
+
+class LTSpiceExport(_LTSpiceExport):
+    """Opens and reads LTSpice export data when using the "Export data as text" in the
+    File Menu on the waveform window. See :py:class:`kupicelib.log.ltsteps.LTSpiceExport`.
+
+    The file is read by chunks of ``chunk_size`` characters. The step information lines
+    are found with a single regular expression scan of each chunk, and the blocks of
+    numbers between them are converted all at once. The columns of ``dataset`` are
+    :py:class:`kuPyLTSpice.log.logfile_data.LogColumn` arrays, except the step
+    parameters that aren't numbers, which are lists.
+
+    Unlike the kupicelib class, the keys of ``dataset`` don't end with the line break
+    of the header line, the ``runno`` column holds integers, and files without steps can
+    be read.
+
+    :param export_filename: path to the Export file.
+    :type export_filename: str | Path
+    :param chunk_size: Number of characters read at a time
+    :type chunk_size: int, optional
+    """
+
+    def __init__(self, export_filename: str | Path, chunk_size: int = EXPORT_CHUNK_SIZE):
+        self.encoding = detect_encoding(export_filename)
+        self.dataset: dict[str, Any] = {}
+        regx = re.compile(r"Step Information: ([\w=\d\. -]+) +\(Run: (\d*)/\d*\)\n")
+        # Blocks of values of each column, and the rows of each step
+        blocks: list[list[Any]] = []
+        steps: list[tuple[dict[str, Any], int]] = []
+        rows = 0
+        with open(export_filename, encoding=self.encoding) as fin:
+            self.headers = fin.readline().split("\t")
+            blocks = [[] for _ in self.headers]
+            for is_step, text in _scan_export(fin, chunk_size):
+                if is_step:
+                    match = regx.match(text)
+                    if match:
+                        step, run_no = match.groups()
+                        step_values: dict[str, Any] = {"runno": int(run_no)}
+                        for param in step.split():
+                            key, value = param.split("=")
+                            step_values[key.lower()] = try_convert_value(value)
+                        steps.append((step_values, rows))
+                    continue
+                converted = _convert_block(text, len(self.headers))
+                for column, values in zip(blocks, converted, strict=False):
+                    column.append(values)
+                rows += len(converted[0])
+
+        for header, column in zip(self.headers, blocks, strict=True):
+            if all(isinstance(values, np.ndarray) for values in column):
+                data = LogColumn.from_array(np.concatenate([np.zeros(0), *column]))
+            else:
+                data = LogColumn([value for values in column for value in values])
+            self.dataset[header.strip().lower()] = data
+
+        if steps and steps[0][1] > 0:
+            steps.insert(0, ({}, 0))  # Lines before the first step
+        counts = np.diff([first for _, first in steps] + [rows])
+        for key in dict.fromkeys(key for step_values, _ in steps for key in step_values):
+            values = [step_values.get(key) for step_values, _ in steps]
+            if all(_is_number(value) for value in values):
+                self.dataset[key] = LogColumn.from_array(np.repeat(values, counts))
+            else:
+                self.dataset[key] = []
+                for value, count in zip(values, counts, strict=True):
+                    self.dataset[key].extend([value] * count)
+
+
+@dataclasses.dataclass
+class LogInfo:
+    """Summary of an LTSpice log file, as returned by :py:func:`probe_log`."""
+
+    filename: Path
+    encoding: str
+    step_count: int
+    """Number of steps, 0 if the simulation wasn't stepped"""
+    step_vars: list[str]
+    """Stepped parameters, in lower case, as in LTSpiceLogReader.get_step_vars()"""
+    measure_names: list[str]
+    """Names of the .MEAS results, in lower case and in the order of the log"""
+
+
+def probe_log(log_filename: str | Path, encoding: str | None = None) -> LogInfo:
+    """Lists the steps and the measurements of an LTSpice log file, without converting
+    any value. This is much cheaper than :py:class:`LTSpiceLogReader` when only the
+    names are needed, for example to index many result files.
+
+    :param log_filename: path to the log file
+    :type log_filename: str | Path
+    :param encoding: Encoding of the file. Detected if not given.
+    :type encoding: str, optional
+    :return: The step count, the stepped parameters and the measurement names
+    :rtype: LogInfo
+    """
+    log_filename = Path(log_filename)
+    if encoding is None:
+        encoding = detect_encoding(
+            log_filename, r"^((.*\n)?Circuit:|([\s\S]*)--- Expanded Netlist ---)"
+        )
+    step_count = 0
+    step_vars: list[str] = []
+    measure_names: list[str] = []
+    measurements_section = False
+    with open(log_filename, encoding=encoding) as fin:
+        for line in fin:
+            if line.startswith(".step"):
+                step_count += 1
+                if step_count == 1:
+                    step_vars = [
+                        token.partition("=")[0].lower() for token in line.split()[1:]
+                    ]
+            elif line.startswith("Measurement: "):
+                measurements_section = True
+                measure_names.append(line[13:].strip().lower())
+            elif step_count == 0 and not measurements_section:
+                match = _STEPLESS_MEASURE.match(line)
+                if match:
+                    measure_names.append(match.group("name").lower())
+    return LogInfo(log_filename, encoding, step_count, step_vars, measure_names)
+
+
+class LTSpiceLogReader(_LTSpiceLogReader, LogfileData):
+    """Reads an LTSpice log file. See :py:class:`kupicelib.log.ltsteps.LTSpiceLogReader`
+    for the description of the arguments and of the properties.
+
+    The file is parsed one line at a time by a parser that keeps its state between
+    reads, so that a log that is still being written can be followed: with
+    ``incremental=True``, :py:meth:`refresh` parses only the bytes appended since the
+    last read, and adds the new steps, Fourier analyses and measurements to
+    ``stepset``, ``fourier`` and ``dataset``. A line is only parsed once its line
+    break is written.
+
+    The steps and the measurements are stored in :py:class:`LogColumn` arrays, see
+    :py:class:`kuPyLTSpice.log.logfile_data.LogfileData`.
+
+    :param incremental: When True, an incomplete last line is left for the next
+        :py:meth:`refresh`. When False, the file is taken as complete.
+    :type incremental: bool
+    """
+
+    def __init__(
+        self,
+        log_filename: str | Path,
+        read_measures: bool = True,
+        step_set: dict[str, list[Any]] | None = None,
+        encoding: str | None = None,
+        incremental: bool = False,
+    ) -> None:
+        LogfileData.__init__(self, step_set)
+        self.logname = log_filename
+        self.fourier: dict[str, list[FourierData]] = {}
+        if encoding is None:
+            self.encoding = detect_encoding(
+                log_filename, r"^((.*\n)?Circuit:|([\s\S]*)--- Expanded Netlist ---)"
+            )
+        else:
+            self.encoding = encoding
+        self.read_measures = read_measures
+        self.incremental = incremental
+        self.offset = 0
+        """Number of bytes of the file already read"""
+        self._decoder = codecs.getincrementaldecoder(self.encoding)()
+        self._pending = ""
+        self._section = "header"
+        # Fourier analysis being read
+        self._signal: str | None = None
+        self._n_periods: int | float = 0
+        self._dc_component = 0.0
+        self._harmonics: list[HarmonicData] = []
+        self._thd: float | None = None
+        self._phd: float | None = None
+        self._skip_line = False
+        # Measurement being read
+        self._meas_name: str | None = None
+        self._headers: list[str] = []
+        self._block_started = False
+        _logger.debug(f"Processing LOG file:{log_filename}")
+        self.refresh()
+        _logger.info(
+            "Identified %d steps, read %d measurements", self.step_count, self.measure_count
+        )
+
+    def refresh(self) -> int:
+        """Parses the content added to the log file since the last read.
+
+        :return: Number of measurement values read
+        :rtype: int
+        """
+        measure_count = self.measure_count
+        with open(self.logname, "rb") as fin:
+            size = os.fstat(fin.fileno()).st_size
+            if size < self.offset:
+                raise RuntimeError(
+                    f"'{self.logname}' is shorter than the {self.offset} bytes already read"
+                )
+            fin.seek(self.offset)
+            data = fin.read(size - self.offset)
+        self.offset += len(data)
+        final = not self.incremental
+        lines = (self._pending + self._decoder.decode(data, final=final)).split("\n")
+        self._pending = "" if final else lines.pop()
+        for line in lines:
+            self._parse_line(line.strip("\r\n"))
+        if final and self._section == "harmonics":
+            self._parse_line("")  # The end of the file also ends the harmonics table
+        for column in (*self.stepset.values(), *self.dataset.values()):
+            if isinstance(column, LogColumn):
+                column.flush()  # Releases the values read as Python objects
+        if self.measure_count > measure_count:
+            _logger.debug("Read %d new measurements", self.measure_count - measure_count)
+        return self.measure_count - measure_count
+
+    def _parse_line(self, line: str) -> None:
+        if self._section == "harmonics":
+            self._parse_harmonic(line)
+        elif self._section == "measurements":
+            self._parse_measurement(line)
+        elif self._section == "header":
+            self._parse_header(line)
+
+    def _parse_header(self, line: str) -> None:
+        """Parses a line of the part of the log before the measurements."""
+        if len(line.strip()) == 0:
+            pass
+        elif line.startswith("N-Period"):
+            n_periods = line.split("=")[-1].strip()
+            self._n_periods = -1 if n_periods == "all" else float(n_periods)
+        elif line.startswith("Fourier components of"):
+            self._signal = line.split(" of ")[-1].strip()
+        elif line.startswith("DC component:"):
+            self._dc_component = float(line.split(":")[-1].strip())
+        elif line.startswith("Harmonic"):
+            self._section = "harmonics"
+            self._skip_line = True  # Second line of the table header
+            self._harmonics = []
+            self._thd = self._phd = None
+            return
+        elif line.startswith(".step"):
+            self.step_count += 1
+            for token in line.split(" ")[1:]:
+                lhs, rhs = token.split("=")
+                self.stepset.setdefault(lhs.lower(), LogColumn()).append(try_convert_value(rhs))
+        elif line.startswith("Measurement:"):
+            if not self.read_measures:
+                self._section = "done"
+            else:
+                self._section = "measurements"
+                self._parse_measurement(line)
+            return
+        if self.step_count == 0:  # Measurements of simulations without steps
+            match = _STEPLESS_MEASURE.match(line)
+            if match:
+                name = match.group("name")
+                if match.group("from"):
+                    headers = [name, name + "_FROM", name + "_TO"]
+                    values = [match.group("value"), match.group("from"), match.group("to")]
+                elif match.group("at"):
+                    headers = [name, name + "_at"]
+                    values = [match.group("value"), match.group("at")]
+                else:
+                    headers = [name]
+                    values = [match.group("value")]
+                self.measure_count += 1
+                for title, value in zip(headers, values, strict=True):
+                    self.dataset[title.lower()] = LogColumn([try_convert_value(value)])
+
+    def _parse_harmonic(self, line: str) -> None:
+        """Parses a line of the harmonics table of a Fourier analysis."""
+        if self._skip_line:
+            self._skip_line = False
+        elif line.startswith("Total Harmonic"):
+            match = re.search(r"\d+.\d+", line)
+            if match:
+                self._thd = float(match.group())
+        elif line.startswith("Partial Harmonic"):
+            match = re.search(r"\d+.\d+", line)
+            if match:
+                self._phd = float(match.group())
+        elif line == "":
+            self._section = "header"
+            if self._signal is not None and self._phd is not None and self._thd is not None:
+                n_periods = self._n_periods
+                fourier_data = FourierData(
+                    self._signal,
+                    int(n_periods) if isinstance(n_periods, float) else n_periods,
+                    self._dc_component,
+                    self._phd,
+                    self._thd,
+                    self._harmonics,
+                    self.step_count - 1,
+                )
+                self.fourier.setdefault(self._signal, []).append(fourier_data)
+        else:
+            self._harmonics.append(HarmonicData.from_line(line))
+
+    def _parse_measurement(self, line: str) -> None:
+        """Parses a line of the measurements section. The values are added to the
+        dataset as they are read."""
+        if line.startswith("Measurement: "):
+            self._meas_name = line[13:]
+            self._headers = []
+            self._block_started = False
+            _logger.debug("Reading Measurement %s", self._meas_name)
+            return
+        tokens = line.split("\t")
+        if len(tokens) < 2:
+            return
+        try:
+            int(tokens[0])
+        except ValueError:
+            # Header of the measurement, like "step  v(out)  FROM  TO"
+            if self._meas_name is not None:
+                if len(tokens) >= 3 and tokens[2] in ("FROM", "at"):
+                    tokens[2] = self._meas_name + "_" + tokens[2]
+                if len(tokens) >= 4 and tokens[3] == "TO":
+                    tokens[3] = self._meas_name + "_TO"
+            self._headers = [str(self._meas_name), *tokens[2:]]
+            self._block_started = False
+            return
+        values = try_convert_value(tokens[1:])
+        assert isinstance(values, list)
+        if not self._block_started:
+            # A measurement read again replaces the previous values, as in the base class
+            for title in self._headers:
+                self.dataset[title.lower()] = LogColumn()
+            self._block_started = True
+        for title, value in zip(self._headers, values, strict=False):
+            self.dataset[title.lower()].append(value)
+        self.measure_count += 1
@@ -16,8 +16,413 @@
 # Created:     19-09-2021
 # Licence:     refer to the LICENSE file
 # -------------------------------------------------------------------------------
+"""Reads the Semiconductor Device Operating Points of an LTSpice log file into arrays.
 
-from kupicelib.log.semi_dev_op_reader import opLogReader
+:py:class:`SemiDevOpReader` parses the file in a single pass, and keeps the operating
+points of each type of device in a :py:class:`DeviceOpTable`: a matrix of devices x
+parameters for each step, with the indexes of the devices and of the parameters. The
+matrices allow vectorized queries over thousands of devices, for example::
 
-# Re-export the classes
-__all__ = ["opLogReader"]
+    op = SemiDevOpReader("amplifier.log")
+    mos = op["MOSFET Transistors"]
+    weak = mos.devices_where(mos["Gm"] / mos["Id"] > 20)  # In the last step
+
+A new step starts with each "Semiconductor Device Operating Points:" section of the
+log, so that the steps are in the order of the ``.step`` lines, as in
+:py:class:`kuPyLTSpice.log.ltsteps.LTSpiceLogReader`.
+
+:py:func:`opLogReader` returns the nested dictionaries of the kupicelib function.
+"""
+from __future__ import annotations
+
+import logging
+import re
+from pathlib import Path
+
+import numpy as np
+
+from kuPyLTSpice.utils.detect_encoding import detect_encoding
+
+_logger = logging.getLogger("kupicelib.SemiDevOpReader")
+
+__all__ = ["DeviceOpTable", "SemiDevOpReader", "opLogReader"]
+
+_SECTION = "Semiconductor Device Operating Points:"
+_TITLE = re.compile(r"^\s*--- (.*) ---\s*$")
+_FLOAT_START = frozenset("0123456789+-.iInN")  # First characters of float() strings
+
+
+class DeviceOpTable:
+    """Operating points of the devices of one type, for example the MOSFET transistors.
+
+    The numeric values are in :py:attr:`values`, an array of steps x devices x
+    parameters where the missing values are NaN. The values that aren't numbers, such
+    as the models of the devices, are kept in :py:attr:`text`.
+    """
+
+    def __init__(
+        self,
+        title: str,
+        devices: list[str],
+        parameters: list[str],
+        values: np.ndarray,
+        present: np.ndarray,
+        listed: np.ndarray,
+        text: dict[str, dict[tuple[int, int], str]],
+    ) -> None:
+        self.title = title
+        """Title of the section, as written in the log"""
+        self.devices = devices
+        """Names of the devices, in the order of the log"""
+        self.parameters = parameters
+        """Names of the parameters, without the colon, in the order of the log"""
+        self.device_index = {device: index for index, device in enumerate(devices)}
+        """Position of each device in the second dimension of :py:attr:`values`"""
+        self.parameter_index = {parameter: index for index, parameter in enumerate(parameters)}
+        """Position of each parameter in the third dimension of :py:attr:`values`"""
+        self.values = values
+        """Array of steps x devices x parameters, NaN where there is no number"""
+        self.present = present
+        """True where the log has a value, number or text"""
+        self.listed = listed
+        """Array of steps x devices, True where the device is in the step"""
+        self.text = text
+        """Values that aren't numbers, by parameter and by (step, device) positions"""
+        self._lower_parameters = {
+            parameter.lower(): index for index, parameter in enumerate(parameters)
+        }
+
+    @property
+    def step_count(self) -> int:
+        return self.values.shape[0]
+
+    def _parameter(self, parameter: str) -> int:
+        """Finds a parameter, trying its exact name before ignoring the case."""
+        index = self.parameter_index.get(parameter)
+        if index is None:
+            index = self._lower_parameters.get(parameter.lower())
+            if index is None:
+                raise KeyError(f'Parameter "{parameter}" not found in {self.title}')
+        return index
+
+    def __getitem__(self, parameter: str) -> np.ndarray:
+        """Returns the values of a parameter, as an array of steps x devices.
+
+        :param parameter: Name of the parameter, the case being ignored if there is no
+            parameter with the exact name
+        :type parameter: str
+        :raises KeyError: If there is no such parameter
+        :return: The values, NaN where the device has no number for the parameter
+        :rtype: numpy.ndarray
+        """
+        return self.values[:, :, self._parameter(parameter)]
+
+    def __contains__(self, parameter: str) -> bool:
+        try:
+            self._parameter(parameter)
+        except KeyError:
+            return False
+        return True
+
+    def matrix(self, step: int = -1) -> np.ndarray:
+        """Returns the devices x parameters matrix of a step.
+
+        :param step: Index of the step, the last one by default
+        :type step: int, optional
+        :return: The matrix, indexed by :py:attr:`device_index` and :py:attr:`parameter_index`
+        :rtype: numpy.ndarray
+        """
+        return self.values[step]
+
+    def get(self, device: str, parameter: str, step: int = -1) -> float | str | None:
+        """Returns the value of a parameter of a device.
+
+        :param device: Name of the device
+        :type device: str
+        :param parameter: Name of the parameter
+        :type parameter: str
+        :param step: Index of the step, the last one by default
+        :type step: int, optional
+        :raises KeyError: If the device or the parameter doesn't exist
+        :return: The value, or None if the log doesn't give it in this step
+        :rtype: float | str | None
+        """
+        device_no = self.device_index[device]
+        parameter_no = self._parameter(parameter)
+        step = range(self.step_count)[step]
+        text = self.text.get(self.parameters[parameter_no], {}).get((step, device_no))
+        if text is not None:
+            return text
+        if not self.present[step, device_no, parameter_no]:
+            return None
+        return float(self.values[step, device_no, parameter_no])
+
+    def models(self, step: int = -1) -> list[str | None]:
+        """Returns the model of each device, in the order of :py:attr:`devices`.
+
+        :param step: Index of the step, the last one by default
+        :type step: int, optional
+        :return: The models, None for the devices without a model in this step
+        :rtype: list[str | None]
+        """
+        step = range(self.step_count)[step]
+        models = self.text.get("Model", {})
+        return [models.get((step, device_no)) for device_no in range(len(self.devices))]
+
+    def devices_where(self, condition: np.ndarray, step: int = -1) -> list[str]:
+        """Returns the devices for which a condition is true.
+
+        :param condition: Boolean array of devices, or of steps x devices such as
+            ``table["Id"] > 1e-3``
+        :type condition: numpy.ndarray
+        :param step: Step used when the condition has a step dimension, the last one by
+            default
+        :type step: int, optional
+        :return: The names of the devices
+        :rtype: list[str]
+        """
+        condition = np.asarray(condition, dtype=bool)
+        if condition.ndim == 2:
+            condition = condition[step]
+        return [self.devices[device_no] for device_no in np.flatnonzero(condition)]
+
+    def to_dict(self, step: int = -1) -> dict[str, dict[str, float | str]]:
+        """Returns the operating points of a step as dictionaries, in the format of
+        :py:func:`opLogReader`.
+
+        :param step: Index of the step, the last one by default
+        :type step: int, optional
+        :return: The parameters of each device in the step
+        :rtype: dict
+        """
+        step = range(self.step_count)[step]
+        texts = [self.text.get(parameter, {}) for parameter in self.parameters]
+        values = self.values[step].tolist()
+        present = self.present[step].tolist()
+        devices: dict[str, dict[str, float | str]] = {}
+        for device_no in np.flatnonzero(self.listed[step]).tolist():
+            params: dict[str, float | str] = {}
+            for parameter_no, parameter in enumerate(self.parameters):
+                if present[device_no][parameter_no]:
+                    params[parameter] = texts[parameter_no].get(
+                        (step, device_no), values[device_no][parameter_no]
+                    )
+            devices[self.devices[device_no]] = params
+        return devices
+
+    def __repr__(self) -> str:
+        return (
+            f"DeviceOpTable({self.title!r}, {len(self.devices)} devices, "
+            f"{len(self.parameters)} parameters, {self.step_count} steps)"
+        )
+
+
+class _TableBuilder:
+    """Collects the rows of a type of device while the log is parsed. The numbers are
+    converted all at once when the table is built."""
+
+    def __init__(self, title: str) -> None:
+        self.title = title
+        self.device_index: dict[str, int] = {}
+        self.parameter_index: dict[str, int] = {}
+        self.listed: list[tuple[int, np.ndarray]] = []
+        self.rows: list[tuple[int, np.ndarray, int]] = []
+        """Rows of numbers, whose tokens are converted together"""
+        self.tokens: list[str] = []
+        self.converted: list[tuple[int, np.ndarray, int, np.ndarray]] = []
+        """Rows converted one value at a time"""
+        self.text: dict[str, dict[tuple[int, int], str]] = {}
+        self.last_step = 0
+
+    def add_devices(self, step: int, names: list[str]) -> np.ndarray:
+        indexes = np.array(
+            [self.device_index.setdefault(name, len(self.device_index)) for name in names]
+        )
+        self.listed.append((step, indexes))
+        return indexes
+
+    def add_row(self, step: int, devices: np.ndarray, parameter: str, cols: list[str]) -> None:
+        parameter_no = self.parameter_index.setdefault(parameter, len(self.parameter_index))
+        if parameter == "Model":
+            self._convert_row(step, devices, parameter_no, cols)
+        else:
+            self.rows.append((step, devices, parameter_no))
+            self.tokens.extend(cols)
+
+    def _convert_row(self, step: int, devices: np.ndarray, parameter_no: int, cols: list[str]):
+        """Converts a row that may hold text, keeping the values that aren't numbers."""
+        values = np.full(len(cols), np.nan)
+        text = None
+        for position, (device_no, value) in enumerate(zip(devices.tolist(), cols, strict=True)):
+            try:
+                if value[:1] not in _FLOAT_START:  # Spares the exception of most names
+                    raise ValueError
+                values[position] = float(value)
+            except ValueError:
+                if text is None:
+                    text = self.text.setdefault(list(self.parameter_index)[parameter_no], {})
+                text[(step, device_no)] = value
+        self.converted.append((step, devices, parameter_no, values))
+
+    def _store(self, rows, values: np.ndarray, present: np.ndarray, row_values) -> None:
+        """Writes rows of values in the table with a single indexed assignment."""
+        counts = [len(devices) for _, devices, _ in rows]
+        index = (
+            np.repeat([step for step, _, _ in rows], counts),
+            np.concatenate([devices for _, devices, _ in rows]),
+            np.repeat([parameter_no for _, _, parameter_no in rows], counts),
+        )
+        values[index] = row_values
+        present[index] = True
+
+    def build(self, step_count: int) -> DeviceOpTable:
+        shape = (step_count, len(self.device_index), len(self.parameter_index))
+        values = np.full(shape, np.nan)
+        present = np.zeros(shape, dtype=bool)
+        listed = np.zeros(shape[:2], dtype=bool)
+        for step, devices in self.listed:
+            listed[step, devices] = True
+        if self.rows:
+            try:
+                numbers = np.array(self.tokens, dtype=np.float64)
+            except ValueError:  # Some values aren't numbers
+                position = 0
+                for step, devices, parameter_no in self.rows:
+                    cols = self.tokens[position : position + len(devices)]
+                    self._convert_row(step, devices, parameter_no, cols)
+                    position += len(devices)
+            else:
+                self._store(self.rows, values, present, numbers)
+        if self.converted:
+            self._store(
+                [row[:3] for row in self.converted],
+                values,
+                present,
+                np.concatenate([row[3] for row in self.converted]),
+            )
+        return DeviceOpTable(
+            self.title,
+            list(self.device_index),
+            list(self.parameter_index),
+            values,
+            present,
+            listed,
+            self.text,
+        )
+
+
+class SemiDevOpReader:
+    """Reads the Semiconductor Device Operating Points of a log file. The tables of the
+    device types are accessed by their title, ignoring the case::
+
+        op = SemiDevOpReader("amplifier.log")
+        diodes = op["Diodes"]
+        print(diodes.get("d:m6:1:para2:1", "Id"))
+
+    :param filename: path to the log file
+    :type filename: str | Path
+    :param encoding: Encoding of the file. Detected if not given.
+    :type encoding: str, optional
+    """
+
+    def __init__(self, filename: str | Path, encoding: str | None = None) -> None:
+        self.filename = Path(filename)
+        self.encoding = encoding or detect_encoding(filename)
+        self.tables: dict[str, DeviceOpTable] = {}
+        """Tables of the device types, by title in lower case"""
+        self.step_count = 0
+        """Number of operating point sections in the log"""
+        self._last_steps: dict[str, int] = {}
+        self._parse()
+
+    def _parse(self) -> None:
+        builders: dict[str, _TableBuilder] = {}
+        builder: _TableBuilder | None = None
+        devices: np.ndarray | None = None
+        step = -1
+        titles: set[str] = set()  # Titles seen in the current step
+        with open(self.filename, encoding=self.encoding) as fin:
+            for line in fin:
+                if line.startswith(_SECTION):
+                    if step < 0 or titles:
+                        step += 1
+                        titles = set()
+                    continue
+                if step < 0:
+                    continue
+                if "---" in line:
+                    match = _TITLE.search(line)
+                    if match is not None:
+                        title = match.group(1)
+                        key = title.lower()
+                        if key in titles:  # A repeated section starts a new step
+                            step += 1
+                            titles = set()
+                        titles.add(key)
+                        builder = builders.setdefault(key, _TableBuilder(title))
+                        builder.last_step = step
+                        devices = None
+                        continue
+                line = line.rstrip("\r\n")
+                # The rows start with the name of the parameter and a colon, except Gmb
+                # in some versions of LTSpice
+                if builder is None or not line or line[0].isspace():
+                    continue
+                cols = line.split()
+                if len(cols) < 2 or not (cols[0].endswith(":") or cols[0] == "Gmb"):
+                    continue
+                if line[-1].isspace():
+                    cols.append("")  # As split by whitespace runs, the way kupicelib does
+                if cols[0] == "Name:":
+                    devices = builder.add_devices(step, cols[1:])
+                elif devices is not None and len(devices) > 0 and len(cols) == len(devices) + 1:
+                    builder.add_row(step, devices, cols[0].rstrip(":"), cols[1:])
+        self.step_count = step + 1
+        for key, table_builder in builders.items():
+            self.tables[key] = table_builder.build(self.step_count)
+            self._last_steps[key] = table_builder.last_step
+        _logger.debug(
+            "Read %d device types in %d steps from %s",
+            len(self.tables),
+            self.step_count,
+            self.filename,
+        )
+
+    def __getitem__(self, title: str) -> DeviceOpTable:
+        """Returns the table of a type of device, such as "MOSFET Transistors".
+
+        :raises KeyError: If the log has no such devices
+        """
+        return self.tables[title.lower()]
+
+    def __contains__(self, title: str) -> bool:
+        return title.lower() in self.tables
+
+    def to_dict(self, step: int | None = None) -> dict[str, dict[str, dict[str, float | str]]]:
+        """Returns the operating points as the nested dictionaries of :py:func:`opLogReader`.
+
+        :param step: Index of the step. By default, each type of device gives its last
+            section in the log, as :py:func:`opLogReader` does.
+        :type step: int, optional
+        :return: The parameters of each device, by type of device in lower case
+        :rtype: dict
+        """
+        return {
+            key: table.to_dict(self._last_steps[key] if step is None else step)
+            for key, table in self.tables.items()
+        }
+
+
+def opLogReader(filename: str | Path) -> dict[str, dict[str, dict[str, float | str]]]:
+    """Reads the operating points of the semiconductor devices of a log file, and returns
+    them in nested dictionaries. See :py:func:`kupicelib.log.semi_dev_op_reader.opLogReader`
+    for the format. For a stepped simulation, the last step is returned.
+
+    :py:class:`SemiDevOpReader` gives the operating points of all the steps, in arrays.
+
+    :param filename: path to the log file containing the Semiconductor Device Operating Points
+    :type filename: str | Path
+    :return: Dictionary containing the information as described above.
+    :rtype: dict
+    """
+    return SemiDevOpReader(filename).to_dict()
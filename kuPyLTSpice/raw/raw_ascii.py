@@ -0,0 +1,172 @@
+#!/usr/bin/env python
+
+# -------------------------------------------------------------------------------
+#    ____        _   _____ ____        _
+#   |  _ \ _   _| | |_   _/ ___| _ __ (_) ___ ___
+#   | |_) | | | | |   | | \___ \| '_ \| |/ __/ _ \
+#   |  __/| |_| | |___| |  ___) | |_) | | (_|  __/
+#   |_|    \__, |_____|_| |____/| .__/|_|\___\___|
+#          |___/                |_|
+#
+# Name:        raw_ascii.py
+# Purpose:     Bulk parser of the Values: section of ASCII RAW files
+#
+# Licence:     refer to the LICENSE file
+# -------------------------------------------------------------------------------
+"""Parser of the ``Values:`` section of ASCII RAW files, as written by the simulators
+when the ``-ascii`` switch is used.
+
+In this section each point starts with its index, followed by the value of each trace
+on its own line, each value being preceded by a tab. Complex values are written as
+``real,imaginary`` pairs::
+
+    Values:
+    0       1.000000000000000e+000,0.000000000000000e+000
+            9.999999999999998e-001,-6.283185307179585e-004
+    1       1.023292992280754e+000,0.000000000000000e+000
+            9.999999999999998e-001,-6.429593022693264e-004
+
+Instead of reading the values one line at a time, the section is read in large blocks
+and each block is converted at once by numpy. As all the points have the same number of
+numbers, the result is then reshaped into one column per number.
+"""
+from __future__ import annotations
+
+import logging
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+from kuPyLTSpice.raw.raw_classes import NUMPY_TYPES
+
+__all__ = ["parse_ascii_values", "read_ascii_values"]
+
+_logger = logging.getLogger("kupicelib.RawRead")
+
+ASCII_CHUNK_SIZE = 16 * 2**20
+"""Size in bytes of the blocks read from the Values: section."""
+
+
+def _to_numbers(text: bytes) -> np.ndarray[Any, Any]:
+    """Converts a block of complete lines to a flat array of floats.
+
+    :raises RuntimeError: If the block holds something that isn't a number
+    """
+    try:
+        return np.fromstring(text.replace(b",", b" "), dtype=np.float64, sep=" ")
+    except ValueError as err:
+        raise RuntimeError(f"Invalid data: {err}") from err
+
+
+def _split_columns(
+    numbers: np.ndarray[Any, Any], n_points: int, numerical_types: list[str]
+) -> list[np.ndarray[Any, Any]]:
+    """Checks the point indexes and splits the numbers into the values of each trace."""
+    table = numbers.reshape(n_points, -1)
+    mismatch = np.flatnonzero(table[:, 0] != np.arange(n_points))
+    if len(mismatch):
+        point = int(mismatch[0])
+        raise RuntimeError(
+            f"Invalid data: point is not in sequence ({point} != {table[point, 0]:g})"
+        )
+    values = []
+    column = 1
+    for numerical_type in numerical_types:
+        if numerical_type == "complex":
+            data = np.empty(n_points, dtype=NUMPY_TYPES["complex"])
+            data.real = table[:, column]
+            data.imag = table[:, column + 1]
+            column += 2
+        else:
+            data = table[:, column].astype(NUMPY_TYPES[numerical_type])
+            column += 1
+        values.append(data)
+    return values
+
+
+def _row_size(numerical_types: list[str]) -> int:
+    """Number of numbers of a point: the index and one or two numbers per trace."""
+    return 1 + sum(2 if numerical_type == "complex" else 1 for numerical_type in numerical_types)
+
+
+def parse_ascii_values(
+    text: bytes | str, n_points: int, numerical_types: list[str]
+) -> list[np.ndarray[Any, Any]]:
+    """Parses the contents of a ``Values:`` section held in memory.
+
+    :param text: Contents of the section, after the ``Values:`` line
+    :type text: bytes | str
+    :param n_points: Number of points
+    :type n_points: int
+    :param numerical_types: Numerical type of each trace: "real", "double" or "complex"
+    :type numerical_types: list[str]
+    :raises RuntimeError: If the section is incomplete, holds a malformed number or the
+        points are not in sequence
+    :return: The values of each trace
+    :rtype: list[numpy.ndarray]
+    """
+    if isinstance(text, str):
+        text = text.encode("ascii", errors="ignore")
+    numbers = _to_numbers(text)
+    size = n_points * _row_size(numerical_types)
+    if len(numbers) < size:
+        raise RuntimeError("Invalid data: end of file encountered too early")
+    return _split_columns(numbers[:size], n_points, numerical_types)
+
+
+def read_ascii_values(
+    raw_filename: str | Path,
+    data_offset: int,
+    encoding: str,
+    n_points: int,
+    numerical_types: list[str],
+) -> list[np.ndarray[Any, Any]]:
+    """Reads the ``Values:`` section of an ASCII RAW file in blocks of
+    ``ASCII_CHUNK_SIZE`` bytes. Each block is cut at its last line break and converted
+    at once, the rest of the line being carried over to the next block. Numbers after
+    the last point are ignored.
+
+    :param raw_filename: RAW file to read
+    :type raw_filename: str | Path
+    :param data_offset: Position in the file of the line after ``Values:``
+    :type data_offset: int
+    :param encoding: Encoding of the file, either 'utf_8' or 'utf_16_le'
+    :type encoding: str
+    :param n_points: Number of points
+    :type n_points: int
+    :param numerical_types: Numerical type of each trace: "real", "double" or "complex"
+    :type numerical_types: list[str]
+    :raises RuntimeError: If the section is incomplete, holds a malformed number or the
+        points are not in sequence
+    :return: The values of each trace
+    :rtype: list[numpy.ndarray]
+    """
+    size = n_points * _row_size(numerical_types)
+    numbers = np.empty(size, dtype=np.float64)
+    filled = 0
+    tail = b""
+    with open(raw_filename, "rb") as raw_file:
+        raw_file.seek(data_offset)
+        while filled < size:
+            # An even size keeps the UTF-16 characters whole
+            chunk = raw_file.read(ASCII_CHUNK_SIZE)
+            if encoding != "utf_8":
+                chunk = chunk.decode(encoding, errors="ignore").encode("ascii", errors="ignore")
+            if chunk:
+                block = tail + chunk
+                cut = block.rfind(b"\n") + 1
+                block, tail = block[:cut], block[cut:]
+            else:
+                block, tail = tail, b""
+            if block.strip():
+                converted = _to_numbers(block)
+                count = min(len(converted), size - filled)
+                numbers[filled : filled + count] = converted[:count]
+                filled += count
+            if not chunk:
+                break
+    if filled < size:
+        raise RuntimeError("Invalid data: end of file encountered too early")
+    _logger.debug("Parsed %d ASCII points of '%s'", n_points, raw_filename)
+    return _split_columns(numbers, n_points, numerical_types)
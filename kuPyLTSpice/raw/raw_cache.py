@@ -0,0 +1,213 @@
+#!/usr/bin/env python
+
+# -------------------------------------------------------------------------------
+#    ____        _   _____ ____        _
+#   |  _ \ _   _| | |_   _/ ___| _ __ (_) ___ ___
+#   | |_) | | | | |   | | \___ \| '_ \| |/ __/ _ \
+#   |  __/| |_| | |___| |  ___) | |_) | | (_|  __/
+#   |_|    \__, |_____|_| |____/| .__/|_|\___\___|
+#          |___/                |_|
+#
+# Name:        raw_cache.py
+# Purpose:     Columnar cache of the decoded contents of RAW files
+#
+# Licence:     refer to the LICENSE file
+# -------------------------------------------------------------------------------
+"""Cache of decoded RAW files.
+
+The cache stores, for each RAW file, a numpy ``.npz`` file with one contiguous array per
+trace, together with the parsed header and the step information. An entry is only used
+while the size and the modification time of the RAW file are the same as when the entry
+was written. Entries are stored next to the RAW file, unless a cache directory is given.
+The total size of the entries in a directory is bounded, the least recently used entries
+being deleted first.
+
+Normally this class is used through the ``cache`` argument of
+:py:class:`kuPyLTSpice.raw.raw_read.RawRead`::
+
+    raw = RawRead("big_file.raw", cache=True)  # sidecar next to the RAW file
+    raw = RawRead("big_file.raw", cache=RawCache("./raw_cache", max_size=10 * 2**30))
+"""
+from __future__ import annotations
+
+import hashlib
+import itertools
+import json
+import logging
+import os
+import zipfile
+from collections.abc import Iterable
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+__all__ = ["RawCache"]
+
+_logger = logging.getLogger("kupicelib.RawRead")
+
+CACHE_SUFFIX = ".rawcache.npz"
+CACHE_VERSION = 1
+
+
+class RawCache:
+    """Columnar cache of decoded RAW files, with a least recently used eviction policy.
+
+    :param cache_dir: Directory where the cache entries are stored. If None, each entry
+        is stored next to its RAW file.
+    :type cache_dir: str | Path, optional
+    :param max_size: Maximum number of bytes used by the cache entries of a directory.
+        Use None for no limit. Defaults to 1 GiB.
+    :type max_size: int, optional
+    """
+
+    def __init__(
+        self, cache_dir: str | Path | None = None, max_size: int | None = 2**30
+    ) -> None:
+        self.cache_dir = None if cache_dir is None else Path(cache_dir)
+        self.max_size = max_size
+
+    def entry_path(self, raw_file: str | Path) -> Path:
+        """Returns the path of the cache entry of a RAW file.
+
+        :param raw_file: Path of the RAW file
+        :type raw_file: str | Path
+        :return: Path of the cache entry
+        :rtype: Path
+        """
+        raw_file = Path(raw_file)
+        if self.cache_dir is None:
+            return raw_file.with_name(raw_file.name + CACHE_SUFFIX)
+        digest = hashlib.sha1(str(raw_file.resolve()).encode("utf-8")).hexdigest()[:12]
+        return self.cache_dir / f"{raw_file.name}.{digest}{CACHE_SUFFIX}"
+
+    @staticmethod
+    def _file_key(raw_file: Path) -> dict[str, int]:
+        stat = os.stat(raw_file)
+        return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+    def load(self, raw_file: str | Path) -> tuple[dict[str, Any], Any] | None:
+        """Looks for a valid cache entry of a RAW file.
+
+        :param raw_file: Path of the RAW file
+        :type raw_file: str | Path
+        :return: A tuple with the stored header information and the ``NpzFile`` giving
+            access to the trace arrays, or None if there is no valid entry. The trace
+            arrays are only read from disk when accessed.
+        :rtype: tuple[dict, numpy.lib.npyio.NpzFile] | None
+        """
+        raw_file = Path(raw_file)
+        entry = self.entry_path(raw_file)
+        if not entry.exists():
+            return None
+        try:
+            arrays = np.load(entry, allow_pickle=False)
+            header = json.loads(arrays["header"].item())
+        except (OSError, ValueError, KeyError, zipfile.BadZipFile) as err:
+            _logger.warning("Ignoring invalid RAW cache entry '%s': %s", entry, err)
+            return None
+        if (
+            header.get("version") != CACHE_VERSION
+            or header.get("key") != self._file_key(raw_file)
+        ):
+            arrays.close()
+            _logger.debug("RAW cache entry '%s' is outdated", entry)
+            return None
+        # Marks the entry as recently used
+        os.utime(entry)
+        return header, arrays
+
+    def store(
+        self,
+        raw_file: str | Path,
+        header: dict[str, Any],
+        traces: Iterable[np.ndarray[Any, Any]],
+    ) -> Path:
+        """Writes the cache entry of a RAW file and evicts the least recently used entries
+        if the cache directory grows above the maximum size.
+
+        :param raw_file: Path of the RAW file
+        :type raw_file: str | Path
+        :param header: JSON serializable header information
+        :type header: dict
+        :param traces: The values of each trace, in the order given in the header. The
+            arrays are written one at a time, so a generator can be used to avoid having
+            all the traces in memory.
+        :type traces: Iterable[numpy.ndarray]
+        :return: Path of the cache entry
+        :rtype: Path
+        """
+        raw_file = Path(raw_file)
+        entry = self.entry_path(raw_file)
+        entry.parent.mkdir(parents=True, exist_ok=True)
+        header = dict(header, version=CACHE_VERSION, key=self._file_key(raw_file))
+        # Written to a temporary file first, so that readers never see a partial entry
+        tmp_entry = entry.with_name(f"{entry.name}.{os.getpid()}.tmp")
+        try:
+            # Same layout as numpy.savez, which needs all the arrays at once
+            with zipfile.ZipFile(tmp_entry, "w", zipfile.ZIP_STORED, allowZip64=True) as zf:
+                members = itertools.chain(
+                    [("header", np.array(json.dumps(header)))],
+                    ((f"trace{i}", np.ascontiguousarray(data)) for i, data in enumerate(traces)),
+                )
+                for name, data in members:
+                    with zf.open(name + ".npy", "w", force_zip64=True) as member:
+                        np.lib.format.write_array(member, data, allow_pickle=False)
+            os.replace(tmp_entry, entry)
+        finally:
+            tmp_entry.unlink(missing_ok=True)
+        _logger.debug("Stored RAW cache entry '%s'", entry)
+        self.evict(entry.parent, keep=entry)
+        return entry
+
+    def evict(self, directory: str | Path, keep: Path | None = None) -> list[Path]:
+        """Deletes the least recently used entries of a directory until its size is
+        within the maximum size.
+
+        :param directory: Directory containing cache entries
+        :type directory: str | Path
+        :param keep: An entry that is not to be deleted, normally the one just written
+        :type keep: Path, optional
+        :return: The deleted entries
+        :rtype: list[Path]
+        """
+        if self.max_size is None:
+            return []
+        entries = []
+        for entry in Path(directory).glob("*" + CACHE_SUFFIX):
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue  # Deleted by someone else in the meantime
+            entries.append((stat.st_mtime, stat.st_size, entry))
+        total_size = sum(size for _, size, _ in entries)
+        deleted = []
+        for _, size, entry in sorted(entries, key=lambda item: item[0]):
+            if total_size <= self.max_size:
+                break
+            if entry == keep:
+                continue
+            try:
+                entry.unlink()
+            except OSError:
+                continue
+            total_size -= size
+            deleted.append(entry)
+            _logger.debug("Evicted RAW cache entry '%s'", entry)
+        return deleted
+
+    def clear(self, directory: str | Path | None = None) -> None:
+        """Deletes all the cache entries of a directory.
+
+        :param directory: Directory to clean. Defaults to the cache directory.
+        :type directory: str | Path, optional
+        """
+        directory = directory or self.cache_dir
+        if directory is None:
+            raise ValueError("A directory is needed when the entries are next to the RAW files")
+        for entry in Path(directory).glob("*" + CACHE_SUFFIX):
+            entry.unlink(missing_ok=True)
+
+    def __repr__(self) -> str:
+        where = self.cache_dir or "next to the RAW files"
+        return f"RawCache({where}, max_size={self.max_size})"
@@ -17,7 +17,183 @@
 # Licence:     refer to the LICENSE file
 # -------------------------------------------------------------------------------
 """Defines base classes for the RAW file data structures."""
-from kupicelib.raw.raw_classes import Axis, TraceRead
+from __future__ import annotations
 
-# Re-export the classes
-__all__ = ["Axis", "TraceRead"]
+from collections.abc import Callable
+from typing import Any
+
+import numpy as np
+from kupicelib.raw.raw_classes import Axis as _Axis
+from kupicelib.raw.raw_classes import SpiceReadException, TraceRead
+
+__all__ = ["Axis", "LazyAxis", "LazyTraceRead", "TraceRead", "find_step_offsets"]
+
+NUMPY_TYPES = {
+    "real": np.dtype("<f4"),
+    "double": np.dtype("<f8"),
+    "complex": np.dtype("<c16"),
+}
+"""Numpy data types used to store each of the RAW file numerical types."""
+
+
+def find_step_offsets(axis_data: np.ndarray[Any, Any]) -> np.ndarray[Any, Any]:
+    """Returns the position of the first point of each step of a stepped RAW file. A new
+    step starts each time the axis returns to its first value.
+
+    :param axis_data: Values of the axis for all the steps
+    :type axis_data: numpy.ndarray
+    :return: Array with the offset of each step, the first being always 0
+    :rtype: numpy.ndarray
+    """
+    if len(axis_data) == 0:
+        return np.zeros(1, dtype=np.int64)
+    return np.flatnonzero(axis_data == axis_data[0]).astype(np.int64)
+
+
+class Axis(_Axis):
+    """Axis of a RAW file. See :py:class:`kupicelib.raw.raw_classes.Axis`.
+
+    The step offsets are found with a single vectorized pass over the axis and stored in
+    a numpy array, so that the slice of each step is found in constant time and the
+    step waves are views on the trace data.
+    """
+
+    step_offsets: Any
+
+    def _data_length(self) -> int:
+        return len(self.data)
+
+    def _set_steps(
+        self, step_info: list[dict[str, Any]], step_offsets: Any | None = None
+    ) -> None:
+        """Sets the step information and the offset of each step.
+
+        :param step_info: Information of each step
+        :param step_offsets: Offset of each step, when already known, for example from
+            the cache. If not given, the offsets are found from the axis values.
+        :raises SpiceReadException: If the number of steps found on the axis doesn't
+            match the step information.
+        """
+        self.step_info = step_info
+        if step_offsets is None:
+            step_offsets = find_step_offsets(self.data)
+        self.step_offsets = np.asarray(step_offsets, dtype=np.int64)
+        if len(self.step_offsets) != len(step_info):
+            raise SpiceReadException(
+                "The file a different number of steps than expected.\n"
+                f"Expecting {len(step_info)} got {len(self.step_offsets)}"
+            )
+
+    def step_offset(self, step: int) -> int:
+        if self.step_info is None:
+            return self._data_length() if step > 0 else 0
+        if step >= len(self.step_offsets):
+            return self._data_length()
+        return int(self.step_offsets[step])
+
+    def step_bounds(self) -> tuple[np.ndarray[Any, Any], np.ndarray[Any, Any]]:
+        """Returns the start and end offsets of all the steps.
+
+        :return: Two arrays, with the offset of the first point of each step and the
+            offset just after its last point
+        :rtype: tuple[numpy.ndarray, numpy.ndarray]
+        """
+        if self.step_info is None:
+            return np.zeros(1, dtype=np.int64), np.full(1, self._data_length())
+        starts = self.step_offsets
+        return starts, np.append(starts[1:], self._data_length())
+
+    def pad_steps(
+        self, values: np.ndarray[Any, Any], fill_value: Any = np.nan
+    ) -> np.ndarray[Any, Any]:
+        """Arranges the values of a trace as a 2-D array with one row per step. The steps
+        shorter than the longest one are padded with ``fill_value``.
+
+        :param values: Values of the trace for all the steps, aligned with this axis
+        :type values: numpy.ndarray
+        :param fill_value: Value used to pad the shorter steps, defaults to NaN
+        :return: Array of shape (number of steps, points of the longest step)
+        :rtype: numpy.ndarray
+        """
+        starts, ends = self.step_bounds()
+        lengths = ends - starts
+        padded = np.full((len(starts), int(lengths.max())), fill_value, dtype=values.dtype)
+        padded[np.arange(padded.shape[1]) < lengths[:, np.newaxis]] = values[: ends[-1]]
+        return padded
+
+
+class _LazyData:
+    """Replaces the ``data`` attribute of a DataSet by a property that only decodes the
+    values on first access.
+
+    The loader is a callable without arguments that returns the numpy array with the
+    trace values. It is called at most once, after which the array is kept.
+    """
+
+    _data: np.ndarray[Any, Any] | None
+    _loader: Callable[[], np.ndarray[Any, Any]] | None
+
+    @property
+    def data(self) -> np.ndarray[Any, Any]:
+        if self._data is None:
+            assert self._loader is not None, "Lazy trace without a loader"
+            self._data = self._loader()
+            self._loader = None
+        return self._data
+
+    @data.setter
+    def data(self, value: np.ndarray[Any, Any]) -> None:
+        self._data = value
+        self._loader = None
+
+    def decode(self) -> np.ndarray[Any, Any]:
+        """Returns the trace values without keeping them, if they weren't loaded yet."""
+        if self._data is not None:
+            return self._data
+        assert self._loader is not None, "Lazy trace without a loader"
+        return self._loader()
+
+    @property
+    def is_loaded(self) -> bool:
+        """True if the trace values were already decoded from the RAW file."""
+        return self._data is not None
+
+
+class LazyAxis(_LazyData, Axis):
+    """Axis whose values are only read from the RAW file when first accessed.
+
+    The length of the axis is known upfront, so that traces of RAW files without steps
+    can be accessed without decoding the axis.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        whattype: str,
+        datalen: int,
+        numerical_type: str,
+        loader: Callable[[], np.ndarray[Any, Any]],
+    ) -> None:
+        super().__init__(name, whattype, 0, numerical_type)
+        self._data = None
+        self._loader = loader
+        self._datalen = datalen
+
+    def _data_length(self) -> int:
+        return self._datalen
+
+
+class LazyTraceRead(_LazyData, TraceRead):
+    """Trace whose values are only read from the RAW file when first accessed."""
+
+    def __init__(
+        self,
+        name: str,
+        whattype: str,
+        axis: Axis | None,
+        numerical_type: str,
+        loader: Callable[[], np.ndarray[Any, Any]],
+    ) -> None:
+        super().__init__(name, whattype, 0, axis, numerical_type)
+        self._data = None
+        self._loader = loader
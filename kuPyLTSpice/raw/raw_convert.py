@@ -0,0 +1,509 @@
+#!/usr/bin/env python
+
+# -------------------------------------------------------------------------------
+#    ____        _   _____ ____        _
+#   |  _ \ _   _| | |_   _/ ___| _ __ (_) ___ ___
+#   | |_) | | | | |   | | \___ \| '_ \| |/ __/ _ \
+#   |  __/| |_| | |___| |  ___) | |_) | | (_|  __/
+#   |_|    \__, |_____|_| |____/| .__/|_|\___\___|
+#          |___/                |_|
+#
+# Name:        raw_convert.py
+# Purpose:     Streaming conversion of RAW files to Parquet and HDF5
+#
+# Licence:     refer to the LICENSE file
+# -------------------------------------------------------------------------------
+"""Converts RAW files to columnar formats, Parquet or HDF5, without loading them
+completely in memory.
+
+The points of a binary RAW file are read in chunks of ``chunk_points`` points by
+:py:class:`RawChunkReader`, and each chunk is appended to the output file. Besides the
+traces, the output has a ``step`` column with the step number of each point and, for
+stepped simulations, one column per stepped parameter, with the values read from the
+log file. Complex traces, from AC analyses, are stored as complex datasets in HDF5 and
+as two columns, ``re(name)`` and ``im(name)``, in Parquet.
+
+Several RAW files, for example the outputs of a :py:class:`kuPyLTSpice.sim.sim_runner.SimRunner`
+batch, can be converted into a single dataset with :py:func:`convert_raw_files`. In Parquet
+the dataset is a directory with one ``run=<name>`` sub-directory per RAW file, as
+expected by the partitioned dataset readers, and in HDF5 it is a file with one group per
+RAW file. The run is named after the RAW file without extension, qualified with its
+directory, ``<directory>-<name>``, when several files have the same name. The parameters
+of each run, for example the component values set by the script, are added as columns
+with the ``run_params`` mapping.
+
+The conversion needs ``pyarrow`` for Parquet and ``h5py`` for HDF5, which are not
+installed with kuPyLTSpice. It can also be run from the command line::
+
+    python -m kuPyLTSpice.raw.raw_convert -o dataset_dir --format parquet *.raw
+
+where ``--run-params params.json`` gives the parameters of each run as a JSON object,
+``{"circuit_1": {"R1": 1000, "corner": "ss"}, ...}``.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+from collections.abc import Iterable, Iterator, Mapping
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+from kupicelib.raw.raw_classes import DummyTrace, SpiceReadException
+
+from kuPyLTSpice.raw.raw_classes import NUMPY_TYPES
+from kuPyLTSpice.raw.raw_read import RawRead, find_binary_start
+
+__all__ = ["RawChunkReader", "convert_raw", "convert_raw_files"]
+
+_logger = logging.getLogger("kupicelib.RawRead")
+
+CHUNK_POINTS = 1_000_000
+"""Default number of points of each chunk."""
+
+FORMATS = {".parquet": "parquet", ".h5": "hdf5", ".hdf5": "hdf5"}
+
+
+class RawChunkReader:
+    """Iterates over the points of a RAW file in chunks of at most ``chunk_points``
+    points. Each chunk is a dictionary with the ``step`` column, the stepped parameters
+    and the selected traces. Only binary files are read in chunks, ASCII files are read
+    completely before being split.
+
+    :param raw_filename: RAW file to read
+    :type raw_filename: str | Path
+    :param traces_to_read: Names or glob patterns of the traces to read, see
+        :py:func:`kuPyLTSpice.raw.raw_read.match_traces`. The axis is always read.
+    :type traces_to_read: str | list[str] | tuple[str, ...]
+    :param chunk_points: Maximum number of points of each chunk
+    :type chunk_points: int
+    :param dialect: RAW file dialect, see :py:class:`kuPyLTSpice.raw.raw_read.RawRead`.
+    :type dialect: str, optional
+    """
+
+    def __init__(
+        self,
+        raw_filename: str | Path,
+        traces_to_read: str | list[str] | tuple[str, ...] = "*",
+        chunk_points: int = CHUNK_POINTS,
+        dialect: str | None = None,
+    ) -> None:
+        self.raw_filename = Path(raw_filename)
+        self.traces_to_read = traces_to_read
+        self.chunk_points = chunk_points
+        self.header = RawRead(
+            self.raw_filename, traces_to_read, dialect, headeronly=True, verbose=False
+        )
+        """Header information. The traces of this object have no values."""
+        self.has_axis = self.header.raw_params["Plotname"] not in (
+            "Operating Point",
+            "Transfer Function",
+        )
+        self.steps: list[dict[str, Any]] | None = None
+        """Stepped parameters of each step, as read from the log file"""
+        if "stepped" in self.header.raw_params["Flags"]:
+            try:
+                self.header._load_step_information(self.raw_filename)
+                self.steps = self.header.steps
+            except SpiceReadException as err:
+                _logger.warning("%s\nThe step parameters won't be converted", err)
+
+    @property
+    def trace_names(self) -> list[str]:
+        """Names of the traces read, the axis first."""
+        return [
+            trace.name for trace in self.header._traces if not isinstance(trace, DummyTrace)
+        ]
+
+    def __iter__(self) -> Iterator[dict[str, np.ndarray[Any, Any]]]:
+        traces = self._read_binary() if self.header.raw_type == "Binary:" else self._read_all()
+        step_params = {}
+        if self.steps:
+            step_params = {
+                name: np.asarray([step[name] for step in self.steps]) for name in self.steps[0]
+            }
+        first_value = None
+        steps_seen = 0
+        start = 0
+        for chunk in traces:
+            count = len(next(iter(chunk.values())))
+            if "stepped" not in self.header.raw_params["Flags"]:
+                step = np.zeros(count, dtype=np.int64)
+            elif not self.has_axis:
+                step = np.arange(start, start + count, dtype=np.int64)
+            else:
+                # A new step starts each time the axis returns to its first value
+                axis = chunk[self.trace_names[0]]
+                if first_value is None:
+                    first_value = axis[0]
+                starts = axis == first_value
+                step = steps_seen + np.cumsum(starts, dtype=np.int64) - 1
+                steps_seen += int(np.count_nonzero(starts))
+            start += count
+            columns = {"step": step}
+            if step_params:
+                if step[-1] >= len(self.steps or []):
+                    raise SpiceReadException(
+                        f"'{self.raw_filename}' has more steps than its log file"
+                    )
+                columns.update((name, values[step]) for name, values in step_params.items())
+            for name, data in chunk.items():
+                # LTspice marks some points with a negative time, as done in Axis.get_wave()
+                columns[name] = np.abs(data) if name == "time" else data
+            yield columns
+
+    def _read_binary(self) -> Iterator[dict[str, np.ndarray[Any, Any]]]:
+        """Reads the selected traces of a binary file, one chunk at a time."""
+        traces = self.header._traces
+        n_points = self.header.nPoints
+        dtypes = [NUMPY_TYPES[trace.numerical_type] for trace in traces]
+        offsets = np.cumsum([0] + [dtype.itemsize for dtype in dtypes[:-1]]).tolist()
+        block_size = sum(dtype.itemsize for dtype in dtypes)
+        selected = [i for i, trace in enumerate(traces) if not isinstance(trace, DummyTrace)]
+        binary_start = find_binary_start(self.raw_filename, self.header.encoding)
+        fast_access = "fastaccess" in self.header.raw_params["Flags"].lower()
+        records = np.dtype(
+            {
+                "names": [f"t{i}" for i in selected],
+                "formats": [dtypes[i] for i in selected],
+                "offsets": [offsets[i] for i in selected],
+                "itemsize": block_size,
+            }
+        )
+        for start in range(0, n_points, self.chunk_points):
+            count = min(self.chunk_points, n_points - start)
+            if fast_access:
+                yield {
+                    traces[i].name: np.fromfile(
+                        self.raw_filename,
+                        dtype=dtypes[i],
+                        count=count,
+                        offset=binary_start + offsets[i] * n_points + start * dtypes[i].itemsize,
+                    )
+                    for i in selected
+                }
+            else:
+                chunk = np.fromfile(
+                    self.raw_filename,
+                    dtype=records,
+                    count=count,
+                    offset=binary_start + start * block_size,
+                )
+                yield {traces[i].name: np.ascontiguousarray(chunk[f"t{i}"]) for i in selected}
+
+    def _read_all(self) -> Iterator[dict[str, np.ndarray[Any, Any]]]:
+        """Reads a complete ASCII file and splits it in chunks."""
+        raw = RawRead(self.raw_filename, self.traces_to_read, verbose=False)
+        data = {name: raw.get_trace(name).data for name in self.trace_names}
+        for start in range(0, raw.nPoints, self.chunk_points):
+            yield {name: values[start : start + self.chunk_points] for name, values in data.items()}
+
+
+def _write_parquet(
+    chunks: Iterable[dict[str, np.ndarray[Any, Any]]], destination: Path, compression: str | None
+) -> int:
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError(
+            "The 'pyarrow' module is required to write Parquet files.\n"
+            "Use 'pip install pyarrow' to install it."
+        ) from None
+    writer = None
+    points = 0
+    try:
+        for chunk in chunks:
+            columns = {}
+            for name, data in chunk.items():
+                if np.iscomplexobj(data):
+                    columns[f"re({name})"] = data.real
+                    columns[f"im({name})"] = data.imag
+                else:
+                    columns[name] = data
+            table = pa.table(columns)
+            if writer is None:
+                writer = pq.ParquetWriter(str(destination), table.schema, compression=compression)
+            writer.write_table(table)
+            points += table.num_rows
+    finally:
+        if writer is not None:
+            writer.close()
+    return points
+
+
+def _write_hdf5(
+    chunks: Iterable[dict[str, np.ndarray[Any, Any]]],
+    destination: Path,
+    group_name: str,
+    compression: str | None,
+    attributes: dict[str, Any],
+) -> int:
+    try:
+        import h5py
+    except ImportError:
+        raise ImportError(
+            "The 'h5py' module is required to write HDF5 files.\n"
+            "Use 'pip install h5py' to install it."
+        ) from None
+    points = 0
+    with h5py.File(destination, "a") as h5_file:
+        if group_name in h5_file:
+            del h5_file[group_name]
+        group = h5_file.create_group(group_name)
+        group.attrs.update(attributes)
+        for chunk in chunks:
+            count = 0
+            for name, data in chunk.items():
+                # A slash would create a sub-group
+                name = name.replace("/", "|")
+                if data.dtype.kind == "U":
+                    data = np.char.encode(data, "utf-8")
+                if name not in group:
+                    group.create_dataset(
+                        name,
+                        shape=(0,),
+                        maxshape=(None,),
+                        dtype=data.dtype,
+                        chunks=(min(max(len(data), 1), CHUNK_POINTS),),
+                        compression=compression,
+                    )
+                dataset = group[name]
+                dataset.resize(points + len(data), axis=0)
+                dataset[points:] = data
+                count = len(data)
+            points += count
+    return points
+
+
+def convert_raw(
+    raw_filename: str | Path,
+    destination: str | Path,
+    file_format: str | None = None,
+    traces_to_read: str | list[str] | tuple[str, ...] = "*",
+    chunk_points: int = CHUNK_POINTS,
+    run: str | None = None,
+    run_params: dict[str, Any] | None = None,
+    compression: str | None = None,
+) -> Path:
+    """Converts a RAW file to Parquet or HDF5, one chunk of points at a time.
+
+    :param raw_filename: RAW file to convert
+    :type raw_filename: str | Path
+    :param destination: Output file. When ``run`` is given in Parquet format, this is the
+        directory of the partitioned dataset instead.
+    :type destination: str | Path
+    :param file_format: "parquet" or "hdf5". By default, deduced from the extension of
+        the destination.
+    :type file_format: str, optional
+    :param traces_to_read: Names or glob patterns of the traces to convert
+    :type traces_to_read: str | list[str] | tuple[str, ...]
+    :param chunk_points: Maximum number of points read at a time
+    :type chunk_points: int
+    :param run: Name of the run in a dataset of several RAW files. In Parquet, the file
+        is written in the ``run=<run>`` sub-directory of the destination. In HDF5, it is
+        the name of the group, which defaults to the name of the RAW file.
+    :type run: str, optional
+    :param run_params: Values added as constant columns, for example the parameters of
+        the netlist used in this run
+    :type run_params: dict, optional
+    :param compression: Compression of the output, as accepted by pyarrow or h5py
+    :type compression: str, optional
+    :raises ImportError: If the module needed by the output format is not installed
+    :return: The file written
+    :rtype: Path
+    """
+    raw_filename = Path(raw_filename)
+    destination = Path(destination)
+    if file_format is None:
+        file_format = FORMATS.get(destination.suffix.lower())
+        if file_format is None:
+            raise ValueError(f"Can't deduce the output format of '{destination}'")
+    reader = RawChunkReader(raw_filename, traces_to_read, chunk_points)
+
+    def chunks() -> Iterator[dict[str, np.ndarray[Any, Any]]]:
+        for chunk in reader:
+            count = len(chunk["step"])
+            for name, value in (run_params or {}).items():
+                chunk[name] = np.full(count, value)
+            yield chunk
+
+    if file_format == "parquet":
+        if run is not None:
+            destination = destination / f"run={run}" / f"{raw_filename.stem}.parquet"
+        destination.parent.mkdir(parents=True, exist_ok=True)
+        points = _write_parquet(chunks(), destination, compression)
+    elif file_format == "hdf5":
+        destination.parent.mkdir(parents=True, exist_ok=True)
+        attributes = {
+            "raw_file": str(raw_filename),
+            "plot_name": reader.header.raw_params["Plotname"],
+            "flags": reader.header.raw_params["Flags"],
+        }
+        points = _write_hdf5(
+            chunks(), destination, run or raw_filename.stem, compression, attributes
+        )
+    else:
+        raise ValueError(f"Unsupported format '{file_format}'. Use 'parquet' or 'hdf5'.")
+    _logger.info("Converted %d points of '%s' to '%s'", points, raw_filename, destination)
+    return destination
+
+
+def _index_run_params(
+    run_params: Mapping[str | Path, dict[str, Any]] | None,
+) -> dict[str, dict[str, Any]]:
+    """Indexes the run parameters by the normalized paths or run names."""
+    return {str(Path(key)): params for key, params in (run_params or {}).items()}
+
+
+def _run_names(raw_files: list[Path]) -> list[str]:
+    """Names the runs after the RAW files without extension. The files with the same
+    name are told apart by their directory.
+
+    :raises ValueError: If two files still have the same run name
+    """
+    stems = [path.stem for path in raw_files]
+    names = [
+        f"{path.parent.name}-{path.stem}" if stems.count(path.stem) > 1 else path.stem
+        for path in raw_files
+    ]
+    runs: dict[str, Path] = {}
+    for path, name in zip(raw_files, names, strict=True):
+        if name in runs:
+            raise ValueError(f"'{runs[name]}' and '{path}' would both be written as run '{name}'")
+        runs[name] = path
+    return names
+
+
+def _find_run_params(
+    raw_file: str | Path, params_by_key: dict[str, dict[str, Any]], run: str | None = None
+) -> dict[str, Any] | None:
+    """Returns the parameters of a RAW file, given by its path or by its run name. The
+    file name is only used when the run is named after it, that is when it is unique."""
+    path = Path(raw_file)
+    keys = [str(path), str(path.resolve())]
+    if run is None or run == path.stem:
+        keys += [path.name, path.stem]
+    else:
+        keys.append(run)
+    for key in keys:
+        if key in params_by_key:
+            return params_by_key[key]
+    return None
+
+
+def convert_raw_files(
+    raw_files: Iterable[str | Path],
+    destination: str | Path,
+    file_format: str = "parquet",
+    traces_to_read: str | list[str] | tuple[str, ...] = "*",
+    chunk_points: int = CHUNK_POINTS,
+    compression: str | None = None,
+    run_params: Mapping[str | Path, dict[str, Any]] | None = None,
+) -> list[Path]:
+    """Converts several RAW files into a single dataset, the name of each RAW file being
+    used as run name, see :py:func:`convert_raw`. Files with the same name in different
+    directories are named ``<directory>-<name>``.
+
+    :param raw_files: RAW files to convert
+    :type raw_files: Iterable[str | Path]
+    :param destination: Directory of the dataset in Parquet, file in HDF5
+    :type destination: str | Path
+    :param file_format: "parquet" or "hdf5"
+    :type file_format: str
+    :param traces_to_read: Names or glob patterns of the traces to convert
+    :type traces_to_read: str | list[str] | tuple[str, ...]
+    :param chunk_points: Maximum number of points read at a time
+    :type chunk_points: int
+    :param compression: Compression of the output, as accepted by pyarrow or h5py
+    :type compression: str, optional
+    :param run_params: Parameters of each run, added as constant columns. The keys are
+        the RAW files, or their run names. All the runs should have the same parameters,
+        so that they form a single table.
+    :type run_params: Mapping[str | Path, dict], optional
+    :raises ValueError: If two RAW files would have the same run name, before anything
+        is written
+    :return: The files written
+    :rtype: list[Path]
+    """
+    raw_files = [Path(raw_file) for raw_file in raw_files]
+    runs = _run_names(raw_files)
+    params_by_key = _index_run_params(run_params)
+    written = []
+    for raw_file, run in zip(raw_files, runs, strict=True):
+        params = _find_run_params(raw_file, params_by_key, run)
+        if params is None and params_by_key:
+            _logger.warning("No run parameters given for '%s'", raw_file)
+        written.append(
+            convert_raw(
+                raw_file,
+                destination,
+                file_format,
+                traces_to_read,
+                chunk_points,
+                run=run,
+                run_params=params,
+                compression=compression,
+            )
+        )
+    return written
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Converts RAW files to Parquet or HDF5, with the step number and the "
+        "stepped parameters as columns."
+    )
+    parser.add_argument("raw_files", nargs="+", type=Path, help="RAW files to convert")
+    parser.add_argument(
+        "-o",
+        "--output",
+        type=Path,
+        required=True,
+        help="Output file, or the dataset directory when converting several files to Parquet",
+    )
+    parser.add_argument("-f", "--format", choices=["parquet", "hdf5"], default=None)
+    parser.add_argument(
+        "-t",
+        "--traces",
+        nargs="+",
+        default="*",
+        help="Traces to convert. Glob patterns such as 'I(*)' are accepted.",
+    )
+    parser.add_argument("--chunk-points", type=int, default=CHUNK_POINTS)
+    parser.add_argument("--compression", default=None)
+    parser.add_argument(
+        "--run-params",
+        type=Path,
+        default=None,
+        help="JSON file mapping the RAW files, or their names without extension, to the "
+        "parameters of the run, added as columns",
+    )
+    args = parser.parse_args()
+    run_params = json.loads(args.run_params.read_text()) if args.run_params else None
+    if len(args.raw_files) == 1 and args.output.suffix.lower() in FORMATS:
+        raw_file = args.raw_files[0]
+        convert_raw(
+            raw_file,
+            args.output,
+            args.format,
+            args.traces,
+            args.chunk_points,
+            run_params=_find_run_params(raw_file, _index_run_params(run_params)),
+            compression=args.compression,
+        )
+    else:
+        convert_raw_files(
+            args.raw_files,
+            args.output,
+            args.format or FORMATS.get(args.output.suffix.lower(), "parquet"),
+            args.traces,
+            args.chunk_points,
+            compression=args.compression,
+            run_params=run_params,
+        )
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
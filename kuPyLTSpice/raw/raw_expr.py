@@ -0,0 +1,497 @@
+#!/usr/bin/env python
+
+# -------------------------------------------------------------------------------
+#    ____        _   _____ ____        _
+#   |  _ \ _   _| | |_   _/ ___| _ __ (_) ___ ___
+#   | |_) | | | | |   | | \___ \| '_ \| |/ __/ _ \
+#   |  __/| |_| | |___| |  ___) | |_) | | (_|  __/
+#   |_|    \__, |_____|_| |____/| .__/|_|\___\___|
+#          |___/                |_|
+#
+# Name:        raw_expr.py
+# Purpose:     Lazy expressions over the traces of RAW files, evaluated in chunks
+#
+# Licence:     refer to the LICENSE file
+# -------------------------------------------------------------------------------
+"""Lazy expressions over the traces of a RAW file.
+
+An expression is built with :py:func:`ref` and the usual arithmetic operators, without
+reading anything. It is only evaluated by :py:func:`reduce_expressions` or
+:py:func:`write_expressions`, which read the file in chunks of ``chunk_points`` points
+with a :py:class:`kuPyLTSpice.raw.raw_convert.RawChunkReader`. Each intermediate
+result only has the size of a chunk, so the memory used doesn't depend on the length of
+the traces.
+
+Example::
+
+    from kuPyLTSpice.raw.raw_expr import ref, reduce_expressions
+
+    power = ref("V(a)") * ref("I(R1)")
+    results = reduce_expressions("circuit.raw", {"P(R1)": power}, ["mean", "max"])
+    results["P(R1)"]["mean"]  # Average power of each step
+
+Besides the traces, the expressions can use the axis, like ``ref("time")``, and the
+stepped parameters, like ``ref("rload")``.
+"""
+from __future__ import annotations
+
+import logging
+from collections.abc import Callable, Iterable, Iterator, Mapping
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+from kuPyLTSpice.raw.raw_convert import RawChunkReader
+from kuPyLTSpice.raw.raw_write import RawStreamWrite
+
+__all__ = [
+    "REDUCERS",
+    "Expr",
+    "iter_expressions",
+    "reduce_expressions",
+    "ref",
+    "write_expressions",
+]
+
+_logger = logging.getLogger("kupicelib.RawRead")
+
+CHUNK_POINTS = 65536
+"""Default number of points evaluated at a time, small enough for the intermediate
+results to stay in the processor cache."""
+
+REDUCERS = ("mean", "rms", "max", "min", "integral")
+
+
+class Expr:
+    """Node of a lazy expression. Expressions are combined with the arithmetic
+    operators, with numbers or with other expressions, and with :py:meth:`apply` for
+    numpy functions.
+    """
+
+    # Makes numpy scalars defer to the reflected operators of this class
+    __array_ufunc__ = None
+
+    def evaluate(
+        self,
+        columns: Mapping[str, np.ndarray[Any, Any]],
+        memo: dict[int, np.ndarray[Any, Any]] | None = None,
+    ) -> np.ndarray[Any, Any]:
+        """Computes the expression on a chunk of data.
+
+        :param columns: Values of the traces, by name
+        :type columns: Mapping[str, numpy.ndarray]
+        :param memo: Results of the sub-expressions already computed on this chunk, so
+            that sub-expressions shared by several expressions are computed once.
+        :type memo: dict, optional
+        :return: The values of the expression
+        :rtype: numpy.ndarray
+        """
+        if memo is None:
+            memo = {}
+        key = id(self)
+        if key not in memo:
+            memo[key] = self._compute(columns, memo)
+        return memo[key]
+
+    def _compute(
+        self, columns: Mapping[str, np.ndarray[Any, Any]], memo: dict[int, np.ndarray[Any, Any]]
+    ) -> np.ndarray[Any, Any]:
+        raise NotImplementedError
+
+    def names(self) -> set[str]:
+        """Returns the names of the traces used by the expression."""
+        return set()
+
+    def apply(self, function: Callable[..., Any], label: str | None = None) -> Expr:
+        """Applies a numpy function, like ``np.sqrt`` or ``np.angle``, to the values.
+
+        :param function: Function that takes an array and returns an array of the same
+            length
+        :type function: Callable
+        :param label: Name of the function in the text of the expression
+        :type label: str, optional
+        :return: A new expression
+        :rtype: Expr
+        """
+        return _Op(function, label or getattr(function, "__name__", "f"), (self,))
+
+    @property
+    def real(self) -> Expr:
+        return self.apply(np.real, "re")
+
+    @property
+    def imag(self) -> Expr:
+        return self.apply(np.imag, "im")
+
+    def __abs__(self) -> Expr:
+        return self.apply(np.abs, "abs")
+
+    def __neg__(self) -> Expr:
+        return _Op(np.negative, "-", (self,))
+
+    def __add__(self, other: Any) -> Expr:
+        return _Op(np.add, "+", (self, _as_expr(other)))
+
+    def __radd__(self, other: Any) -> Expr:
+        return _Op(np.add, "+", (_as_expr(other), self))
+
+    def __sub__(self, other: Any) -> Expr:
+        return _Op(np.subtract, "-", (self, _as_expr(other)))
+
+    def __rsub__(self, other: Any) -> Expr:
+        return _Op(np.subtract, "-", (_as_expr(other), self))
+
+    def __mul__(self, other: Any) -> Expr:
+        return _Op(np.multiply, "*", (self, _as_expr(other)))
+
+    def __rmul__(self, other: Any) -> Expr:
+        return _Op(np.multiply, "*", (_as_expr(other), self))
+
+    def __truediv__(self, other: Any) -> Expr:
+        return _Op(np.true_divide, "/", (self, _as_expr(other)))
+
+    def __rtruediv__(self, other: Any) -> Expr:
+        return _Op(np.true_divide, "/", (_as_expr(other), self))
+
+    def __pow__(self, other: Any) -> Expr:
+        return _Op(np.power, "**", (self, _as_expr(other)))
+
+    def __rpow__(self, other: Any) -> Expr:
+        return _Op(np.power, "**", (_as_expr(other), self))
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({self})"
+
+
+class _Ref(Expr):
+    """A trace, the axis or a stepped parameter."""
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+
+    def _compute(
+        self, columns: Mapping[str, np.ndarray[Any, Any]], memo: dict[int, np.ndarray[Any, Any]]
+    ) -> np.ndarray[Any, Any]:
+        try:
+            return columns[self.name]
+        except KeyError:
+            raise KeyError(f"Trace '{self.name}' not found") from None
+
+    def names(self) -> set[str]:
+        return {self.name}
+
+    def __str__(self) -> str:
+        return self.name
+
+
+class _Const(Expr):
+    def __init__(self, value: Any) -> None:
+        self.value = value
+
+    def _compute(
+        self, columns: Mapping[str, np.ndarray[Any, Any]], memo: dict[int, np.ndarray[Any, Any]]
+    ) -> np.ndarray[Any, Any]:
+        return np.asarray(self.value)
+
+    def __str__(self) -> str:
+        return repr(self.value)
+
+
+class _Op(Expr):
+    def __init__(self, function: Callable[..., Any], label: str, operands: tuple[Expr, ...]):
+        self.function = function
+        self.label = label
+        self.operands = operands
+
+    def _compute(
+        self, columns: Mapping[str, np.ndarray[Any, Any]], memo: dict[int, np.ndarray[Any, Any]]
+    ) -> np.ndarray[Any, Any]:
+        return self.function(*(operand.evaluate(columns, memo) for operand in self.operands))
+
+    def names(self) -> set[str]:
+        return set().union(*(operand.names() for operand in self.operands))
+
+    def __str__(self) -> str:
+        if len(self.operands) == 2:
+            return f"({self.operands[0]}{self.label}{self.operands[1]})"
+        if self.label == "-":
+            return f"-{self.operands[0]}"
+        return f"{self.label}({', '.join(str(operand) for operand in self.operands)})"
+
+
+def _as_expr(value: Any) -> Expr:
+    return value if isinstance(value, Expr) else _Const(value)
+
+
+def ref(name: str) -> Expr:
+    """Returns an expression with the values of a trace, of the axis or of a stepped
+    parameter.
+
+    :param name: Name of the trace, like "V(out)" or "time", or of the stepped parameter
+    :type name: str
+    :return: The expression
+    :rtype: Expr
+    """
+    return _Ref(name)
+
+
+def _named(expressions: Mapping[str, Expr] | Iterable[Expr]) -> dict[str, Expr]:
+    if isinstance(expressions, Mapping):
+        return dict(expressions)
+    return {str(expression): expression for expression in expressions}
+
+
+def _reader(
+    raw_filename: str | Path, named: dict[str, Expr], chunk_points: int, dialect: str | None
+) -> RawChunkReader:
+    """Returns a reader of the traces used by the expressions. The names that aren't
+    traces, like the stepped parameters, are ignored by the selection."""
+    names = sorted(set().union(*(expression.names() for expression in named.values())))
+    return RawChunkReader(raw_filename, names, chunk_points, dialect)
+
+
+def _evaluate(
+    reader: RawChunkReader, named: dict[str, Expr]
+) -> Iterator[dict[str, np.ndarray[Any, Any]]]:
+    axis_name = reader.trace_names[0] if reader.has_axis else None
+    for columns in reader:
+        memo: dict[int, np.ndarray[Any, Any]] = {}
+        chunk = {"step": columns["step"]}
+        if axis_name is not None:
+            chunk[axis_name] = columns[axis_name]
+        length = len(columns["step"])
+        for name, expression in named.items():
+            chunk[name] = np.broadcast_to(expression.evaluate(columns, memo), length)
+        yield chunk
+
+
+def iter_expressions(
+    raw_filename: str | Path,
+    expressions: Mapping[str, Expr] | Iterable[Expr],
+    chunk_points: int = CHUNK_POINTS,
+    dialect: str | None = None,
+) -> Iterator[dict[str, np.ndarray[Any, Any]]]:
+    """Evaluates expressions on a RAW file, one chunk of points at a time. Only the
+    traces used by the expressions are read.
+
+    :param raw_filename: RAW file to read
+    :type raw_filename: str | Path
+    :param expressions: The expressions, by name. When a list is given, the text of
+        each expression is used as its name.
+    :type expressions: Mapping[str, Expr] | Iterable[Expr]
+    :param chunk_points: Number of points evaluated at a time
+    :type chunk_points: int
+    :param dialect: RAW file dialect, see :py:class:`kuPyLTSpice.raw.raw_read.RawRead`.
+    :type dialect: str, optional
+    :return: For each chunk, the ``step`` column, the axis, if the file has one, and the
+        value of each expression
+    :rtype: Iterator[dict[str, numpy.ndarray]]
+    """
+    named = _named(expressions)
+    yield from _evaluate(_reader(raw_filename, named, chunk_points, dialect), named)
+
+
+def _per_step(
+    function: np.ufunc, values: np.ndarray[Any, Any], steps: np.ndarray[Any, Any]
+) -> tuple[np.ndarray[Any, Any], np.ndarray[Any, Any]]:
+    """Reduces the values of each run of points of the same step. As the points of a
+    step are consecutive, each step is reduced once."""
+    starts = np.concatenate([[0], np.flatnonzero(np.diff(steps)) + 1])
+    return steps[starts], function.reduceat(values, starts)
+
+
+class _StepReduction:
+    """Accumulates the reductions of one expression over the chunks, per step."""
+
+    def __init__(self, complex_values: bool) -> None:
+        dtype = np.complex128 if complex_values else np.float64
+        self.count = np.zeros(0)
+        self.total = np.zeros(0, dtype=dtype)
+        self.squares = np.zeros(0)
+        self.maximum = np.zeros(0)
+        self.minimum = np.zeros(0)
+        self.area = np.zeros(0, dtype=dtype)
+        self.area_squared = np.zeros(0)
+        self.span = np.zeros(0)
+
+    def _grow(self, n_steps: int) -> None:
+        extra = n_steps - len(self.count)
+        if extra <= 0:
+            return
+        for name, fill in (
+            ("count", 0),
+            ("total", 0),
+            ("squares", 0),
+            ("maximum", -np.inf),
+            ("minimum", np.inf),
+            ("area", 0),
+            ("area_squared", 0),
+            ("span", 0),
+        ):
+            array = getattr(self, name)
+            setattr(self, name, np.concatenate([array, np.full(extra, fill, dtype=array.dtype)]))
+
+    def add(
+        self,
+        steps: np.ndarray[Any, Any],
+        values: np.ndarray[Any, Any],
+        axis: np.ndarray[Any, Any] | None,
+        previous: tuple[int, Any, Any] | None,
+    ) -> None:
+        self._grow(int(steps[-1]) + 1)
+        magnitude = np.abs(values) if np.iscomplexobj(values) else values
+        squared = magnitude**2
+        index, counts = _per_step(np.add, np.ones(len(steps)), steps)
+        self.count[index] += counts
+        self.total[index] += _per_step(np.add, values, steps)[1]
+        self.squares[index] += _per_step(np.add, squared, steps)[1]
+        self.maximum[index] = np.maximum(
+            self.maximum[index], _per_step(np.maximum, magnitude, steps)[1]
+        )
+        self.minimum[index] = np.minimum(
+            self.minimum[index], _per_step(np.minimum, magnitude, steps)[1]
+        )
+        if axis is None:
+            return
+        # Trapezoids between consecutive points of the same step, including the last
+        # point of the previous chunk
+        if previous is not None and previous[0] == steps[0]:
+            steps = np.concatenate([[previous[0]], steps])
+            axis = np.concatenate([[previous[1]], axis])
+            values = np.concatenate([[previous[2]], values])
+            squared = np.concatenate([[abs(previous[2]) ** 2], squared])
+        if len(steps) < 2:
+            return
+        width = np.where(steps[1:] == steps[:-1], np.diff(axis), 0)
+        index, area = _per_step(np.add, width * (values[1:] + values[:-1]) / 2, steps[1:])
+        self.area[index] += area
+        self.area_squared[index] += _per_step(
+            np.add, width * (squared[1:] + squared[:-1]) / 2, steps[1:]
+        )[1]
+        self.span[index] += _per_step(np.add, width, steps[1:])[1]
+
+    def result(self, reducer: str, has_axis: bool) -> np.ndarray[Any, Any]:
+        """Value of a reducer for each step. Without an axis, or for steps with a single
+        point, the mean and the RMS are computed over the points instead of over time."""
+        timed = self.span > 0
+        span = np.where(timed, self.span, 1)
+        count = np.maximum(self.count, 1)
+        if reducer == "mean":
+            return np.where(timed, self.area / span, self.total / count)
+        if reducer == "rms":
+            return np.sqrt(np.where(timed, self.area_squared / span, self.squares / count))
+        if reducer == "max":
+            return self.maximum
+        if reducer == "min":
+            return self.minimum
+        if reducer == "integral":
+            if not has_axis:
+                raise ValueError("The integral needs a file with an axis")
+            return self.area
+        raise ValueError(f"Unknown reducer '{reducer}'. Use one of {REDUCERS}")
+
+
+def reduce_expressions(
+    raw_filename: str | Path,
+    expressions: Mapping[str, Expr] | Iterable[Expr],
+    reducers: Iterable[str] = REDUCERS,
+    chunk_points: int = CHUNK_POINTS,
+    dialect: str | None = None,
+) -> dict[str, dict[str, np.ndarray[Any, Any]]]:
+    """Evaluates expressions on a RAW file and reduces them to one value per step,
+    without keeping more than a chunk of points in memory.
+
+    The reducers are:
+
+    + "mean": average over the axis, using the trapezoidal rule
+    + "rms": root mean square over the axis, using the trapezoidal rule
+    + "max" and "min": extreme values. The magnitude is used for complex values.
+    + "integral": integral over the axis, using the trapezoidal rule
+
+    :param raw_filename: RAW file to read
+    :type raw_filename: str | Path
+    :param expressions: The expressions, by name. When a list is given, the text of
+        each expression is used as its name.
+    :type expressions: Mapping[str, Expr] | Iterable[Expr]
+    :param reducers: Reducers to compute
+    :type reducers: Iterable[str]
+    :param chunk_points: Number of points evaluated at a time
+    :type chunk_points: int
+    :param dialect: RAW file dialect, see :py:class:`kuPyLTSpice.raw.raw_read.RawRead`.
+    :type dialect: str, optional
+    :raises ValueError: If a reducer is unknown, or if the integral is asked for a file
+        without an axis
+    :return: For each expression and each reducer, an array with one value per step
+    :rtype: dict[str, dict[str, numpy.ndarray]]
+    """
+    reducers = list(reducers)
+    for reducer in reducers:
+        if reducer not in REDUCERS:
+            raise ValueError(f"Unknown reducer '{reducer}'. Use one of {REDUCERS}")
+    named = _named(expressions)
+    reader = _reader(raw_filename, named, chunk_points, dialect)
+    axis_name = reader.trace_names[0] if reader.has_axis else None
+    reductions: dict[str, _StepReduction] = {}
+    previous: dict[str, tuple[int, Any, Any]] = {}
+    for chunk in _evaluate(reader, named):
+        steps = chunk["step"]
+        axis = chunk[axis_name].real if axis_name is not None else None
+        for name in named:
+            values = chunk[name]
+            if name not in reductions:
+                reductions[name] = _StepReduction(np.iscomplexobj(values))
+            reductions[name].add(steps, values, axis, previous.get(name))
+            if axis is not None:
+                previous[name] = (steps[-1], axis[-1], values[-1])
+    return {
+        name: {reducer: reduction.result(reducer, reader.has_axis) for reducer in reducers}
+        for name, reduction in reductions.items()
+    }
+
+
+def write_expressions(
+    raw_filename: str | Path,
+    expressions: Mapping[str, Expr] | Iterable[Expr],
+    writer: RawStreamWrite,
+    chunk_points: int = CHUNK_POINTS,
+    dialect: str | None = None,
+) -> int:
+    """Evaluates expressions on a RAW file and writes them as the traces of a new RAW
+    file, one chunk of points at a time. The axis of the source file is written first.
+
+    :param raw_filename: RAW file to read
+    :type raw_filename: str | Path
+    :param expressions: The expressions, by name. When a list is given, the text of
+        each expression is used as its name.
+    :type expressions: Mapping[str, Expr] | Iterable[Expr]
+    :param writer: Writer of the new file, without any trace declared
+    :type writer: RawStreamWrite
+    :param chunk_points: Number of points evaluated at a time
+    :type chunk_points: int
+    :param dialect: RAW file dialect, see :py:class:`kuPyLTSpice.raw.raw_read.RawRead`.
+    :type dialect: str, optional
+    :raises ValueError: If the file has no axis
+    :return: Number of points written
+    :rtype: int
+    """
+    named = _named(expressions)
+    reader = _reader(raw_filename, named, chunk_points, dialect)
+    if not reader.has_axis:
+        raise ValueError(f"'{raw_filename}' has no axis")
+    axis_name = reader.trace_names[0]
+    flags = reader.header.raw_params["Flags"].split()
+    points = 0
+    for chunk in _evaluate(reader, named):
+        if points == 0:
+            # The numerical types are only known once the first chunk is evaluated
+            complex_data = any(np.iscomplexobj(chunk[name]) for name in named)
+            writer.add_trace(axis_name, numerical_type="complex" if complex_data else "double")
+            writer.flag_log = "log" in flags
+            writer.flag_stepped = "stepped" in flags
+            for name in named:
+                writer.add_trace(name, "current" if name.startswith(("I(", "Ix(")) else "voltage")
+        writer.append(chunk[axis_name], *(chunk[name] for name in named))
+        points += len(chunk["step"])
+    _logger.info("Wrote %d points of %d expressions", points, len(named))
+    return points
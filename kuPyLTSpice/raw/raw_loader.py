@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+
+# -------------------------------------------------------------------------------
+#    ____        _   _____ ____        _
+#   |  _ \ _   _| | |_   _/ ___| _ __ (_) ___ ___
+#   | |_) | | | | |   | | \___ \| '_ \| |/ __/ _ \
+#   |  __/| |_| | |___| |  ___) | |_) | | (_|  __/
+#   |_|    \__, |_____|_| |____/| .__/|_|\___\___|
+#          |___/                |_|
+#
+# Name:        raw_loader.py
+# Purpose:     Read the same traces from many RAW files in parallel
+#
+# Licence:     refer to the LICENSE file
+# -------------------------------------------------------------------------------
+"""Reads the same traces from many RAW files, for example all the outputs of a SimRunner
+batch, using a pool of threads or processes.
+
+Example::
+
+    from kuPyLTSpice.raw.raw_loader import read_traces
+
+    data = read_traces("./temp/*.raw", ["time", "V(out)"])
+    vout = data["V(out)"]  # (n_runs, n_points) array if all runs have the same length
+"""
+from __future__ import annotations
+
+import glob
+import logging
+import os
+from collections.abc import Iterable, Sequence
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+from kuPyLTSpice.raw.raw_read import RawRead
+
+__all__ = ["expand_raw_files", "read_traces"]
+
+_logger = logging.getLogger("kupicelib.RawRead")
+
+
+def expand_raw_files(raw_files: str | Path | Iterable[str | Path]) -> list[Path]:
+    """Converts a glob pattern or a list of files into a list of paths. A glob pattern
+    is expanded in sorted order.
+
+    :param raw_files: A glob pattern, like "./temp/*.raw", or a list of files
+    :type raw_files: str | Path | Iterable[str | Path]
+    :return: The list of files
+    :rtype: list[Path]
+    """
+    if isinstance(raw_files, str | Path):
+        return [Path(name) for name in sorted(glob.glob(str(raw_files)))]
+    return [Path(name) for name in raw_files]
+
+
+def _read_file_traces(
+    raw_file: Path, traces: Sequence[str], step: int
+) -> list[np.ndarray[Any, Any]]:
+    """Reads the given traces of a single RAW file. This is the work done in the pool."""
+    raw = RawRead(raw_file, list(traces), lazy=True, verbose=False)
+    # Copy, so that the memory-mapped file is released once the reader is discarded
+    return [np.array(raw.get_wave(trace, step)) for trace in traces]
+
+
+def read_traces(
+    raw_files: str | Path | Iterable[str | Path],
+    traces: str | Sequence[str],
+    *,
+    step: int = 0,
+    max_workers: int | None = None,
+    use_processes: bool = False,
+) -> dict[str, np.ndarray[Any, Any] | list[np.ndarray[Any, Any]]]:
+    """Reads the same traces from several RAW files in parallel.
+
+    For each trace, the result is a 2-D array of shape (n_runs, n_points), where the rows
+    follow the order of the files. If the runs don't all have the same number of points,
+    a list with one array per file is returned instead.
+
+    :param raw_files: A glob pattern or a list of RAW files
+    :type raw_files: str | Path | Iterable[str | Path]
+    :param traces: Name or list of names of the traces to read. The axis is read like any
+        other trace, ex: "time"
+    :type traces: str | Sequence[str]
+    :param step: Step to read on stepped RAW files, defaults to 0
+    :type step: int, optional
+    :param max_workers: Maximum number of threads or processes. Defaults to the number of
+        CPUs
+    :type max_workers: int, optional
+    :param use_processes: Use a process pool instead of a thread pool. Processes avoid the
+        contention on the Python interpreter when there are many small files, at the cost
+        of transferring the data back to the calling process.
+    :type use_processes: bool, optional
+    :raises FileNotFoundError: If no files are found
+    :return: A dictionary with the data of each trace
+    :rtype: dict[str, numpy.ndarray | list[numpy.ndarray]]
+    """
+    files = expand_raw_files(raw_files)
+    if not files:
+        raise FileNotFoundError(f"No RAW files found in {raw_files}")
+    if isinstance(traces, str):
+        traces = [traces]
+    max_workers = max_workers or os.cpu_count() or 1
+    executor: Executor
+    if use_processes:
+        executor = ProcessPoolExecutor(max_workers=max_workers)
+    else:
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+    _logger.info("Reading %d traces from %d RAW files", len(traces), len(files))
+    with executor:
+        results = list(
+            executor.map(
+                _read_file_traces, files, [traces] * len(files), [step] * len(files)
+            )
+        )
+
+    data: dict[str, np.ndarray[Any, Any] | list[np.ndarray[Any, Any]]] = {}
+    for i, trace in enumerate(traces):
+        waves = [result[i] for result in results]
+        if len({len(wave) for wave in waves}) == 1:
+            data[trace] = np.stack(waves)
+        else:
+            data[trace] = waves
+    return data
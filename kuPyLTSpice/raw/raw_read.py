@@ -137,7 +137,16 @@ supports both Normal and Fast Access formats
 Classes Defined ===============
 
 The .RAW file is read during the construction (constructor method) of an `RawRead`
-object. All traces on the RAW file are uploaded into memory.
+object. All traces on the RAW file are uploaded into memory, unless the object is
+created with ``lazy=True``. In that case only the header is parsed during construction,
+the binary section is memory-mapped and each trace is only decoded when it is first
+accessed through get_trace() or get_wave().
+
+ASCII files are parsed in bulk by :py:mod:`kuPyLTSpice.raw.raw_ascii`.
+
+The traces to read can be selected with the ``traces_to_read`` argument, which accepts
+glob patterns such as ``I(*)``. Only the selected traces are kept in memory. On
+FastAccess files only the bytes of the selected traces are read from the file.
 
 The RawRead class then has all the methods that allow the user to access the Axis and
 Trace Values. If there is any stepped data (.STEP primitives), the RawRead class will
@@ -190,14 +199,771 @@ plt.show()  # Creates the matplotlib's interactive window with the plots.
 __author__ = "Nuno Canto Brum <nuno.brum@gmail.com>"
 __copyright__ = "Copyright 2022, Fribourg Switzerland"
 
+import dataclasses
+import fnmatch
+import functools
 import logging
+import os
+import time
+from collections import OrderedDict
+from collections.abc import Iterator, Sequence
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+import numpy as np
+from kupicelib.raw.raw_classes import Axis as _BaseAxis
+from kupicelib.raw.raw_classes import DummyTrace, SpiceReadException
+from kupicelib.raw.raw_read import RawRead as _RawRead
+
+from kuPyLTSpice.log.ltsteps import probe_log
+from kuPyLTSpice.raw.raw_ascii import read_ascii_values
+from kuPyLTSpice.raw.raw_cache import RawCache
+from kuPyLTSpice.raw.raw_classes import (
+    NUMPY_TYPES,
+    Axis,
+    LazyAxis,
+    LazyTraceRead,
+    TraceRead,
+    find_step_offsets,
+)
+
+if TYPE_CHECKING:
+    from kuPyLTSpice.raw.raw_reduce import Reducer
 
-from kupicelib.raw.raw_read import RawRead
+__all__ = ["LTSpiceRawRead", "RawInfo", "RawRead", "ReadStats", "probe"]
 
 _logger = logging.getLogger("kupicelib.RawRead")
-_logger.info(
-    "This is maintained for backward compatibility. Use kupicelib.raw.raw_read instead"
-)
+
+READ_CHUNK_SIZE = 16 * 2**20
+"""Size in bytes of the blocks read from Normal files when only some traces are read."""
+
+
+def match_traces(
+    trace_names: list[str], traces_to_read: str | list[str] | tuple[str, ...]
+) -> list[str]:
+    """Returns the trace names selected by ``traces_to_read``. Besides exact names, the
+    selection can contain glob patterns as accepted by :py:mod:`fnmatch`, for example
+    ``I(*)`` or ``V(out?)``. Names are matched first, so that a trace whose name looks
+    like a pattern can still be selected. Unknown names are ignored.
+
+    :param trace_names: Names of the traces in the file
+    :type trace_names: list[str]
+    :param traces_to_read: "*" for all traces, a name or pattern, or a list of them
+    :type traces_to_read: str | list[str] | tuple[str, ...]
+    :return: The selected names, in the order of the file
+    :rtype: list[str]
+    """
+    if traces_to_read == "*":
+        return list(trace_names)
+    patterns = [traces_to_read] if isinstance(traces_to_read, str) else traces_to_read
+    selected = set()
+    for pattern in patterns:
+        if pattern in trace_names:
+            selected.add(pattern)
+        else:
+            selected.update(fnmatch.filter(trace_names, pattern))
+    return [name for name in trace_names if name in selected]
+
+
+def find_binary_start(raw_filename: str | Path, encoding: str) -> int:
+    """Returns the position in the file where the binary section starts, this is,
+    just after the ``Binary:`` line of the header.
+
+    :param raw_filename: RAW file to inspect
+    :type raw_filename: str | Path
+    :param encoding: Encoding of the header, either 'utf_8' or 'utf_16_le'
+    :type encoding: str
+    :raises SpiceReadException: If the file doesn't have a binary section.
+    :return: Offset in bytes of the first data byte.
+    :rtype: int
+    """
+    return _find_data_start(raw_filename, encoding, "Binary:")
+
+
+def _find_data_start(raw_filename: str | Path, encoding: str, section: str) -> int:
+    """Returns the position of the line after the ``Binary:`` or ``Values:`` line."""
+    marker = f"\n{section}".encode(encoding)
+    newline = "\n".encode(encoding)
+    chunk_size = 64 * 1024
+    header = b""
+    with open(raw_filename, "rb") as raw_file:
+        while True:
+            chunk = raw_file.read(chunk_size)
+            if not chunk:
+                raise SpiceReadException(f"No {section} section found in '{raw_filename}'")
+            header += chunk
+            pos = header.find(marker)
+            if pos >= 0:
+                end = header.find(newline, pos + len(marker))
+                if end >= 0:
+                    return end + len(newline)
+
+
+@dataclasses.dataclass
+class RawInfo:
+    """Metadata of a RAW file, as returned by :py:func:`probe`."""
+
+    filename: Path
+    encoding: str
+    raw_type: str
+    """Either "Binary:" or "Values:", for ASCII files"""
+    plot_name: str
+    flags: list[str]
+    n_variables: int
+    n_points: int
+    """Number of points of all the steps together"""
+    n_steps: int | None
+    """Number of steps, 1 if not stepped, None if the step count couldn't be found"""
+    trace_names: list[str]
+    raw_params: dict[str, str]
+    """All the fields of the header, except the variables"""
+    data_offset: int
+    """Position in the file of the first byte after the Binary: or Values: line"""
+
+
+def probe(raw_filename: str | Path) -> RawInfo:
+    """Reads the metadata of a RAW file. Only the header, up to the ``Binary:`` or
+    ``Values:`` line, is read, so this is much faster than
+    ``RawRead(raw_filename, headeronly=True)`` when indexing many files.
+
+    For stepped LTspice files, the steps are counted on the ``.step`` lines of the log
+    file with the same name, see :py:func:`kuPyLTSpice.log.ltsteps.probe_log`.
+
+    :param raw_filename: RAW file to inspect
+    :type raw_filename: str | Path
+    :raises SpiceReadException: If the file isn't a RAW file or the header is incomplete.
+    :return: The metadata of the file
+    :rtype: RawInfo
+    """
+    raw_filename = Path(raw_filename)
+    chunk_size = 16 * 1024
+    header = b""
+    with open(raw_filename, "rb") as raw_file:
+        start = raw_file.read(6)
+        if start == b"Title:":
+            encoding = "utf_8"
+        elif start == "Tit".encode("utf_16_le"):
+            encoding = "utf_16_le"
+        else:
+            raise SpiceReadException(f"Unrecognized RAW file format: '{raw_filename}'")
+        markers = ["\nBinary:".encode(encoding), "\nValues:".encode(encoding)]
+        newline = "\n".encode(encoding)
+        header = start
+        while True:
+            positions = [pos for pos in map(header.find, markers) if pos >= 0]
+            end = header.find(newline, min(positions) + 2) if positions else -1
+            if end >= 0:
+                break
+            chunk = raw_file.read(chunk_size)
+            if not chunk:
+                raise SpiceReadException(f"Incomplete RAW file header: '{raw_filename}'")
+            header += chunk
+    data_offset = end + len(newline)
+    lines = header[:data_offset].decode(encoding).splitlines()
+    raw_params: dict[str, str] = {}
+    trace_names: list[str] = []
+    in_variables = False
+    for line in lines[:-1]:
+        if in_variables:
+            trace_names.append(line.strip().split("\t")[1])
+            continue
+        key, _, value = line.partition(":")
+        if key == "Variables":
+            in_variables = True
+        else:
+            raw_params[key] = value.strip()
+    flags = raw_params.get("Flags", "").split()
+    plot_name = raw_params.get("Plotname", "")
+    n_points = int(raw_params["No. Points"])
+    n_steps: int | None = 1
+    if "stepped" in flags:
+        n_steps = None
+        log_filename = raw_filename.with_suffix(".log")
+        if plot_name in ("Operating Point", "Transfer Function"):
+            n_steps = n_points  # One point per step
+        elif "ltspice" in raw_params.get("Command", "").lower() and log_filename.exists():
+            n_steps = probe_log(log_filename).step_count or None
+    return RawInfo(
+        filename=raw_filename,
+        encoding=encoding,
+        raw_type=lines[-1].strip(),
+        plot_name=plot_name,
+        flags=flags,
+        n_variables=int(raw_params["No. Variables"]),
+        n_points=n_points,
+        n_steps=n_steps,
+        trace_names=trace_names,
+        raw_params=raw_params,
+        data_offset=data_offset,
+    )
+
+
+@dataclasses.dataclass
+class ReadStats:
+    """Statistics of the reading of a RAW file, see :py:attr:`RawRead.read_stats`."""
+
+    bytes_read: int
+    """Bytes read from the data section of the RAW file. ASCII files are read completely
+    and lazy reads only map the file, so nothing is counted for them."""
+    data_size: int
+    """Size in bytes of the data section"""
+    read_time: float
+    """Time in seconds spent creating the RawRead object, header included"""
+    traces_read: int
+    """Number of traces read, the axis included"""
+
+
+def _read_exactly(raw_file: Any, buffer: np.ndarray[Any, Any]) -> None:
+    """Fills a contiguous array with the next bytes of a file."""
+    view = memoryview(buffer.view(np.uint8))
+    while len(view):
+        count = raw_file.readinto(view)
+        if not count:
+            raise SpiceReadException(f"Unexpected end of file in '{raw_file.name}'")
+        view = view[count:]
+
+
+class RawRead(_RawRead):
+    """Reads a Spice RAW file. See :py:class:`kupicelib.raw.raw_read.RawRead` for the
+    description of the arguments.
+
+    Binary RAW files are decoded in a single pass: the whole binary section is read at
+    once and each trace is a view on it. On Normal (non FastAccess) files the points are
+    read as records of a structured numpy type, so the traces are strided views of the
+    records and no copy is made. Use ``get_wave(...).copy()`` when a contiguous array is
+    needed.
+
+    The ``traces_to_read`` argument accepts glob patterns, see :py:func:`match_traces`.
+    When only some traces are read, on FastAccess files the reader seeks to the block of
+    each selected trace and reads only those bytes; on Normal files, where the values
+    of a point are stored together, the binary section is read in blocks of
+    ``READ_CHUNK_SIZE`` bytes and only the selected columns are kept, as contiguous
+    arrays. The bytes read and the time spent are given in :py:attr:`read_stats`.
+
+    On top of the base class, this class accepts the following keyword arguments:
+
+    :key lazy: When True, only the header is parsed on construction. The binary section
+        is memory-mapped and each trace is decoded on its first access, so that memory
+        usage scales with the traces actually used. On FastAccess files the returned
+        arrays are read-only views of the mapped file; on Normal files each trace is
+        copied into a contiguous array when first accessed. Only binary RAW files can
+        be read lazily, ASCII files are always read completely.
+        Note that the file is kept open while any of its mapped traces is referenced.
+    :key cache: Either True or a :py:class:`kuPyLTSpice.raw.raw_cache.RawCache` instance.
+        When given, the decoded traces, the header and the step information are stored
+        in a columnar cache and reused on later reads of the same, unchanged, file.
+        The traces read later are added to the entry of the file. True stores the cache
+        next to the RAW file.
+    :key reducers: A list of :py:class:`kuPyLTSpice.raw.raw_reduce.Reducer`, like
+        ``[RMS("V(out)"), Crossing("V(out)", 0.5)]``. When given, the waveforms are not
+        kept: the file is decoded in chunks, the reducers are computed on the fly and
+        the table of the reducer values per step is stored in :py:attr:`reductions`. Only the header
+        information is available on the traces.
+    """
+
+    def __init__(
+        self,
+        raw_filename: str | Path,
+        traces_to_read: str | list[str] | tuple[str, ...] | None = "*",
+        dialect: str | None = None,
+        *,
+        lazy: bool = False,
+        cache: bool | RawCache = False,
+        reducers: Sequence["Reducer"] | None = None,
+        **kwargs: Any,
+    ) -> None:
+        start_time = time.perf_counter()
+        self.lazy = lazy
+        self.read_stats: ReadStats | None = None
+        """Bytes read and time spent reading the file. None for header only reads."""
+        self.reductions: dict[str, np.ndarray[Any, Any]] | None = None
+        """Values of the ``reducers`` for each step, see
+        :py:func:`kuPyLTSpice.raw.raw_reduce.reduce_raw`"""
+        if reducers is not None:
+            # Imported here, as the reducers read the file with this class
+            from kuPyLTSpice.raw.raw_reduce import reduce_raw
+
+            kwargs.pop("headeronly", None)
+            super().__init__(raw_filename, "*", dialect, headeronly=True, **kwargs)
+            self.reductions = reduce_raw(raw_filename, reducers, dialect=dialect)
+            return
+        if traces_to_read is None:
+            super().__init__(raw_filename, traces_to_read, dialect, **kwargs)
+            return
+        if kwargs.get("headeronly", False):
+            super().__init__(raw_filename, "*", dialect, **kwargs)
+            self._select_traces(traces_to_read)
+            return
+
+        raw_filename_path = Path(raw_filename)
+        raw_cache = RawCache() if cache is True else cache or None
+        previous = None
+        if raw_cache is not None:
+            previous = raw_cache.load(raw_filename_path)
+            if previous is not None and self._read_from_cache(
+                raw_filename_path, traces_to_read, *previous, **kwargs
+            ):
+                self._set_read_stats(0, 0, start_time)
+                return
+        try:
+            self._read_file(raw_filename_path, traces_to_read, dialect, start_time, **kwargs)
+        except BaseException:
+            if previous is not None:
+                previous[1].close()
+            raise
+        if raw_cache is not None:
+            raw_cache.store(raw_filename_path, *self._cache_entry(previous))
+
+    def _select_traces(self, traces_to_read: str | list[str] | tuple[str, ...]) -> None:
+        """Replaces the traces that are not selected by dummy traces, as done by the base
+        class for the names given in ``traces_to_read``. The axis is always kept."""
+        selected = set(match_traces([trace.name for trace in self._traces], traces_to_read))
+        for i, trace in enumerate(self._traces):
+            if i > 0 and trace.name not in selected and not isinstance(trace, DummyTrace):
+                self._traces[i] = DummyTrace(
+                    trace.name, trace.whattype, self.nPoints, trace.numerical_type
+                )
+
+    def _set_read_stats(self, bytes_read: int, data_size: int, start_time: float) -> None:
+        self.read_stats = ReadStats(
+            bytes_read=bytes_read,
+            data_size=data_size,
+            read_time=time.perf_counter() - start_time,
+            traces_read=len(
+                [trace for trace in self._traces if not isinstance(trace, DummyTrace)]
+            ),
+        )
+        if self.verbose:
+            _logger.debug(
+                "Read %d of %d bytes of '%s' in %.3f s",
+                bytes_read,
+                data_size,
+                self.raw_params["Filename"],
+                self.read_stats.read_time,
+            )
+
+    def _read_file(
+        self,
+        raw_filename_path: Path,
+        traces_to_read: str | list[str] | tuple[str, ...],
+        dialect: str | None,
+        start_time: float,
+        **kwargs: Any,
+    ) -> None:
+        """Reads the RAW file. The header is parsed by the base class, the binary section
+        is decoded by this class."""
+        kwargs["headeronly"] = True
+        super().__init__(raw_filename_path, "*", dialect, **kwargs)
+        self._select_traces(traces_to_read)
+        if self.raw_type != "Binary:":
+            if self.lazy:
+                _logger.warning(
+                    "Lazy reading is only supported on binary RAW files. "
+                    "Reading '%s' completely.",
+                    raw_filename_path,
+                )
+            self.lazy = False
+            if self.raw_type != "Values:":
+                raise SpiceReadException(f'Unsupported RAW File. "{self.raw_type}"')
+            self._use_indexed_axis()
+            bytes_read = self._read_values(raw_filename_path)
+            self._finish_read(raw_filename_path)
+            self._set_read_stats(bytes_read, bytes_read, start_time)
+            return
+
+        self._use_indexed_axis()
+        bytes_read = self._read_binary(raw_filename_path)
+        self._finish_read(raw_filename_path)
+        self._set_read_stats(bytes_read, self.block_size * self.nPoints, start_time)
+
+    def _use_indexed_axis(self) -> None:
+        """Replaces the axis created by the base class by a
+        :py:class:`kuPyLTSpice.raw.raw_classes.Axis`, which keeps an index of the steps."""
+        old_axis = self.axis
+        if old_axis is None or isinstance(old_axis, Axis):
+            return
+        axis = Axis(old_axis.name, old_axis.whattype, 0, old_axis.numerical_type)
+        axis.data = old_axis.data
+        if old_axis.step_info is not None:
+            axis._set_steps(old_axis.step_info, old_axis.step_offsets)
+        self._traces = [axis if trace is old_axis else trace for trace in self._traces]
+        for trace in self._traces:
+            if isinstance(trace, TraceRead) and trace.axis is old_axis:
+                trace.axis = axis
+        self.axis = axis
+
+    def _trace_views(
+        self, buffer: np.ndarray[Any, Any], fast_access: bool
+    ) -> list[np.ndarray[Any, Any]]:
+        """Returns the values of each trace as a view on the buffer containing the whole
+        binary section. No data is copied."""
+        dtypes = [NUMPY_TYPES[trace.numerical_type] for trace in self._traces]
+        if fast_access:
+            # The traces are stored one after the other
+            views = []
+            start = 0
+            for dtype in dtypes:
+                end = start + dtype.itemsize * self.nPoints
+                views.append(np.asarray(buffer[start:end].view(dtype)))
+                start = end
+            return views
+        # Each point is stored as a record with all the traces
+        offsets = np.cumsum([0] + [dtype.itemsize for dtype in dtypes[:-1]])
+        records = buffer.view(
+            np.dtype(
+                {
+                    "names": [f"t{i}" for i in range(len(dtypes))],
+                    "formats": dtypes,
+                    "offsets": offsets.tolist(),
+                    "itemsize": self.block_size,
+                }
+            )
+        )
+        return [np.asarray(records[f"t{i}"]) for i in range(len(dtypes))]
+
+    def _read_values(self, raw_filename_path: Path) -> int:
+        """Reads the Values: section of an ASCII RAW file with the bulk parser of
+        :py:mod:`kuPyLTSpice.raw.raw_ascii`. Returns the number of bytes read."""
+        if self.verbose:
+            _logger.debug("ASCII RAW File")
+        data_start = _find_data_start(raw_filename_path, self.encoding, "Values:")
+        values = read_ascii_values(
+            raw_filename_path,
+            data_start,
+            self.encoding,
+            self.nPoints,
+            [trace.numerical_type for trace in self._traces],
+        )
+        for trace, data in zip(self._traces, values, strict=True):
+            if not isinstance(trace, DummyTrace):
+                trace.data = data
+        return os.stat(raw_filename_path).st_size - data_start
+
+    def _read_selected(
+        self, raw_filename_path: Path, binary_start: int, fast_access: bool
+    ) -> tuple[dict[int, np.ndarray[Any, Any]], int]:
+        """Reads only the traces that are not dummy traces into contiguous arrays.
+
+        Returns the arrays, by trace index, and the number of bytes read."""
+        dtypes = [NUMPY_TYPES[trace.numerical_type] for trace in self._traces]
+        selected = [
+            i for i, trace in enumerate(self._traces) if not isinstance(trace, DummyTrace)
+        ]
+        values = {i: np.empty(self.nPoints, dtype=dtypes[i]) for i in selected}
+        offsets = np.cumsum([0] + [dtype.itemsize for dtype in dtypes[:-1]]).tolist()
+        with open(raw_filename_path, "rb", buffering=0) as raw_file:
+            if fast_access:
+                # Each trace is a contiguous block, only those blocks are read
+                for i in selected:
+                    raw_file.seek(binary_start + offsets[i] * self.nPoints)
+                    _read_exactly(raw_file, values[i])
+                return values, sum(values[i].nbytes for i in selected)
+            # The values of a point are stored together, so all the points are read,
+            # one block at a time, and only the selected columns are copied
+            records = np.dtype(
+                {
+                    "names": [f"t{i}" for i in selected],
+                    "formats": [dtypes[i] for i in selected],
+                    "offsets": [offsets[i] for i in selected],
+                    "itemsize": self.block_size,
+                }
+            )
+            chunk_points = max(1, READ_CHUNK_SIZE // self.block_size)
+            buffer = np.empty(min(chunk_points, self.nPoints) * self.block_size, np.uint8)
+            raw_file.seek(binary_start)
+            for start in range(0, self.nPoints, chunk_points):
+                count = min(chunk_points, self.nPoints - start)
+                chunk = buffer[: count * self.block_size]
+                _read_exactly(raw_file, chunk)
+                chunk_records = chunk.view(records)
+                for i in selected:
+                    values[i][start : start + count] = chunk_records[f"t{i}"]
+        return values, self.block_size * self.nPoints
+
+    def _read_binary(self, raw_filename_path: Path) -> int:
+        """Reads the binary section at once, or memory-maps it when reading lazily, and
+        assigns the values of each trace. When only some traces are selected, only those
+        are read, see :py:meth:`_read_selected`.
+
+        When reading lazily, the traces created by the header parsing are replaced by
+        lazy traces that decode their values on first access.
+
+        Returns the number of bytes read from the file."""
+        binary_start = find_binary_start(raw_filename_path, self.encoding)
+        self.block_size = sum(
+            NUMPY_TYPES[trace.numerical_type].itemsize for trace in self._traces
+        )
+        self.data_size = self.block_size // len(self._traces)
+        data_bytes = self.block_size * self.nPoints
+        found_block_size = (os.stat(raw_filename_path).st_size - binary_start) // self.nPoints
+        # Older xyce files can have a text section after the data, so only a minimum applies
+        if found_block_size < self.block_size or (
+            self.dialect != "xyce" and found_block_size != self.block_size
+        ):
+            raise RuntimeError(
+                f"Error in calculating the block size. Expected {self.block_size} bytes, "
+                f"but found {found_block_size} bytes."
+            )
+        fast_access = "fastaccess" in self.raw_params["Flags"].lower()
+        if self.verbose:
+            _logger.debug(
+                "Binary RAW file with %s access", "Fast" if fast_access else "Normal"
+            )
+        if not self.lazy and any(isinstance(trace, DummyTrace) for trace in self._traces):
+            values, bytes_read = self._read_selected(raw_filename_path, binary_start, fast_access)
+            for i, data in values.items():
+                self._traces[i].data = data
+            return bytes_read
+        buffer: np.ndarray[Any, Any]
+        if self.lazy:
+            buffer = np.memmap(
+                raw_filename_path, dtype=np.uint8, mode="r", offset=binary_start,
+                shape=(data_bytes,)
+            )
+        else:
+            buffer = np.fromfile(
+                raw_filename_path, dtype=np.uint8, count=data_bytes, offset=binary_start
+            )
+        views = self._trace_views(buffer, fast_access)
+
+        def loader(view: np.ndarray[Any, Any]) -> Any:
+            return view if fast_access else np.ascontiguousarray(view)
+
+        has_axis = self.axis is not None and self.raw_params["Plotname"] not in (
+            "Operating Point",
+            "Transfer Function",
+        )
+        for i, trace in enumerate(self._traces):
+            if isinstance(trace, DummyTrace):
+                continue
+            if not self.lazy:
+                trace.data = views[i]
+            elif isinstance(trace, Axis):
+                self.axis = LazyAxis(
+                    trace.name,
+                    trace.whattype,
+                    self.nPoints,
+                    trace.numerical_type,
+                    lambda view=views[i]: loader(view),
+                )
+                self._traces[i] = self.axis
+            else:
+                self._traces[i] = LazyTraceRead(
+                    trace.name,
+                    trace.whattype,
+                    self.axis if has_axis else None,
+                    trace.numerical_type,
+                    lambda view=views[i]: loader(view),
+                )
+        return 0 if self.lazy else data_bytes
+
+    def _finish_read(self, raw_filename_path: Path) -> None:
+        """Updates the RAW properties, removes the traces that were not selected and
+        loads the step information.
+
+        This replicates what the base class does at the end of a complete read.
+        """
+        has_axis = self.raw_params["Plotname"] not in ("Operating Point", "Transfer Function")
+        self.raw_params["No. Points"] = str(self.nPoints)
+        self.raw_params["No. Variables"] = str(self.nVariables)
+        self._file_trace_names = [var.name for var in self._traces]
+        self.raw_params["Variables"] = str(self._file_trace_names)
+        self._traces = [
+            trace for trace in self._traces if not isinstance(trace, DummyTrace)
+        ]
+        if "stepped" in self.raw_params["Flags"]:
+            try:
+                self._load_step_information(raw_filename_path)
+            except SpiceReadException as err:
+                _logger.warning(
+                    f"{err!s}\nError in auto-detecting steps in '{raw_filename_path}'"
+                )
+                if has_axis and self.axis is not None:
+                    number_of_steps = len(find_step_offsets(self.axis.data))
+                else:
+                    number_of_steps = self.nPoints
+                self.steps = [{"run": i + 1} for i in range(number_of_steps)]
+
+            if self.steps is not None and has_axis and self.axis is not None:
+                self.axis._set_steps(self.steps)
+
+    def _cache_header(self) -> dict[str, Any]:
+        """Returns the information needed to rebuild this object from the cache."""
+        return {
+            "raw_params": {
+                key: str(value) for key, value in self.raw_params.items() if key != "Filename"
+            },
+            "encoding": self.encoding,
+            "dialect": self.dialect,
+            "raw_type": self.raw_type,
+            "nPoints": self.nPoints,
+            "nVariables": self.nVariables,
+            "backannotations": self.backannotations,
+            "aliases": self.aliases,
+            "spice_params": self.spice_params,
+            "steps": self.steps,
+            "step_offsets": (
+                None
+                if self.axis is None or self.axis.step_info is None
+                else self.axis.step_offsets.tolist()
+            ),
+            "traces": [
+                {
+                    "name": trace.name,
+                    "whattype": trace.whattype,
+                    "numerical_type": trace.numerical_type,
+                }
+                for trace in self._traces
+            ],
+        }
+
+    @staticmethod
+    def _cache_values(trace: Axis | TraceRead) -> np.ndarray[Any, Any]:
+        """Returns the values of a trace to be stored in the cache. Lazy traces that were
+        not accessed are decoded and are not kept."""
+        if isinstance(trace, LazyAxis | LazyTraceRead):
+            return trace.decode()
+        return trace.data
+
+    def _cache_data(self) -> Iterator[np.ndarray[Any, Any]]:
+        """Yields the values of each trace to be stored in the cache, one at a time."""
+        for trace in self._traces:
+            yield self._cache_values(trace)
+
+    def _cache_entry(
+        self, previous: tuple[dict[str, Any], Any] | None
+    ) -> tuple[dict[str, Any], Iterator[np.ndarray[Any, Any]]]:
+        """Returns the header and the trace values to store in the cache after a read of
+        the file. The traces of the previous entry that were not read now are kept, so
+        that reading different traces one after the other fills the entry instead of
+        replacing it. The previous entry is closed once its traces are copied."""
+        header = self._cache_header()
+        if previous is None:
+            return header, self._cache_data()
+        old_header, arrays = previous
+        current = {trace.name: trace for trace in self._traces}
+        old_traces = {info["name"]: (i, info) for i, info in enumerate(old_header["traces"])}
+        names = [
+            name for name in self._file_trace_names if name in current or name in old_traces
+        ]
+        new_traces = {info["name"]: info for info in header["traces"]}
+        header["traces"] = [
+            new_traces[name] if name in current else old_traces[name][1] for name in names
+        ]
+
+        def data() -> Iterator[np.ndarray[Any, Any]]:
+            try:
+                for name in names:
+                    if name in current:
+                        yield self._cache_values(current[name])
+                    else:
+                        yield arrays[f"trace{old_traces[name][0]}"]
+            finally:
+                arrays.close()
+
+        return header, data()
+
+    def _read_from_cache(
+        self,
+        raw_filename_path: Path,
+        traces_to_read: str | list[str] | tuple[str, ...],
+        header: dict[str, Any],
+        arrays: Any,
+        **kwargs: Any,
+    ) -> bool:
+        """Rebuilds this object from a cache entry. Returns False, without changing the
+        object nor closing the entry, if the entry doesn't contain all the traces
+        requested."""
+        cached_names = [trace["name"] for trace in header["traces"]]
+        selected: list[str] | None = None
+        if len(cached_names) == header["nVariables"]:
+            selected = [cached_names[0], *match_traces(cached_names[1:], traces_to_read)]
+        elif traces_to_read != "*":
+            # Only exact names can be looked up in an entry with part of the traces
+            requested = [traces_to_read] if isinstance(traces_to_read, str) else traces_to_read
+            if all(name in cached_names for name in requested):
+                selected = [cached_names[0], *requested]
+        if selected is None:
+            return False
+
+        self.verbose = kwargs.get("verbose", True)
+        if self.verbose:
+            _logger.debug("Reading '%s' from the cache", raw_filename_path)
+        self.dialect = header["dialect"]
+        self.encoding = header["encoding"]
+        self.raw_type = header["raw_type"]
+        self.nPoints = header["nPoints"]
+        self.nVariables = header["nVariables"]
+        self.raw_params = OrderedDict(Filename=raw_filename_path)
+        self.raw_params.update(header["raw_params"])
+        self.backannotations = header["backannotations"]
+        self.aliases = header["aliases"]
+        self.spice_params = header["spice_params"]
+        self.flags = self.raw_params["Flags"].split()
+        self.steps = header["steps"]
+        self.axis = None
+        self._traces = []
+        has_axis = self.raw_params["Plotname"] not in ("Operating Point", "Transfer Function")
+        for i, info in enumerate(header["traces"]):
+            if info["name"] not in selected:
+                continue
+            key = f"trace{i}"
+            trace: Axis | TraceRead
+            if self.lazy:
+                loader = functools.partial(arrays.__getitem__, key)
+                if i == 0:
+                    trace = LazyAxis(
+                        info["name"], info["whattype"], self.nPoints, info["numerical_type"],
+                        loader,
+                    )
+                else:
+                    trace = LazyTraceRead(
+                        info["name"], info["whattype"], self.axis if has_axis else None,
+                        info["numerical_type"], loader,
+                    )
+            else:
+                if i == 0:
+                    trace = Axis(info["name"], info["whattype"], 0, info["numerical_type"])
+                else:
+                    trace = TraceRead(
+                        info["name"], info["whattype"], 0, self.axis if has_axis else None,
+                        info["numerical_type"],
+                    )
+                trace.data = arrays[key]
+            if i == 0:
+                self.axis = trace
+            self._traces.append(trace)
+        if not self.lazy:
+            arrays.close()
+        if self.steps is not None and has_axis and self.axis is not None:
+            assert isinstance(self.axis, Axis)
+            self.axis._set_steps(self.steps, header.get("step_offsets"))
+        return True
+
+    def get_wave_matrix(
+        self, trace_ref: str | int, fill_value: Any = np.nan
+    ) -> np.ndarray[Any, Any]:
+        """Returns the values of a trace for all the steps as a 2-D array, with one row
+        per step. Steps with fewer points than the longest one are padded with
+        ``fill_value``. On RAW files without steps, the array has a single row.
+
+        :param trace_ref: Name of the trace or the index of the trace
+        :type trace_ref: str or int
+        :param fill_value: Value used to pad the shorter steps, defaults to NaN
+        :return: Array of shape (number of steps, points of the longest step)
+        :rtype: numpy.ndarray
+        :raises IndexError: When a trace is not found
+        """
+        trace = self.get_trace(trace_ref)
+        axis = trace if isinstance(trace, _BaseAxis) else getattr(trace, "axis", None)
+        if axis is None:
+            # Operating point files have a single point per step
+            return trace.data[:, np.newaxis]
+        if not isinstance(axis, Axis) or axis.step_info is None:
+            return trace.get_wave()[np.newaxis, :]
+        values = np.abs(trace.data) if trace.name == "time" else trace.data
+        return axis.pad_steps(values, fill_value)
+
 
 # Backward compatibility naming
 LTSpiceRawRead = RawRead
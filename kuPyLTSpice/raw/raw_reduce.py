@@ -0,0 +1,480 @@
+#!/usr/bin/env python
+
+# -------------------------------------------------------------------------------
+#    ____        _   _____ ____        _
+#   |  _ \ _   _| | |_   _/ ___| _ __ (_) ___ ___
+#   | |_) | | | | |   | | \___ \| '_ \| |/ __/ _ \
+#   |  __/| |_| | |___| |  ___) | |_) | | (_|  __/
+#   |_|    \__, |_____|_| |____/| .__/|_|\___\___|
+#          |___/                |_|
+#
+# Name:        raw_reduce.py
+# Purpose:     Waveform measurements computed while decoding RAW files
+#
+# Licence:     refer to the LICENSE file
+# -------------------------------------------------------------------------------
+"""Waveform measurements, like the RMS value or the time of a crossing, computed for
+each step while the RAW file is decoded, without keeping the waveforms in memory.
+
+Each measurement is described by a reducer, applied to a trace or to an expression of
+:py:mod:`kuPyLTSpice.raw.raw_expr`. Most reducers accept a ``start`` and ``stop``
+window on the axis. The result is a table with one row per step: a dictionary with the
+``step`` column, the stepped parameters and one column per reducer, which can be given
+as is to ``pandas.DataFrame``.
+
+Example::
+
+    from kuPyLTSpice.raw.raw_reduce import RMS, Crossing, FinalValue, reduce_raw
+
+    table = reduce_raw("circuit.raw", [
+        RMS("V(out)", start=1e-3),
+        Crossing("V(out)", 0.5, edge="rise"),
+        FinalValue("I(R1)", name="Iout"),
+    ])
+    table["rms(V(out))"]  # One value per step
+
+The same reducers can be given to :py:class:`kuPyLTSpice.raw.raw_read.RawRead` with
+``RawRead("circuit.raw", reducers=[...])``, which stores the table in its
+``reductions`` attribute.
+"""
+from __future__ import annotations
+
+import dataclasses
+import logging
+from collections.abc import Sequence
+from pathlib import Path
+from typing import Any, ClassVar
+
+import numpy as np
+
+from kuPyLTSpice.raw.raw_expr import CHUNK_POINTS, Expr, _evaluate, _reader, _StepReduction, ref
+
+__all__ = [
+    "RMS",
+    "Average",
+    "Crossing",
+    "FinalValue",
+    "Integral",
+    "Max",
+    "Min",
+    "Reducer",
+    "Settling",
+    "reduce_raw",
+]
+
+_logger = logging.getLogger("kupicelib.RawRead")
+
+
+def _grow(array: np.ndarray[Any, Any], size: int, fill: Any) -> np.ndarray[Any, Any]:
+    """Extends an array with one value per step to at least ``size`` values."""
+    if len(array) >= size:
+        return array
+    return np.concatenate([array, np.full(size - len(array), fill, dtype=array.dtype)])
+
+
+def _last_of_each_step(steps: np.ndarray[Any, Any]) -> np.ndarray[Any, Any]:
+    """Positions of the last point of each step in a run of consecutive steps."""
+    return np.flatnonzero(np.concatenate([steps[1:] != steps[:-1], [True]]))
+
+
+def _with_previous(
+    steps: np.ndarray[Any, Any],
+    values: np.ndarray[Any, Any],
+    axis: np.ndarray[Any, Any],
+    previous: tuple[int, Any, Any] | None,
+) -> tuple[np.ndarray[Any, Any], np.ndarray[Any, Any], np.ndarray[Any, Any]]:
+    """Prepends the last point of the previous chunk when it belongs to the same step."""
+    if previous is not None and previous[0] == steps[0]:
+        steps = np.concatenate([[previous[0]], steps])
+        axis = np.concatenate([[previous[1]], axis])
+        values = np.concatenate([[previous[2]], values])
+    return steps, values, axis
+
+
+@dataclasses.dataclass
+class Reducer:
+    """Base class of the reducers.
+
+    :param trace: Name of the trace, or expression, to reduce
+    :type trace: str | Expr
+    :param start: Axis value where the measurement starts. Defaults to the first point.
+    :type start: float, optional
+    :param stop: Axis value where the measurement stops. Defaults to the last point.
+    :type stop: float, optional
+    :param name: Name of the column of the result. Defaults to ``kind(trace)``, for
+        example "rms(V(out))".
+    :type name: str, optional
+    """
+
+    kind: ClassVar[str] = ""
+    needs_axis: ClassVar[bool] = False
+
+    trace: str | Expr
+    start: float | None = dataclasses.field(default=None, kw_only=True)
+    stop: float | None = dataclasses.field(default=None, kw_only=True)
+    name: str | None = dataclasses.field(default=None, kw_only=True)
+
+    @property
+    def expression(self) -> Expr:
+        return self.trace if isinstance(self.trace, Expr) else ref(self.trace)
+
+    @property
+    def column(self) -> str:
+        return self.name or f"{self.kind}({self.trace})"
+
+    def _accumulator(self) -> _Accumulator:
+        raise NotImplementedError
+
+
+class _Accumulator:
+    """Accumulates the result of a reducer over the chunks, for each step."""
+
+    def __init__(self, reducer: Reducer) -> None:
+        self.reducer = reducer
+        self.previous: tuple[int, Any, Any] | None = None
+
+    def feed(
+        self,
+        steps: np.ndarray[Any, Any],
+        values: np.ndarray[Any, Any],
+        axis: np.ndarray[Any, Any] | None,
+    ) -> None:
+        start, stop = self.reducer.start, self.reducer.stop
+        if axis is not None and (start is not None or stop is not None):
+            inside = np.ones(len(steps), dtype=bool)
+            if start is not None:
+                inside &= axis >= start
+            if stop is not None:
+                inside &= axis <= stop
+            steps, values, axis = steps[inside], values[inside], axis[inside]
+        if len(steps) == 0:
+            return
+        self.add(steps, values, axis, self.previous)
+        if axis is not None:
+            self.previous = (int(steps[-1]), axis[-1], values[-1])
+
+    def add(
+        self,
+        steps: np.ndarray[Any, Any],
+        values: np.ndarray[Any, Any],
+        axis: np.ndarray[Any, Any] | None,
+        previous: tuple[int, Any, Any] | None,
+    ) -> None:
+        raise NotImplementedError
+
+    def result(self, n_steps: int) -> np.ndarray[Any, Any]:
+        raise NotImplementedError
+
+
+class _StatisticAccumulator(_Accumulator):
+    """Mean, RMS, integral, maximum and minimum, as computed by
+    :py:func:`kuPyLTSpice.raw.raw_expr.reduce_expressions`."""
+
+    def __init__(self, reducer: Reducer) -> None:
+        super().__init__(reducer)
+        self.reduction: _StepReduction | None = None
+        self.has_axis = True
+
+    def add(
+        self,
+        steps: np.ndarray[Any, Any],
+        values: np.ndarray[Any, Any],
+        axis: np.ndarray[Any, Any] | None,
+        previous: tuple[int, Any, Any] | None,
+    ) -> None:
+        if self.reduction is None:
+            self.reduction = _StepReduction(np.iscomplexobj(values))
+        self.has_axis = axis is not None
+        self.reduction.add(steps, values, axis, previous)
+
+    def result(self, n_steps: int) -> np.ndarray[Any, Any]:
+        if self.reduction is None:
+            return np.full(n_steps, np.nan)
+        values = self.reduction.result(self.reducer.kind, self.has_axis)
+        values = np.where(self.reduction.count > 0, values, np.nan)
+        return _grow(values, n_steps, np.nan)[:n_steps]
+
+
+@dataclasses.dataclass
+class Average(Reducer):
+    """Average over the axis, with the trapezoidal rule. Without an axis, the average
+    of the points."""
+
+    kind: ClassVar[str] = "mean"
+
+    def _accumulator(self) -> _Accumulator:
+        return _StatisticAccumulator(self)
+
+
+@dataclasses.dataclass
+class RMS(Reducer):
+    """Root mean square over the axis, with the trapezoidal rule. Without an axis, the
+    root mean square of the points."""
+
+    kind: ClassVar[str] = "rms"
+
+    def _accumulator(self) -> _Accumulator:
+        return _StatisticAccumulator(self)
+
+
+@dataclasses.dataclass
+class Integral(Reducer):
+    """Integral over the axis, with the trapezoidal rule."""
+
+    kind: ClassVar[str] = "integral"
+    needs_axis: ClassVar[bool] = True
+
+    def _accumulator(self) -> _Accumulator:
+        return _StatisticAccumulator(self)
+
+
+@dataclasses.dataclass
+class Max(Reducer):
+    """Maximum value. The magnitude is used for complex values."""
+
+    kind: ClassVar[str] = "max"
+
+    def _accumulator(self) -> _Accumulator:
+        return _StatisticAccumulator(self)
+
+
+@dataclasses.dataclass
+class Min(Reducer):
+    """Minimum value. The magnitude is used for complex values."""
+
+    kind: ClassVar[str] = "min"
+
+    def _accumulator(self) -> _Accumulator:
+        return _StatisticAccumulator(self)
+
+
+class _FinalValueAccumulator(_Accumulator):
+    def __init__(self, reducer: Reducer) -> None:
+        super().__init__(reducer)
+        self.final = np.zeros(0)
+
+    def add(
+        self,
+        steps: np.ndarray[Any, Any],
+        values: np.ndarray[Any, Any],
+        axis: np.ndarray[Any, Any] | None,
+        previous: tuple[int, Any, Any] | None,
+    ) -> None:
+        if np.iscomplexobj(values) and not np.iscomplexobj(self.final):
+            self.final = self.final.astype(np.complex128)
+        self.final = _grow(self.final, int(steps[-1]) + 1, np.nan)
+        last = _last_of_each_step(steps)
+        self.final[steps[last]] = values[last]
+
+    def result(self, n_steps: int) -> np.ndarray[Any, Any]:
+        return _grow(self.final, n_steps, np.nan)[:n_steps]
+
+
+@dataclasses.dataclass
+class FinalValue(Reducer):
+    """Value of the last point of each step, or of the window."""
+
+    kind: ClassVar[str] = "final"
+
+    def _accumulator(self) -> _Accumulator:
+        return _FinalValueAccumulator(self)
+
+
+class _CrossingAccumulator(_Accumulator):
+    reducer: Crossing
+
+    def __init__(self, reducer: Crossing) -> None:
+        super().__init__(reducer)
+        self.found = np.zeros(0, dtype=np.int64)
+        self.time = np.zeros(0)
+
+    def add(
+        self,
+        steps: np.ndarray[Any, Any],
+        values: np.ndarray[Any, Any],
+        axis: np.ndarray[Any, Any] | None,
+        previous: tuple[int, Any, Any] | None,
+    ) -> None:
+        assert axis is not None
+        n_steps = int(steps[-1]) + 1
+        self.found = _grow(self.found, n_steps, 0)
+        self.time = _grow(self.time, n_steps, np.nan)
+        steps, values, axis = _with_previous(steps, values, axis, previous)
+        level = np.real(values) - self.reducer.level
+        before, after = level[:-1], level[1:]
+        crossing = np.zeros(len(before), dtype=bool)
+        if self.reducer.edge in ("rise", "both"):
+            crossing |= (before < 0) & (after >= 0)
+        if self.reducer.edge in ("fall", "both"):
+            crossing |= (before > 0) & (after <= 0)
+        crossing &= steps[1:] == steps[:-1]
+        index = np.flatnonzero(crossing)
+        if len(index) == 0:
+            return
+        # Linear interpolation of the axis where the level is crossed
+        time = axis[index] + (axis[index + 1] - axis[index]) * (
+            -before[index] / (after[index] - before[index])
+        )
+        step = steps[index + 1]
+        if self.reducer.occurrence < 0:
+            last = _last_of_each_step(step)
+            self.time[step[last]] = time[last]
+        else:
+            # Crossings are in order, so their rank in the step is their position minus
+            # the position of the first crossing of the same step
+            rank = np.arange(len(step)) - np.searchsorted(step, step, side="left")
+            hit = self.found[step] + rank == self.reducer.occurrence - 1
+            self.time[step[hit]] = time[hit]
+        self.found += np.bincount(step, minlength=len(self.found))
+
+    def result(self, n_steps: int) -> np.ndarray[Any, Any]:
+        return _grow(self.time, n_steps, np.nan)[:n_steps]
+
+
+@dataclasses.dataclass
+class Crossing(Reducer):
+    """Axis value where the trace crosses a level, with linear interpolation between
+    the points. NaN when the trace doesn't cross the level. The real part is used for
+    complex values.
+
+    :param level: Level to cross
+    :type level: float
+    :param edge: "rise", "fall" or "both"
+    :type edge: str
+    :param occurrence: Which crossing to return, starting at 1. Use -1 for the last one.
+    :type occurrence: int
+    """
+
+    kind: ClassVar[str] = "cross"
+    needs_axis: ClassVar[bool] = True
+
+    level: float = 0.0
+    edge: str = "rise"
+    occurrence: int = 1
+
+    def __post_init__(self) -> None:
+        if self.edge not in ("rise", "fall", "both"):
+            raise ValueError(f"Invalid edge '{self.edge}'. Use 'rise', 'fall' or 'both'")
+        if self.occurrence == 0:
+            raise ValueError("The occurrence starts at 1, or -1 for the last one")
+
+    def _accumulator(self) -> _Accumulator:
+        return _CrossingAccumulator(self)
+
+
+class _SettlingAccumulator(_Accumulator):
+    reducer: Settling
+
+    def __init__(self, reducer: Settling) -> None:
+        super().__init__(reducer)
+        self.first = np.zeros(0)
+        self.settled = np.zeros(0)
+        self.outside = np.zeros(0, dtype=bool)
+
+    def add(
+        self,
+        steps: np.ndarray[Any, Any],
+        values: np.ndarray[Any, Any],
+        axis: np.ndarray[Any, Any] | None,
+        previous: tuple[int, Any, Any] | None,
+    ) -> None:
+        assert axis is not None
+        n_steps = int(steps[-1]) + 1
+        self.first = _grow(self.first, n_steps, np.nan)
+        self.settled = _grow(self.settled, n_steps, np.nan)
+        self.outside = _grow(self.outside, n_steps, False)
+        first = np.flatnonzero(np.concatenate([[True], steps[1:] != steps[:-1]]))
+        new = np.isnan(self.first[steps[first]])
+        self.first[steps[first[new]]] = axis[first[new]]
+        steps, values, axis = _with_previous(steps, values, axis, previous)
+        index = np.flatnonzero(np.abs(values - self.reducer.target) > self.reducer.tolerance)
+        if len(index) == 0:
+            return
+        index = index[_last_of_each_step(steps[index])]
+        step = steps[index]
+        # The step settles on the point after its last point outside the band. When
+        # that point is the last of the chunk, it is given by the next chunk.
+        has_next = index + 1 < len(steps)
+        has_next[has_next] = steps[index[has_next] + 1] == step[has_next]
+        self.settled[step] = np.where(has_next, axis[np.minimum(index + 1, len(axis) - 1)], np.nan)
+        self.outside[step] = True
+
+    def result(self, n_steps: int) -> np.ndarray[Any, Any]:
+        settled = np.where(self.outside, self.settled, self.first)
+        return _grow(settled, n_steps, np.nan)[:n_steps]
+
+
+@dataclasses.dataclass
+class Settling(Reducer):
+    """Axis value from which the trace stays within ``target ± tolerance`` until the
+    end of the step, or of the window. NaN when the trace ends outside the band.
+
+    :param target: Center of the band
+    :type target: float
+    :param tolerance: Half width of the band
+    :type tolerance: float
+    """
+
+    kind: ClassVar[str] = "settle"
+    needs_axis: ClassVar[bool] = True
+
+    target: float
+    tolerance: float
+
+    def _accumulator(self) -> _Accumulator:
+        return _SettlingAccumulator(self)
+
+
+def reduce_raw(
+    raw_filename: str | Path,
+    reducers: Sequence[Reducer],
+    chunk_points: int = CHUNK_POINTS,
+    dialect: str | None = None,
+) -> dict[str, np.ndarray[Any, Any]]:
+    """Computes the reducers on each step of a RAW file, in a single pass over the file
+    and without keeping the waveforms in memory. Only the traces used by the reducers
+    are read.
+
+    :param raw_filename: RAW file to read
+    :type raw_filename: str | Path
+    :param reducers: The reducers to compute
+    :type reducers: Sequence[Reducer]
+    :param chunk_points: Number of points decoded at a time
+    :type chunk_points: int
+    :param dialect: RAW file dialect, see :py:class:`kuPyLTSpice.raw.raw_read.RawRead`.
+    :type dialect: str, optional
+    :raises ValueError: If a reducer needs an axis and the file doesn't have one, or if
+        two reducers have the same column name
+    :return: The ``step`` column, the stepped parameters, if known, and one column per
+        reducer, with one value per step
+    :rtype: dict[str, numpy.ndarray]
+    """
+    columns = [reducer.column for reducer in reducers]
+    if len(set(columns)) != len(columns):
+        raise ValueError(f"Duplicate reducer names in {columns}")
+    named = {str(reducer.expression): reducer.expression for reducer in reducers}
+    reader = _reader(raw_filename, named, chunk_points, dialect)
+    if not reader.has_axis:
+        for reducer in reducers:
+            if reducer.needs_axis:
+                raise ValueError(f"'{reducer.column}' needs a file with an axis")
+    axis_name = reader.trace_names[0] if reader.has_axis else None
+    accumulators = [reducer._accumulator() for reducer in reducers]
+    n_steps = 0
+    for chunk in _evaluate(reader, named):
+        steps = chunk["step"]
+        axis = chunk[axis_name].real if axis_name is not None else None
+        n_steps = int(steps[-1]) + 1
+        for reducer, accumulator in zip(reducers, accumulators, strict=True):
+            accumulator.feed(steps, chunk[str(reducer.expression)], axis)
+    if reader.steps:
+        n_steps = len(reader.steps)
+    table: dict[str, np.ndarray[Any, Any]] = {"step": np.arange(n_steps)}
+    if reader.steps:
+        table.update(
+            (name, np.asarray([step[name] for step in reader.steps])) for name in reader.steps[0]
+        )
+    for column, accumulator in zip(columns, accumulators, strict=True):
+        table[column] = accumulator.result(n_steps)
+    _logger.debug("Computed %d reducers on %d steps of '%s'", len(reducers), n_steps, raw_filename)
+    return table
@@ -0,0 +1,340 @@
+#!/usr/bin/env python
+
+# -------------------------------------------------------------------------------
+#    ____        _   _____ ____        _
+#   |  _ \ _   _| | |_   _/ ___| _ __ (_) ___ ___
+#   | |_) | | | | |   | | \___ \| '_ \| |/ __/ _ \
+#   |  __/| |_| | |___| |  ___) | |_) | | (_|  __/
+#   |_|    \__, |_____|_| |____/| .__/|_|\___\___|
+#          |___/                |_|
+#
+# Name:        raw_resample.py
+# Purpose:     Resampling of traces of several steps and files onto a common axis
+#
+# Licence:     refer to the LICENSE file
+# -------------------------------------------------------------------------------
+"""Resamples traces onto a common axis, so that simulation runs with different time
+steps can be compared point by point.
+
+Each step of each RAW file is a *series*, with its own axis. A :py:class:`Resampler`
+holds all the series and interpolates all their traces at once: the position of the
+grid points in each series is found for all the series together, and the values are
+then gathered as 2-D arrays. The following methods are supported:
+
++ ``"linear"``: linear interpolation between the two closest points.
++ ``"zoh"``: zero-order hold, the value of the last point at or before the grid point.
++ ``"cubic"``: cubic Hermite interpolation, with the slopes computed as in
+  ``numpy.gradient``. Unlike a cubic spline, each interval only depends on its
+  neighbours, so it can be computed for all the series at once.
+
+Grid points outside the axis of a series get the first or last value of the series,
+unless a ``fill_value`` is given.
+
+Example::
+
+    from kuPyLTSpice.raw.raw_resample import resample_raw
+
+    data = resample_raw("./temp/*.raw", ["V(out)", "I(R1)"], points=1000)
+    vout = data.traces["V(out)"]  # (n_series, 1000) array, one row per file and step
+
+    # Or write the resampled traces to a RAW file without keeping them in memory
+    with RawStreamWrite("aligned.raw") as writer:
+        resample_raw("./temp/*.raw", "V(out)", points=10**6, writer=writer)
+"""
+from __future__ import annotations
+
+import dataclasses
+import logging
+from collections.abc import Iterable, Sequence
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+from kuPyLTSpice.raw.raw_loader import expand_raw_files
+from kuPyLTSpice.raw.raw_read import RawRead
+from kuPyLTSpice.raw.raw_write import RawStreamWrite
+
+__all__ = ["METHODS", "Resampled", "Resampler", "resample_raw"]
+
+_logger = logging.getLogger("kupicelib.RawRead")
+
+METHODS = ("linear", "zoh", "cubic")
+
+CHUNK_POINTS = 100_000
+"""Number of grid points computed at a time when writing to a RawStreamWrite."""
+
+
+class Resampler:
+    """Interpolates the traces of several series, each with its own axis, onto a common
+    grid.
+
+    :param axes: Axis of each series. The points don't need to be sorted.
+    :type axes: Sequence[numpy.ndarray]
+    :param values: Values of each series, as an array of shape (n_traces, n_points) with
+        the same number of traces for all the series. 1-D arrays are taken as a single
+        trace.
+    :type values: Sequence[numpy.ndarray]
+    :param method: "linear", "zoh" or "cubic"
+    :type method: str
+    :param fill_value: Value given to the grid points outside the axis of a series. If
+        None, the first or last value of the series is used.
+    :type fill_value: float | complex, optional
+    """
+
+    def __init__(
+        self,
+        axes: Sequence[np.ndarray[Any, Any]],
+        values: Sequence[np.ndarray[Any, Any]],
+        method: str = "linear",
+        fill_value: Any = None,
+    ) -> None:
+        if method not in METHODS:
+            raise ValueError(f"Unknown method '{method}'. Use one of {METHODS}")
+        if len(axes) != len(values) or not axes:
+            raise ValueError("One array of values is needed for each axis")
+        self.method = method
+        self.fill_value = fill_value
+        values = [np.atleast_2d(series) for series in values]
+        lengths = np.array([len(axis) for axis in axes])
+        if np.any(lengths == 0):
+            raise ValueError("All the series need at least one point")
+        if any(series.shape[1] != length for series, length in zip(values, lengths, strict=True)):
+            raise ValueError("The values must have the same number of points as their axis")
+        # The points of all the series are stored together, each series sorted by axis
+        axes = [np.asarray(axis).real.astype(np.float64, copy=False) for axis in axes]
+        unsorted = [i for i, axis in enumerate(axes) if np.any(np.diff(axis) < 0)]
+        for i in unsorted:
+            order = np.argsort(axes[i], kind="stable")
+            axes[i], values[i] = axes[i][order], values[i][:, order]
+        self._series_id = np.repeat(np.arange(len(axes)), lengths)
+        self._x = np.concatenate(axes)
+        dtype = np.result_type(*values, np.float64)
+        self._y = np.concatenate(values, axis=1).astype(dtype, copy=False)
+        self._ends = np.cumsum(lengths)
+        self._starts = self._ends - lengths
+        self._slopes = self._hermite_slopes() if method == "cubic" else None
+
+    @property
+    def n_series(self) -> int:
+        return len(self._starts)
+
+    @property
+    def n_traces(self) -> int:
+        return self._y.shape[0]
+
+    def bounds(self) -> tuple[np.ndarray[Any, Any], np.ndarray[Any, Any]]:
+        """Returns the first and last axis value of each series."""
+        return self._x[self._starts], self._x[self._ends - 1]
+
+    def _hermite_slopes(self) -> np.ndarray[Any, Any]:
+        """Slope of each trace at each point, with the second order central differences
+        of numpy.gradient inside the series and one-sided differences at their ends."""
+        x, y = self._x, self._y
+        slopes = np.zeros_like(y)
+        if len(x) < 2:
+            return slopes
+        h = np.diff(x)
+        dy = np.diff(y, axis=1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            secant = np.where(h > 0, dy / np.where(h > 0, h, 1), 0)
+        # Secants that cross from one series to the next are not used
+        same_series = self._series_id[1:] == self._series_id[:-1]
+        secant[:, ~same_series] = 0
+        before = np.concatenate([[False], same_series])
+        after = np.concatenate([same_series, [False]])
+        slopes[:, after] = secant[:, after[:-1]]  # forward difference
+        slopes[:, before & ~after] = secant[:, (before & ~after)[1:]]  # backward difference
+        inner = np.flatnonzero(before & after)
+        ha, hb = h[inner - 1], h[inner]
+        valid = (ha > 0) & (hb > 0)
+        inner, ha, hb = inner[valid], ha[valid], hb[valid]
+        slopes[:, inner] = (
+            ha**2 * y[:, inner + 1] - hb**2 * y[:, inner - 1] + (hb**2 - ha**2) * y[:, inner]
+        ) / (ha * hb * (ha + hb))
+        return slopes
+
+    def __call__(self, grid: np.ndarray[Any, Any]) -> np.ndarray[Any, Any]:
+        """Interpolates all the traces of all the series on the grid.
+
+        :param grid: Axis values where to interpolate, in increasing order
+        :type grid: numpy.ndarray
+        :return: Array of shape (n_traces, n_series, len(grid))
+        :rtype: numpy.ndarray
+        """
+        grid = np.asarray(grid, dtype=np.float64)
+        if np.any(np.diff(grid) < 0):
+            raise ValueError("The grid must be in increasing order")
+        n_series, n_grid = self.n_series, len(grid)
+        # Number of points of each series at or before each grid point
+        position = np.searchsorted(grid, self._x, side="left")
+        counts = np.bincount(
+            self._series_id * (n_grid + 1) + position, minlength=n_series * (n_grid + 1)
+        ).reshape(n_series, n_grid + 1)
+        at_or_before = np.cumsum(counts, axis=1)[:, :n_grid]
+        starts, ends = self._starts[:, np.newaxis], self._ends[:, np.newaxis]
+        last = starts + at_or_before - 1  # Index of the last point at or before the grid
+        result = np.empty((self.n_traces, n_series, n_grid), dtype=self._y.dtype)
+        # The positions and weights are shared by all the traces, which are then
+        # interpolated one at a time as gathering from 1-D arrays is faster.
+        if self.method == "zoh":
+            index = np.clip(last, starts, ends - 1)
+            for y, out in zip(self._y, result, strict=True):
+                np.take(y, index, out=out)
+        else:
+            low = np.clip(last, starts, np.maximum(ends - 2, starts))
+            high = np.minimum(low + 1, ends - 1)
+            x0 = self._x[low]
+            span = self._x[high] - x0
+            with np.errstate(divide="ignore", invalid="ignore"):
+                t = np.clip(np.where(span > 0, (grid - x0) / np.where(span > 0, span, 1), 0), 0, 1)
+            if self.method == "linear":
+                for y, out in zip(self._y, result, strict=True):
+                    y0 = y.take(low)
+                    np.take(y, high, out=out)
+                    out -= y0
+                    out *= t
+                    out += y0
+            else:
+                assert self._slopes is not None
+                t2 = t * t
+                t3 = t2 * t
+                weights = (
+                    2 * t3 - 3 * t2 + 1,
+                    3 * t2 - 2 * t3,
+                    (t3 - 2 * t2 + t) * span,
+                    (t3 - t2) * span,
+                )
+                for y, slopes, out in zip(self._y, self._slopes, result, strict=True):
+                    out[...] = (
+                        weights[0] * y.take(low)
+                        + weights[1] * y.take(high)
+                        + weights[2] * slopes.take(low)
+                        + weights[3] * slopes.take(high)
+                    )
+        if self.fill_value is not None:
+            first, final = self.bounds()
+            outside = (grid < first[:, np.newaxis]) | (grid > final[:, np.newaxis])
+            result[:, outside] = self.fill_value
+        return result
+
+
+@dataclasses.dataclass
+class Resampled:
+    """Traces of several files and steps on a common axis, as returned by
+    :py:func:`resample_raw`."""
+
+    axis_name: str
+    grid: np.ndarray[Any, Any]
+    traces: dict[str, np.ndarray[Any, Any]]
+    """For each trace, an array of shape (n_series, n_grid)"""
+    series: list[tuple[Path, int]]
+    """RAW file and step of each series"""
+
+
+def _read_series(
+    raw_files: list[Path], traces: str | list[str] | tuple[str, ...]
+) -> tuple[str, list[str], bool, list[tuple[Path, int]], list[Any], list[Any]]:
+    """Reads the traces of each step of each file."""
+    axis_name = ""
+    names: list[str] = []
+    log_axis = False
+    series: list[tuple[Path, int]] = []
+    axes: list[np.ndarray[Any, Any]] = []
+    values: list[np.ndarray[Any, Any]] = []
+    for raw_file in raw_files:
+        raw = RawRead(raw_file, traces, verbose=False)
+        if raw.axis is None:
+            raise ValueError(f"'{raw_file}' has no axis to resample on")
+        if not names:
+            axis_name = raw.axis.name
+            names = raw.get_trace_names()[1:]
+            log_axis = "log" in raw.raw_params["Flags"].split()
+        data = [raw.get_trace(name).data for name in names]
+        axis_data = raw.axis.data.real if np.iscomplexobj(raw.axis.data) else raw.axis.data
+        if raw.axis.name == "time":
+            axis_data = np.abs(axis_data)
+        for step, (start, end) in enumerate(zip(*raw.axis.step_bounds(), strict=True)):
+            series.append((Path(raw_file), step))
+            axes.append(axis_data[start:end])
+            values.append(np.stack([trace[start:end] for trace in data]))
+    return axis_name, names, log_axis, series, axes, values
+
+
+def resample_raw(
+    raw_files: str | Path | Iterable[str | Path],
+    traces: str | list[str] | tuple[str, ...],
+    grid: np.ndarray[Any, Any] | None = None,
+    points: int | None = None,
+    method: str = "linear",
+    fill_value: Any = None,
+    writer: RawStreamWrite | None = None,
+    name_format: str = "{trace}@{run}:{step}",
+) -> Resampled | None:
+    """Resamples the traces of all the steps of several RAW files onto a common grid.
+
+    :param raw_files: A glob pattern or a list of RAW files
+    :type raw_files: str | Path | Iterable[str | Path]
+    :param traces: Names or glob patterns of the traces to resample. The axis is not to
+        be included.
+    :type traces: str | list[str] | tuple[str, ...]
+    :param grid: Axis values to resample on. By default, ``points`` values evenly spaced
+        over the axis range common to all the series, on a logarithmic scale for
+        AC analyses.
+    :type grid: numpy.ndarray, optional
+    :param points: Number of points of the default grid. Defaults to the number of points
+        of the longest series.
+    :type points: int, optional
+    :param method: "linear", "zoh" or "cubic", see :py:class:`Resampler`
+    :type method: str
+    :param fill_value: Value of the grid points outside the axis of a series
+    :type fill_value: float | complex, optional
+    :param writer: If given, the resampled traces are written to this RAW file, which
+        must not have any trace yet, a chunk of grid points at a time, instead of being
+        returned. The file has one trace per trace and series.
+    :type writer: RawStreamWrite, optional
+    :param name_format: Name of the traces written to the writer. The fields ``trace``,
+        ``run`` (the name of the RAW file) and ``step`` are available.
+    :type name_format: str
+    :raises FileNotFoundError: If no files are found
+    :raises ValueError: If the series don't have a common axis range
+    :return: The resampled traces, or None when written to a writer
+    :rtype: Resampled | None
+    """
+    files = expand_raw_files(raw_files)
+    if not files:
+        raise FileNotFoundError(f"No RAW files found in {raw_files}")
+    axis_name, names, log_axis, series, axes, values = _read_series(files, traces)
+    resampler = Resampler(axes, values, method, fill_value)
+    if grid is None:
+        first, final = resampler.bounds()
+        start, stop = first.max(), final.min()
+        if start > stop:
+            raise ValueError("The series don't have a common axis range")
+        points = points or max(len(axis) for axis in axes)
+        if log_axis and start > 0:
+            grid = np.geomspace(start, stop, points)
+        else:
+            grid = np.linspace(start, stop, points)
+    grid = np.asarray(grid, dtype=np.float64)
+    _logger.info(
+        "Resampling %d traces of %d series on %d points", len(names), len(series), len(grid)
+    )
+    if writer is None:
+        result = resampler(grid)
+        return Resampled(axis_name, grid, dict(zip(names, result, strict=True)), series)
+
+    complex_data = any(np.iscomplexobj(series_values) for series_values in values)
+    writer.add_trace(axis_name, numerical_type="complex" if complex_data else "double")
+    writer.flag_log = log_axis
+    for raw_file, step in series:
+        for name in names:
+            writer.add_trace(
+                name_format.format(trace=name, run=raw_file.stem, step=step),
+                "current" if name.startswith(("I(", "Ix(")) else "voltage",
+            )
+    for start in range(0, len(grid), CHUNK_POINTS):
+        chunk = grid[start : start + CHUNK_POINTS]
+        result = resampler(chunk)
+        writer.append(chunk, *(row for series_rows in result.swapaxes(0, 1) for row in series_rows))
+    return None
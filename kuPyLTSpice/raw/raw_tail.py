@@ -0,0 +1,212 @@
+#!/usr/bin/env python
+
+# -------------------------------------------------------------------------------
+#    ____        _   _____ ____        _
+#   |  _ \ _   _| | |_   _/ ___| _ __ (_) ___ ___
+#   | |_) | | | | |   | | \___ \| '_ \| |/ __/ _ \
+#   |  __/| |_| | |___| |  ___) | |_) | | (_|  __/
+#   |_|    \__, |_____|_| |____/| .__/|_|\___\___|
+#          |___/                |_|
+#
+# Name:        raw_tail.py
+# Purpose:     Read a RAW file while the simulator is still writing it
+#
+# Licence:     refer to the LICENSE file
+# -------------------------------------------------------------------------------
+"""Reads a binary RAW file while the simulator is still writing it.
+
+LTspice writes the points of a simulation to the RAW file as they are computed. The
+header is parsed once, when it is complete, and then each call to
+:py:meth:`RawTailReader.read_new` returns the points appended since the previous call.
+The ``No. Points`` field of the header is ignored, as it is only final when the
+simulation ends. Only the Normal layout can be tailed, FastAccess files are written at
+the end of the simulation.
+
+Example::
+
+    reader = RawTailReader("long_transient.raw", ["V(out)"])
+    for chunk in reader.chunks(idle_timeout=60):
+        print(chunk["time"][-1], chunk["V(out)"].max())
+"""
+from __future__ import annotations
+
+import logging
+import os
+import re
+import tempfile
+import time
+from collections.abc import Callable, Iterator
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+from kupicelib.raw.raw_classes import SpiceReadException
+
+from kuPyLTSpice.raw.raw_read import NUMPY_TYPES, RawRead, find_binary_start
+
+__all__ = ["RawTailReader"]
+
+_logger = logging.getLogger("kupicelib.RawRead")
+
+_NO_POINTS = re.compile(r"^(No\. Points:[ \t]*)0+[ \t]*$", re.MULTILINE)
+"""Point count of a file still being written, as done by
+:py:class:`kuPyLTSpice.raw.raw_write.RawStreamWrite`"""
+
+
+def _parse_header(
+    raw_filename: Path, binary_start: int, encoding: str, dialect: str | None
+) -> RawRead:
+    """Parses the header of a RAW file whose number of points may still be 0. RawRead
+    refuses such files, so a copy of the header with one point is parsed instead. The
+    traces don't depend on the number of points."""
+    with open(raw_filename, "rb") as raw_file:
+        text = raw_file.read(binary_start).decode(encoding)
+    text = _NO_POINTS.sub(r"\g<1>1", text, count=1)
+    with tempfile.TemporaryDirectory() as folder:
+        header_file = Path(folder) / raw_filename.name
+        header_file.write_bytes(text.encode(encoding))
+        header = RawRead(header_file, "*", dialect, headeronly=True, verbose=False)
+    header.raw_params["Filename"] = raw_filename
+    return header
+
+
+class RawTailReader:
+    """Reads the points of a binary RAW file as they are appended by the simulator.
+
+    :param raw_filename: RAW file to read. It doesn't need to exist yet.
+    :type raw_filename: str | Path
+    :param traces_to_read: Name or list of names of the traces to return, or "*" for all
+        the traces. The axis is always returned.
+    :type traces_to_read: str | list[str] | tuple[str, ...]
+    :param dialect: RAW file dialect, see :py:class:`kuPyLTSpice.raw.raw_read.RawRead`.
+    :type dialect: str, optional
+    """
+
+    def __init__(
+        self,
+        raw_filename: str | Path,
+        traces_to_read: str | list[str] | tuple[str, ...] = "*",
+        dialect: str | None = None,
+    ) -> None:
+        self.raw_filename = Path(raw_filename)
+        self.traces_to_read = (
+            [traces_to_read]
+            if isinstance(traces_to_read, str) and traces_to_read != "*"
+            else traces_to_read
+        )
+        self.dialect = dialect
+        self.header: RawRead | None = None
+        """Header information, available once the header was written. The number of
+        points of this object is not meaningful."""
+        self.points = 0
+        """Number of points read so far."""
+        self._position = 0
+        self._record_dtype: np.dtype[Any] | None = None
+        self._fields: dict[str, str] = {}
+
+    def _read_header(self) -> bool:
+        """Parses the header if it is complete. Returns False if it isn't."""
+        if not self.raw_filename.exists():
+            return False
+        # The encoding is detected from the first bytes, as done by the RawRead class
+        with open(self.raw_filename, "rb") as raw_file:
+            start = raw_file.read(6)
+        if len(start) < 6:
+            return False
+        encoding = "utf_16_le" if start[1] == 0 else "utf_8"
+        try:
+            binary_start = find_binary_start(self.raw_filename, encoding)
+        except SpiceReadException:
+            return False  # Not completely written yet
+        header = _parse_header(self.raw_filename, binary_start, encoding, self.dialect)
+        if header.raw_type != "Binary:":
+            raise SpiceReadException(
+                f"Only binary RAW files can be tailed, '{self.raw_filename}' is ASCII"
+            )
+        if "fastaccess" in header.raw_params["Flags"].lower():
+            raise SpiceReadException(
+                f"FastAccess RAW files can't be tailed: '{self.raw_filename}'"
+            )
+        names = header.get_trace_names()
+        for name in self.traces_to_read if self.traces_to_read != "*" else []:
+            if name not in names:
+                raise IndexError(f"{self.raw_filename} doesn't contain trace '{name}'")
+        self._record_dtype = np.dtype(
+            {
+                "names": [f"t{i}" for i in range(len(names))],
+                "formats": [NUMPY_TYPES[trace.numerical_type] for trace in header._traces],
+            }
+        )
+        self._fields = {
+            name: f"t{i}"
+            for i, name in enumerate(names)
+            if i == 0 or self.traces_to_read == "*" or name in self.traces_to_read
+        }
+        self.header = header
+        self._position = binary_start
+        _logger.debug("Tailing '%s' from byte %d", self.raw_filename, binary_start)
+        return True
+
+    def read_new(self) -> dict[str, np.ndarray[Any, Any]] | None:
+        """Reads the points appended since the last call. An incomplete point at the end
+        of the file is left for the next call.
+
+        :raises SpiceReadException: If the file is an ASCII or a FastAccess RAW file.
+        :return: A dictionary with the new values of each trace, or None if there are no
+            new points or the header isn't complete yet.
+        :rtype: dict[str, numpy.ndarray] | None
+        """
+        if self.header is None and not self._read_header():
+            return None
+        assert self._record_dtype is not None
+        available = os.stat(self.raw_filename).st_size - self._position
+        count = available // self._record_dtype.itemsize
+        if count <= 0:
+            return None
+        records = np.fromfile(
+            self.raw_filename, dtype=self._record_dtype, count=count, offset=self._position
+        )
+        self._position += records.nbytes
+        self.points += len(records)
+        chunk = {name: np.asarray(records[field]) for name, field in self._fields.items()}
+        if "time" in chunk:
+            # LTspice marks some points with a negative time, as done in Axis.get_wave()
+            chunk["time"] = np.abs(chunk["time"])
+        return chunk
+
+    def chunks(
+        self,
+        stop: Callable[[], bool] | None = None,
+        idle_timeout: float | None = None,
+        poll_interval: float = 0.5,
+    ) -> Iterator[dict[str, np.ndarray[Any, Any]]]:
+        """Yields the new points as they are written, until the ``stop`` function returns
+        True or no point is written for ``idle_timeout`` seconds. The points written
+        before the stop are still returned.
+
+        :param stop: Function that returns True when the writing has finished, for
+            example when the simulation process has ended.
+        :type stop: Callable[[], bool], optional
+        :param idle_timeout: Time in seconds without new points after which the reading
+            stops. None waits forever.
+        :type idle_timeout: float, optional
+        :param poll_interval: Time in seconds between checks of the file size.
+        :type poll_interval: float, optional
+        :return: Iterator over the chunks returned by :py:meth:`read_new`
+        """
+        last_data = time.monotonic()
+        while True:
+            finished = stop is not None and stop()
+            chunk = self.read_new()
+            if chunk is not None:
+                last_data = time.monotonic()
+                yield chunk
+                continue
+            if finished:
+                return
+            if idle_timeout is not None and time.monotonic() - last_data > idle_timeout:
+                _logger.info(
+                    "No data written to '%s' for %s seconds", self.raw_filename, idle_timeout
+                )
+                return
+            time.sleep(poll_interval)
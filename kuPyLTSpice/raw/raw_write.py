@@ -19,9 +19,330 @@
 
 """This module generates RAW Files from user data.
 
-It can be used to combine RAW files generated by different Simulation Runs
+It can be used to combine RAW files generated by different Simulation Runs.
+
+The RawWrite class needs all the data in memory before saving. The RawStreamWrite class
+writes the points as they are appended, so that files larger than the memory can be
+generated::
+
+    with RawStreamWrite("scope.raw") as writer:
+        writer.add_trace("time")
+        writer.add_trace("V(probe)")
+        for time_chunk, probe_chunk in read_chunks():
+            writer.append(time_chunk, probe_chunk)
 """
-from kupicelib.raw.raw_write import RawWrite, Trace
+from __future__ import annotations
+
+from collections.abc import Sequence
+from pathlib import Path
+from time import strftime
+from types import TracebackType
+from typing import IO, Any
+
+import numpy as np
+from kupicelib.raw.raw_classes import DataSet
+from kupicelib.raw.raw_write import RawWrite as _RawWrite
+from kupicelib.raw.raw_write import Trace as _Trace
+
+from kuPyLTSpice.raw.raw_read import NUMPY_TYPES
 
 # Re-export the classes
-__all__ = ["RawWrite", "Trace"]
+__all__ = ["RawStreamWrite", "RawWrite", "Trace"]
+
+
+def _raw_header(
+    plot_name: str | None,
+    flags: str,
+    variables: Sequence[tuple[str, str]],
+    points: int,
+    offset: float,
+) -> str:
+    """Returns the header of a binary RAW file, up to and including the Binary: line.
+
+    :param variables: Name and type of each trace
+    """
+    header = (
+        "Title: * kupicelib RawWrite\n"
+        f"Date: {strftime('%a %b %d %H:%M:%S %Y')}\n"
+        f"Plotname: {plot_name}\n"
+        f"Flags: {flags}\n"
+        f"No. Variables: {len(variables)}\n"
+        f"No. Points: {points:12}\n"
+        f"Offset:   {offset:.16e}\n"
+        "Command: Linear Technology Corporation LTspice XVII\n"
+        "Variables:\n"
+    )
+    for i, (name, whattype) in enumerate(variables):
+        header += f"\t{i}\t{name}\t{whattype}\n"
+    return header + "Binary:\n"
+
+
+def _records(traces: Sequence[Any], length: int) -> np.ndarray[Any, Any]:
+    """Returns an empty structured array with one field per trace, in the Normal RAW file
+    layout where the values of all the traces of a point are stored together."""
+    dtype = np.dtype(
+        {
+            "names": [f"t{i}" for i in range(len(traces))],
+            "formats": [NUMPY_TYPES[trace.numerical_type] for trace in traces],
+        }
+    )
+    return np.empty(length, dtype=dtype)
+
+
+class Trace(_Trace):
+    """Trace to be written in a RAW file. See :py:class:`kupicelib.raw.raw_write.Trace`.
+
+    Numpy arrays are kept as they are, without being copied, when their type already
+    matches the numerical type of the trace. If no numerical type is given, it is taken
+    from the array type: "complex" for complex arrays and "real" otherwise.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        data: Sequence[float | complex] | np.ndarray[Any, Any],
+        whattype: str = "voltage",
+        numerical_type: str = "",
+    ) -> None:
+        if not isinstance(data, np.ndarray) or name == "frequency":
+            super().__init__(name, data, whattype, numerical_type)
+            return
+        if name == "time":
+            whattype = "time"
+        if numerical_type == "":
+            if name == "time":
+                numerical_type = "double"
+            elif np.iscomplexobj(data):
+                numerical_type = "complex"
+            else:
+                numerical_type = "real"
+        DataSet.__init__(self, name, whattype, 0, numerical_type=numerical_type)
+        self.data = np.asarray(data, dtype=NUMPY_TYPES[numerical_type])
+
+
+class RawWrite(_RawWrite):
+    """Generates RAW files. See :py:class:`kupicelib.raw.raw_write.RawWrite`.
+
+    The binary section is written with a single buffer write, in both the FastAccess and
+    the Normal layouts, instead of packing each value separately.
+    """
+
+    def save(self, filename: str | Path) -> None:
+        """Saves the RAW file to disk.
+
+        :param filename: Path where the RAW file will be written.
+        :type filename: str | Path
+        """
+        if len(self._imported_data):
+            self._consolidate()
+        # Complex RAW files aren't converted to FastAccess
+        fast_access = self.flag_fastaccess and self.flag_numtype != "complex"
+        flag_fastaccess = self.flag_fastaccess
+        self.flag_fastaccess = fast_access
+        header = _raw_header(
+            self.plot_name,
+            self._str_flags(),
+            [(trace.name, trace.whattype) for trace in self._traces],
+            len(self._traces[0]),
+            self.offset,
+        )
+        self.flag_fastaccess = flag_fastaccess
+        with open(filename, "wb") as raw_file:
+            raw_file.write(header.encode(self.encoding))
+            if fast_access:
+                for trace in self._traces:
+                    data = np.ascontiguousarray(
+                        trace.data, dtype=NUMPY_TYPES[trace.numerical_type]
+                    )
+                    raw_file.write(data.data)
+            else:
+                records = _records(self._traces, len(self._traces[0]))
+                for i, trace in enumerate(self._traces):
+                    records[f"t{i}"] = trace.data
+                raw_file.write(records.data)
+
+
+class RawStreamWrite:
+    """Writes a RAW file incrementally. The traces are declared first, and then the data
+    is appended in chunks of points. Only the chunk being written is kept in memory. The
+    number of points in the header is updated when the file is closed.
+
+    The data is written in the Normal (non FastAccess) layout, where all the trace
+    values of a point are stored together.
+
+    :param filename: Path of the RAW file to create
+    :type filename: str | Path
+    :param plot_name: Name of the plot. If None, it is inferred from the first trace.
+    :type plot_name: str, optional
+    :param numtype: Numerical type of the file, "real" or "complex". Use "auto" to infer
+        it from the first trace.
+    :type numtype: str, optional
+    :param encoding: Character encoding of the header. Defaults to "utf_16_le".
+    :type encoding: str, optional
+    """
+
+    def __init__(
+        self,
+        filename: str | Path,
+        plot_name: str | None = None,
+        numtype: str = "auto",
+        encoding: str = "utf_16_le",
+    ) -> None:
+        self.filename = Path(filename)
+        self.plot_name = plot_name
+        self.flag_numtype = numtype
+        self.flag_forward = False
+        self.flag_log = False
+        self.flag_stepped = False
+        self.offset = 0.0
+        self.encoding = encoding
+        self.points = 0
+        self._traces: list[tuple[str, str, str]] = []
+        self._record_dtype: np.dtype[Any] | None = None
+        self._points_position = 0
+        self._file: IO[bytes] | None = open(self.filename, "wb")  # noqa: SIM115
+
+    def add_trace(
+        self, name: str, whattype: str = "voltage", numerical_type: str = ""
+    ) -> None:
+        """Declares a trace. The first trace is the axis of the plot. All the traces must
+        be declared before the first call to append().
+
+        :param name: Name of the trace
+        :type name: str
+        :param whattype: "time", "frequency", "voltage" or "current". The types of the
+            "time" and "frequency" traces are set automatically.
+        :type whattype: str, optional
+        :param numerical_type: "real", "double" or "complex". If empty, "time" traces are
+            "double", and the other traces use the numerical type of the file.
+        :type numerical_type: str, optional
+        :raises RuntimeError: If the data was already started
+        :raises ValueError: If the type of the axis can't be determined
+        """
+        if self._record_dtype is not None:
+            raise RuntimeError("Traces can't be added after the data was started")
+        if name == "time":
+            whattype = "time"
+        elif name == "frequency":
+            whattype = "frequency"
+        if not self._traces:
+            if whattype == "time":
+                self.plot_name = self.plot_name or "Transient Analysis"
+                flag_numtype = "real"
+            elif whattype == "frequency":
+                if numerical_type == "complex" or self.flag_numtype == "complex":
+                    self.plot_name = self.plot_name or "AC Analysis"
+                    flag_numtype = "complex"
+                elif numerical_type:
+                    self.plot_name = (
+                        self.plot_name or "Noise Spectral Density - (V/Hz½ or A/Hz½)"
+                    )
+                    flag_numtype = "real"
+                else:
+                    raise ValueError(
+                        "For frequency plots, please specify the numerical_type:\n"
+                        "   * numerical_type='complex' for .AC analysis\n"
+                        "   * numerical_type='double' for .NOISE analysys"
+                    )
+            elif whattype in ("voltage", "current"):
+                self.plot_name = self.plot_name or "DC transfer characteristic"
+                flag_numtype = "real"
+            elif whattype == "param":
+                self.plot_name = self.plot_name or "Operating Point"
+                flag_numtype = "real"
+            else:
+                raise ValueError(
+                    "First Trace needs to be either 'time', 'frequency', 'param', "
+                    "'voltage' or 'current'"
+                )
+            if self.flag_numtype == "auto":
+                self.flag_numtype = flag_numtype
+        if not numerical_type:
+            numerical_type = "double" if whattype == "time" else self.flag_numtype
+        if numerical_type not in NUMPY_TYPES:
+            raise ValueError(f"Invalid numerical type '{numerical_type}'")
+        self._traces.append((name, whattype, numerical_type))
+
+    def _str_flags(self) -> str:
+        flags = [self.flag_numtype]
+        if self.flag_forward:
+            flags.append("forward")
+        if self.flag_log:
+            flags.append("log")
+        if self.flag_stepped:
+            flags.append("stepped")
+        return " ".join(flags)
+
+    def _write_header(self) -> None:
+        assert self._file is not None
+        if not self._traces:
+            raise RuntimeError("No traces were declared")
+        header = _raw_header(
+            self.plot_name,
+            self._str_flags(),
+            [(name, whattype) for name, whattype, _ in self._traces],
+            self.points,
+            self.offset,
+        )
+        points_field = header.index("No. Points: ") + len("No. Points: ")
+        self._points_position = len(header[:points_field].encode(self.encoding))
+        self._file.write(header.encode(self.encoding))
+        self._record_dtype = np.dtype(
+            {
+                "names": [f"t{i}" for i in range(len(self._traces))],
+                "formats": [NUMPY_TYPES[numtype] for _, _, numtype in self._traces],
+            }
+        )
+
+    def append(self, *chunks: Any) -> None:
+        """Appends points to the file. One array is given per trace, in the order the
+        traces were declared, all with the same length.
+
+        :param chunks: The values of each trace
+        :type chunks: numpy.ndarray or sequence of float/complex
+        :raises ValueError: If the number of arrays or their lengths don't match
+        """
+        if self._file is None:
+            raise RuntimeError("The file is already closed")
+        if self._record_dtype is None:
+            self._write_header()
+        assert self._record_dtype is not None
+        if len(chunks) != len(self._traces):
+            raise ValueError(f"Expected {len(self._traces)} arrays, got {len(chunks)}")
+        length = len(chunks[0])
+        if any(len(chunk) != length for chunk in chunks):
+            raise ValueError("All the arrays must have the same length")
+        records = np.empty(length, dtype=self._record_dtype)
+        for i, chunk in enumerate(chunks):
+            records[f"t{i}"] = chunk
+        self._file.write(records.tobytes())
+        self.points += length
+
+    def flush(self) -> None:
+        """Writes the appended points to the disk, so that they can be read while the
+        file is still open, for example by :py:class:`kuPyLTSpice.raw.raw_tail.RawTailReader`.
+        The number of points of the header stays 0 until the file is closed."""
+        if self._file is not None:
+            self._file.flush()
+
+    def close(self) -> None:
+        """Updates the number of points in the header and closes the file."""
+        if self._file is None:
+            return
+        if self._record_dtype is None:
+            self._write_header()
+        self._file.seek(self._points_position)
+        self._file.write(f"{self.points:12}".encode(self.encoding))
+        self._file.close()
+        self._file = None
+
+    def __enter__(self) -> RawStreamWrite:
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        self.close()
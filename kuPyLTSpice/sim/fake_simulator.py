@@ -0,0 +1,237 @@
+#!/usr/bin/env python
+
+# -------------------------------------------------------------------------------
+#    ____        _   _____ ____        _
+#   |  _ \ _   _| | |_   _/ ___| _ __ (_) ___ ___
+#   | |_) | | | | |   | | \___ \| '_ \| |/ __/ _ \
+#   |  __/| |_| | |___| |  ___) | |_) | | (_|  __/
+#   |_|    \__, |_____|_| |____/| .__/|_|\___\___|
+#          |___/                |_|
+#
+# Name:        fake_simulator.py
+# Purpose:     Simulator that replays canned result files, for tests without LTspice
+#
+# Licence:     refer to the LICENSE file
+# -------------------------------------------------------------------------------
+"""A simulator that doesn't simulate: it waits for a configurable time and writes canned
+RAW and log files next to the netlist, as LTspice would. It allows running and measuring
+:py:class:`kuPyLTSpice.sim.sim_runner.SimRunner` on machines without LTspice::
+
+    from kuPyLTSpice.sim.fake_simulator import FakeSimulator
+
+    simulator = FakeSimulator.create(
+        "testfiles/TRAN_1.raw", "testfiles/TRAN_1.log", latency=(0.1, 0.5), failure_rate=0.05
+    )
+    runner = SimRunner(simulator=simulator, parallel_sims=8, output_folder="./temp")
+
+Each call to :py:meth:`FakeSimulator.create` returns a new class, with its own settings
+and its own :py:attr:`FakeSimulator.records`.
+"""
+from __future__ import annotations
+
+import dataclasses
+import logging
+import random
+import shutil
+import subprocess
+import threading
+import time
+from collections.abc import Sequence
+from os import PathLike
+from pathlib import Path
+from typing import Any, ClassVar
+
+import numpy as np
+from kupicelib.sim.simulator import Simulator
+
+from kuPyLTSpice.raw.raw_write import RawStreamWrite
+
+__all__ = ["FakeRun", "FakeSimulator"]
+
+_logger = logging.getLogger("kupicelib.FakeSimulator")
+
+STOPPED_RETCODE = -9
+"""Return code of a stopped simulation, as the one of a killed process"""
+
+
+@dataclasses.dataclass
+class FakeRun:
+    """A simulation done by a :py:class:`FakeSimulator`."""
+
+    netlist_file: Path
+    start: float
+    """Time at which run() was called, as given by time.time()"""
+    end: float
+    """Time at which the result files were written"""
+    retcode: int
+
+
+class FakeSimulator(Simulator):
+    """Simulator replaying canned result files. Use :py:meth:`create` to configure it."""
+
+    spice_exe: ClassVar[list[str]] = ["fake-ltspice"]
+    process_name: str = ""
+    raw_file: ClassVar[Path | None] = None
+    """RAW file copied next to each netlist"""
+    log_file: ClassVar[Path | None] = None
+    """Log file copied next to each netlist"""
+    latency: ClassVar[float | tuple[float, float]] = 0.0
+    """Duration of each simulation in seconds, or the range of a uniform distribution"""
+    failure_rate: ClassVar[float] = 0.0
+    """Probability of a simulation to fail"""
+    output_points: ClassVar[int | None] = None
+    """Number of points of a synthetic RAW file written instead of the canned one"""
+    records: ClassVar[list[FakeRun]] = []
+    """The simulations done, in the order they ended"""
+    _random: ClassVar[random.Random] = random.Random()
+    _lock: ClassVar[threading.Lock] = threading.Lock()
+    _running: ClassVar[dict[Path, threading.Event]] = {}
+    _raw_content: ClassVar[bytes | None] = None
+
+    @classmethod
+    def create(
+        cls,
+        raw_file: str | Path | PathLike[str],
+        log_file: str | Path | PathLike[str],
+        *,
+        latency: float | tuple[float, float] = 0.0,
+        failure_rate: float = 0.0,
+        output_points: int | None = None,
+        seed: int | None = None,
+    ) -> type[FakeSimulator]:
+        """Creates a simulator class replaying the given files.
+
+        :param raw_file: RAW file written by each successful simulation
+        :type raw_file: str | Path
+        :param log_file: Log file written by each simulation
+        :type log_file: str | Path
+        :param latency: Duration of a simulation in seconds, or a (minimum, maximum) range
+        :type latency: float | tuple[float, float], optional
+        :param failure_rate: Probability, between 0 and 1, of a simulation to fail. A
+            failed simulation writes the log file but not the RAW file.
+        :type failure_rate: float, optional
+        :param output_points: If given, the simulations write a transient RAW file with
+            this number of points instead of the canned RAW file
+        :type output_points: int, optional
+        :param seed: Seed of the random draws of the latencies and of the failures
+        :type seed: int, optional
+        :raises FileNotFoundError: If a file doesn't exist
+        :raises ValueError: If the failure rate isn't between 0 and 1
+        :return: The simulator class
+        :rtype: type[FakeSimulator]
+        """
+        raw_file = Path(raw_file)
+        log_file = Path(log_file)
+        for path in (raw_file, log_file):
+            if not path.exists():
+                raise FileNotFoundError(f"Canned file not found: {path}")
+        if not 0 <= failure_rate <= 1:
+            raise ValueError(f"The failure rate must be between 0 and 1, not {failure_rate}")
+        return type(
+            cls.__name__,
+            (cls,),
+            {
+                "raw_file": raw_file,
+                "log_file": log_file,
+                "latency": latency,
+                "failure_rate": failure_rate,
+                "output_points": output_points,
+                "records": [],
+                "_random": random.Random(seed),
+                "_lock": threading.Lock(),
+                "_running": {},
+                "_raw_content": None,
+            },
+        )
+
+    @classmethod
+    def _synthetic_raw(cls, raw_file: Path) -> None:
+        """Writes the synthetic RAW file, built once and then copied."""
+        with cls._lock:
+            if cls._raw_content is None:
+                assert cls.output_points is not None
+                with RawStreamWrite(raw_file) as writer:
+                    writer.add_trace("time")
+                    writer.add_trace("V(out)")
+                    time_axis = np.linspace(0, 1e-3, cls.output_points)
+                    writer.append(time_axis, np.sin(2e4 * np.pi * time_axis))
+                cls._raw_content = raw_file.read_bytes()
+                return
+        raw_file.write_bytes(cls._raw_content)
+
+    @classmethod
+    def run(
+        cls,
+        netlist_file: str | Path | PathLike[str],
+        cmd_line_switches: Sequence[str] | None = None,
+        timeout: float | None = None,
+        stdout: Any | None = None,
+        stderr: Any | None = None,
+        exe_log: bool = False,
+    ) -> int:
+        """Waits for the latency, and writes the result files next to the netlist.
+
+        :raises subprocess.TimeoutExpired: If the latency is longer than the timeout, as
+            :py:meth:`kuPyLTSpice.sim.ltspice_simulator.LTspiceCustom.run` does
+        :return: 0 if the simulation succeeded, 1 if it failed, and
+            :py:data:`STOPPED_RETCODE` if it was stopped
+        :rtype: int
+        """
+        if cls.raw_file is None or cls.log_file is None:
+            raise RuntimeError("Use FakeSimulator.create() to configure the simulator")
+        start = time.time()
+        netlist_path = Path(netlist_file)
+        key = netlist_path.resolve()
+        with cls._lock:
+            latency = (
+                cls._random.uniform(*cls.latency)
+                if isinstance(cls.latency, tuple)
+                else cls.latency
+            )
+            failed = cls._random.random() < cls.failure_rate
+            stop_event = cls._running[key] = threading.Event()
+        if exe_log:
+            _logger.info("Running fake simulation on %s", netlist_path)
+        try:
+            wait = latency if timeout is None else min(latency, timeout)
+            stopped = wait > 0 and stop_event.wait(wait)
+            if not stopped and timeout is not None and latency > timeout:
+                raise subprocess.TimeoutExpired([*cls.spice_exe, str(netlist_path)], timeout)
+        finally:
+            with cls._lock:
+                cls._running.pop(key, None)
+        shutil.copyfile(cls.log_file, netlist_path.with_suffix(".log"))
+        if stopped:
+            retcode = STOPPED_RETCODE
+        elif failed:
+            retcode = 1
+        else:
+            retcode = 0
+            raw_file = netlist_path.with_suffix(cls.raw_extension)
+            if cls.output_points is None:
+                shutil.copyfile(cls.raw_file, raw_file)
+            else:
+                cls._synthetic_raw(raw_file)
+        with cls._lock:
+            cls.records.append(FakeRun(netlist_path, start, time.time(), retcode))
+        return retcode
+
+    @classmethod
+    def stop(cls, netlist_file: str | Path | PathLike[str]) -> bool:
+        """Stops a simulation started with run(), which then returns
+        :py:data:`STOPPED_RETCODE`.
+
+        :param netlist_file: Path to the netlist file given to run()
+        :return: True if the simulation was running and was stopped.
+        """
+        with cls._lock:
+            stop_event = cls._running.get(Path(netlist_file).resolve())
+        if stop_event is None:
+            return False
+        stop_event.set()
+        return True
+
+    @classmethod
+    def valid_switch(cls, switch: str, switch_param: Any) -> list[str]:
+        """Accepts all the switches, which are ignored."""
+        return [switch] if switch_param is None else [switch, str(switch_param)]
@@ -0,0 +1,171 @@
+#!/usr/bin/env python
+
+# -------------------------------------------------------------------------------
+#    ____        _   _____ ____        _
+#   |  _ \ _   _| | |_   _/ ___| _ __ (_) ___ ___
+#   | |_) | | | | |   | | \___ \| '_ \| |/ __/ _ \
+#   |  __/| |_| | |___| |  ___) | |_) | | (_|  __/
+#   |_|    \__, |_____|_| |____/| .__/|_|\___\___|
+#          |___/                |_|
+#
+# Name:        job_queue.py
+# Purpose:     Priority queue of the simulations submitted to SimRunner
+#
+# Licence:     refer to the LICENSE file
+# -------------------------------------------------------------------------------
+"""Queue of the simulations submitted with
+:py:meth:`kuPyLTSpice.sim.sim_runner.SimRunner.submit`.
+
+The jobs are started by decreasing priority, and, for a same priority, by decreasing
+estimated cost. Starting the longest simulations first keeps the short ones for the end
+of the batch, where they fill the slots left by the long ones, instead of having a long
+simulation started last running alone on an otherwise idle machine.
+
+The cost of a job is its expected duration in seconds. When it isn't given, it's learned
+by :py:class:`RuntimeEstimator` from the previous runs of the same netlist.
+"""
+from __future__ import annotations
+
+import dataclasses
+import heapq
+import itertools
+import threading
+from os import PathLike
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from kupicelib.editor.base_editor import BaseEditor
+
+if TYPE_CHECKING:
+    from kuPyLTSpice.sim.run_task import RunTask
+
+__all__ = ["JobInfo", "JobQueue", "QueueState", "RuntimeEstimator"]
+
+
+@dataclasses.dataclass
+class JobInfo:
+    """Snapshot of a submitted simulation."""
+
+    runno: int
+    netlist_file: Path
+    """Netlist in the output folder"""
+    priority: int
+    cost: float | None
+    """Estimated duration in seconds, None when unknown"""
+    submit_time: float | None
+    start_time: float | None
+    """Time at which the simulation started, None while it is queued"""
+
+    @classmethod
+    def from_task(cls, task: RunTask) -> JobInfo:
+        return cls(
+            runno=task.runno,
+            netlist_file=task.netlist_file,
+            priority=getattr(task, "priority", 0),
+            cost=getattr(task, "cost", None),
+            submit_time=getattr(task, "submit_time", None),
+            start_time=task.start_time,
+        )
+
+
+@dataclasses.dataclass
+class QueueState:
+    """Snapshot of the simulations of a SimRunner, returned by
+    :py:meth:`kuPyLTSpice.sim.sim_runner.SimRunner.queue_state`."""
+
+    queued: list[JobInfo]
+    """Simulations waiting for a slot, in the order they will start"""
+    running: list[JobInfo]
+    completed: int
+    ok: int
+    failed: int
+    parallel_sims: int
+
+    @property
+    def queued_cost(self) -> float:
+        """Sum of the known costs of the queued simulations, in seconds"""
+        return sum(job.cost for job in self.queued if job.cost is not None)
+
+
+class RuntimeEstimator:
+    """Learns the duration of the simulations of each netlist.
+
+    The duration of a run is the time its slot was used, the callback included. The
+    estimate of a netlist is an exponential moving average of its runs, so that it
+    follows the changes made to the netlist between runs.
+
+    :param smoothing: Weight of the last run in the estimate, between 0 and 1
+    :type smoothing: float, optional
+    """
+
+    def __init__(self, smoothing: float = 0.5) -> None:
+        if not 0 < smoothing <= 1:
+            raise ValueError(f"smoothing must be in ]0, 1], not {smoothing}")
+        self.smoothing = smoothing
+        self.estimates: dict[str, float] = {}
+        """Estimated duration in seconds, by netlist. It can be saved and restored to
+        keep the estimates between sessions."""
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(netlist: str | Path | PathLike[str] | BaseEditor) -> str:
+        """Returns the name under which the runs of a netlist are learned: the
+        resolved path of the circuit file, shared by all the runs of an editor."""
+        if isinstance(netlist, BaseEditor):
+            netlist = netlist.circuit_file
+        return str(Path(netlist).resolve())
+
+    def estimate(self, netlist: str | Path | PathLike[str] | BaseEditor) -> float | None:
+        """Returns the estimated duration of a netlist. Netlists never run are given the
+        mean of the known estimates, so that they are neither first nor last.
+
+        :return: The duration in seconds, or None if no simulation has finished yet
+        :rtype: float | None
+        """
+        with self._lock:
+            cost = self.estimates.get(self.key(netlist))
+            if cost is None and self.estimates:
+                cost = sum(self.estimates.values()) / len(self.estimates)
+        return cost
+
+    def record(self, key: str, duration: float) -> None:
+        """Adds the duration of a run of the netlist with the given key."""
+        with self._lock:
+            previous = self.estimates.get(key)
+            if previous is None:
+                self.estimates[key] = duration
+            else:
+                self.estimates[key] = previous + self.smoothing * (duration - previous)
+
+
+class JobQueue:
+    """Heap of the tasks waiting for a slot, by decreasing priority, then by decreasing
+    cost, then in submission order. Not thread safe: SimRunner holds its lock."""
+
+    def __init__(self) -> None:
+        self._heap: list[tuple[int, float, int, RunTask]] = []
+        self._sequence = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def push(self, task: RunTask) -> None:
+        cost = task.cost if task.cost is not None else 0.0
+        heapq.heappush(self._heap, (-task.priority, -cost, next(self._sequence), task))
+
+    def pop(self) -> RunTask:
+        """Removes and returns the next task to start.
+
+        :raises IndexError: If the queue is empty
+        """
+        return heapq.heappop(self._heap)[-1]
+
+    def tasks(self) -> list[RunTask]:
+        """Returns the queued tasks, in the order they will start"""
+        return [entry[-1] for entry in sorted(self._heap)]
+
+    def clear(self) -> list[RunTask]:
+        """Empties the queue, and returns the tasks that were queued"""
+        tasks = self.tasks()
+        self._heap.clear()
+        return tasks
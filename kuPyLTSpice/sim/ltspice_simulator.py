@@ -23,6 +23,7 @@ import subprocess
 # Licence:     refer to the LICENSE file
 # -------------------------------------------------------------------------------
 import sys
+import threading
 from collections.abc import Sequence
 from os import PathLike
 from pathlib import Path
@@ -43,6 +44,9 @@ class LTspiceCustom(Simulator):
     # Define the class attributes required by the Simulator base class
     spice_exe: ClassVar[list[str]] = []
     process_name: str = "XVIIx64.exe"  # Default process name for Windows
+    # Simulations being run, indexed by the netlist path, so that they can be stopped
+    _processes: ClassVar[dict[Path, subprocess.Popen[Any]]] = {}
+    _processes_lock: ClassVar[threading.Lock] = threading.Lock()
 
     @classmethod
     def get_default_executable(cls) -> Path:
@@ -274,15 +278,35 @@ class LTspiceCustom(Simulator):
 
         # Run LTspice to run the simulation in the directory of the netlist file
         cwd = netlist_path.parent
-        result = subprocess.run(
-            args,
-            timeout=timeout,
-            stdout=stdout,
-            stderr=stderr,
-            cwd=str(cwd),
-            check=False,
-        )
-        return result.returncode
+        key = netlist_path.resolve()
+        with subprocess.Popen(args, stdout=stdout, stderr=stderr, cwd=str(cwd)) as process:
+            with cls._processes_lock:
+                cls._processes[key] = process
+            try:
+                return process.wait(timeout=timeout)
+            except subprocess.TimeoutExpired:
+                # Same behaviour as subprocess.run()
+                process.kill()
+                raise
+            finally:
+                with cls._processes_lock:
+                    cls._processes.pop(key, None)
+
+    @classmethod
+    def stop(cls, netlist_file: str | Path | PathLike[str]) -> bool:
+        """Stops the simulation of a netlist that was started with run(). The run()
+        call then returns the non-zero return code of the killed process.
+
+        :param netlist_file: Path to the netlist file given to run()
+        :return: True if the simulation was running and was stopped.
+        """
+        with cls._processes_lock:
+            process = cls._processes.get(Path(netlist_file).resolve())
+        if process is None or process.poll() is not None:
+            return False
+        _logger.info("Stopping the simulation of %s", netlist_file)
+        process.kill()
+        return True
 
     @classmethod
     def valid_switch(
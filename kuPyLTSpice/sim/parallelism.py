@@ -0,0 +1,174 @@
+#!/usr/bin/env python
+
+# -------------------------------------------------------------------------------
+#    ____        _   _____ ____        _
+#   |  _ \ _   _| | |_   _/ ___| _ __ (_) ___ ___
+#   | |_) | | | | |   | | \___ \| '_ \| |/ __/ _ \
+#   |  __/| |_| | |___| |  ___) | |_) | | (_|  __/
+#   |_|    \__, |_____|_| |____/| .__/|_|\___\___|
+#          |___/                |_|
+#
+# Name:        parallelism.py
+# Purpose:     Adapts the number of parallel simulations to the load of the machine
+#
+# Licence:     refer to the LICENSE file
+# -------------------------------------------------------------------------------
+"""Controller of the number of simulations that :py:class:`kuPyLTSpice.sim.sim_runner.SimRunner`
+runs in parallel when created with ``parallel_sims="auto"``.
+
+The controller starts at the number of CPU cores, and is consulted by the runner before
+each new simulation. At most once per ``interval`` seconds, it samples the machine with
+psutil and changes the limit by one simulation:
+
+- down, when the free memory falls below ``memory_low``, or when the load average per
+  core exceeds ``overload``, meaning that more processes want to run than there are
+  cores;
+- up, when all the slots are used while the CPU usage is below ``cpu_low`` and there is
+  at least twice ``memory_low`` of free memory, for example when the simulations wait on
+  the disk.
+
+The running simulations are never stopped: a lower limit only delays the next ones.
+"""
+from __future__ import annotations
+
+import dataclasses
+import logging
+import os
+import threading
+import time
+from collections.abc import Callable
+
+__all__ = ["ParallelismController", "SystemLoad", "sample_system_load"]
+
+_logger = logging.getLogger("kupicelib.SimRunner")
+
+
+@dataclasses.dataclass
+class SystemLoad:
+    """A sample of the load of the machine, as fractions."""
+
+    cpu: float
+    """CPU usage since the previous sample, between 0 and 1"""
+    load: float
+    """Load average of the last minute per CPU core. Above 1, processes wait for a core."""
+    free_memory: float
+    """Available memory over the total memory"""
+
+
+def sample_system_load() -> SystemLoad:
+    """Samples the machine with psutil.
+
+    :raises ImportError: If psutil isn't installed
+    :return: The load of the machine
+    :rtype: SystemLoad
+    """
+    import psutil
+
+    memory = psutil.virtual_memory()
+    return SystemLoad(
+        cpu=psutil.cpu_percent(interval=None) / 100,
+        load=psutil.getloadavg()[0] / (psutil.cpu_count() or 1),
+        free_memory=memory.available / memory.total,
+    )
+
+
+class ParallelismController:
+    """Adapts the number of parallel simulations to the CPU load and to the free memory.
+
+    :param initial: Initial limit. Defaults to the number of CPU cores.
+    :type initial: int, optional
+    :param minimum: Lowest limit
+    :type minimum: int, optional
+    :param maximum: Highest limit. Defaults to twice the number of CPU cores.
+    :type maximum: int, optional
+    :param cpu_low: CPU usage under which the limit can grow
+    :type cpu_low: float, optional
+    :param overload: Load average per core above which the limit shrinks
+    :type overload: float, optional
+    :param memory_low: Fraction of free memory under which the limit shrinks
+    :type memory_low: float, optional
+    :param interval: Minimum time in seconds between two samples
+    :type interval: float, optional
+    :param probe: Function sampling the machine. Defaults to :py:func:`sample_system_load`.
+    :type probe: Callable[[], SystemLoad], optional
+    """
+
+    def __init__(
+        self,
+        initial: int | None = None,
+        minimum: int = 1,
+        maximum: int | None = None,
+        cpu_low: float = 0.75,
+        overload: float = 1.25,
+        memory_low: float = 0.1,
+        interval: float = 1.0,
+        probe: Callable[[], SystemLoad] | None = None,
+    ) -> None:
+        cores = os.cpu_count() or 1
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum if maximum is not None else 2 * cores)
+        self.limit = min(self.maximum, max(self.minimum, initial or cores))
+        """Current number of parallel simulations"""
+        self.cpu_low = cpu_low
+        self.overload = overload
+        self.memory_low = memory_low
+        self.interval = interval
+        self.last_sample: SystemLoad | None = None
+        self._next_sample = 0.0
+        self._lock = threading.Lock()
+        if probe is None:
+            try:
+                import psutil  # noqa: F401
+            except ImportError:
+                _logger.warning(
+                    "psutil library not installed, running %d simulations in parallel",
+                    self.limit,
+                )
+            else:
+                probe = sample_system_load
+                probe()  # The first CPU usage is measured from this call
+        self.probe = probe
+
+    def update(self, active: int) -> int:
+        """Samples the machine if the interval has elapsed, and adjusts the limit. Thread
+        safe: the threads calling it during an interval share a single sample.
+
+        :param active: Number of simulations running
+        :type active: int
+        :return: The number of parallel simulations allowed
+        :rtype: int
+        """
+        with self._lock:
+            now = time.monotonic()
+            if self.probe is None or now < self._next_sample:
+                return self.limit
+            self._next_sample = now + self.interval
+            sample = self.last_sample = self.probe()
+            limit = self.limit
+            if sample.free_memory < self.memory_low:
+                limit = max(self.minimum, min(limit, active) - 1)
+                reason = "low memory"
+            elif sample.load > self.overload:
+                limit = max(self.minimum, limit - 1)
+                reason = "CPU overload"
+            elif (
+                active >= limit
+                and sample.cpu < self.cpu_low
+                and sample.free_memory >= 2 * self.memory_low
+            ):
+                limit = min(self.maximum, limit + 1)
+                reason = "idle CPU"
+            if limit != self.limit:
+                _logger.info(
+                    "Parallel simulations %d -> %d (%s: CPU %.0f%%, load %.2f per core, "
+                    "free memory %.0f%%, %d running)",
+                    self.limit,
+                    limit,
+                    reason,
+                    sample.cpu * 100,
+                    sample.load,
+                    sample.free_memory * 100,
+                    active,
+                )
+                self.limit = limit
+            return self.limit
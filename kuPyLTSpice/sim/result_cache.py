@@ -0,0 +1,414 @@
+#!/usr/bin/env python
+
+# -------------------------------------------------------------------------------
+#    ____        _   _____ ____        _
+#   |  _ \ _   _| | |_   _/ ___| _ __ (_) ___ ___
+#   | |_) | | | | |   | | \___ \| '_ \| |/ __/ _ \
+#   |  __/| |_| | |___| |  ___) | |_) | | (_|  __/
+#   |_|    \__, |_____|_| |____/| .__/|_|\___\___|
+#          |___/                |_|
+#
+# Name:        result_cache.py
+# Purpose:     Cache of the simulation results, indexed by the content of the netlists
+#
+# Licence:     refer to the LICENSE file
+# -------------------------------------------------------------------------------
+"""Cache of the RAW and log files of the successful simulations, so that a netlist that
+was already simulated isn't simulated again. The operating point RAW file written by
+LTspice for the transient analyses, ``<netlist>.op.raw``, is cached along with them::
+
+    runner = SimRunner(output_folder="./temp", cache="~/.cache/ltspice")
+
+The results are indexed by a SHA-256 hash of:
+
+- the text of the netlist, as given to the simulator;
+- the files it includes with ``.include``, ``.inc`` or ``.lib``, and the ones they
+  include, searched in the netlist folder and then in the library paths;
+- the simulator, identified by the content of its executable;
+- the command line switches.
+
+Changing a model file, the simulator or a switch thus runs the simulations again. The
+library files that aren't found, as the standard libraries installed with LTspice, are
+identified by their name only: they change with the simulator version.
+
+The cache is a folder, which can be shared between machines through a network file
+system: the results are stored atomically, and every access updates the modification
+time of its entry, used to remove the least recently used results when the cache
+exceeds its size.
+"""
+from __future__ import annotations
+
+import dataclasses
+import hashlib
+import logging
+import os
+import re
+import shutil
+import threading
+import uuid
+from collections.abc import Iterable, Iterator, Sequence
+from os import PathLike
+from pathlib import Path
+from typing import Any, ClassVar
+
+from kupicelib.sim.simulator import Simulator
+
+__all__ = ["CacheStats", "CachedSimulator", "ResultCache"]
+
+_logger = logging.getLogger("kupicelib.ResultCache")
+
+_INCLUDE = re.compile(
+    r"""\.(?:include|inc|lib)[ \t]+("[^"\n]+"|'[^'\n]+'|[^\s]+)""", re.IGNORECASE
+)
+"""Include directives. Anchoring the pattern to the line starts makes it ten times slower
+on large netlists, so the start of the line is checked by :py:func:`_includes`."""
+
+_HASH_CHUNK = 1 << 20
+_file_digests: dict[tuple[str, int, int], str] = {}
+_file_digests_lock = threading.Lock()
+
+
+def _file_digest(path: Path) -> str:
+    """Returns the SHA-256 of a file, cached while its size and date don't change."""
+    stat = path.stat()
+    key = (str(path), stat.st_size, stat.st_mtime_ns)
+    with _file_digests_lock:
+        digest = _file_digests.get(key)
+    if digest is None:
+        sha = hashlib.sha256()
+        with open(path, "rb") as fin:
+            while chunk := fin.read(_HASH_CHUNK):
+                sha.update(chunk)
+        digest = sha.hexdigest()
+        with _file_digests_lock:
+            _file_digests[key] = digest
+    return digest
+
+
+def _op_raw_file(raw_file: Path) -> Path:
+    """Returns the operating point RAW file written along with a RAW file."""
+    return raw_file.with_suffix(f".op{raw_file.suffix}")
+
+
+def _decode(data: bytes) -> str:
+    """Decodes a netlist for the search of the include directives."""
+    if data.startswith((b"\xff\xfe", b"\xfe\xff")) or b"\x00" in data[:256]:
+        encoding = "utf-16-be" if data.startswith(b"\xfe\xff") else "utf-16-le"
+        return data.decode(encoding, errors="ignore").lstrip("\ufeff")
+    return data.decode("latin-1")
+
+
+def _includes(text: str) -> Iterator[str]:
+    """Yields the files included by a netlist, or by the directives of an .asc file."""
+    for match in _INCLUDE.finditer(text):
+        line_start = text.rfind("\n", 0, match.start()) + 1
+        before = text[line_start : match.start()].strip()
+        if not before or (before.startswith("TEXT ") and before.endswith("!")):
+            yield match.group(1).strip("\"'")
+
+
+@dataclasses.dataclass
+class CacheStats:
+    """Counters of a :py:class:`ResultCache`, since its creation."""
+
+    hits: int = 0
+    misses: int = 0
+    stores: int = 0
+    evictions: int = 0
+    """Number of results removed to keep the cache under its size"""
+
+    @property
+    def hit_rate(self) -> float:
+        """Fraction of the lookups that found a result, 0 before the first lookup"""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+class ResultCache:
+    """Content addressed store of the simulation results.
+
+    :param directory: Folder of the cache, created if needed. It can be on a file system
+        shared between machines.
+    :type directory: str | Path
+    :param max_size: Size in bytes above which the least recently used results are
+        removed
+    :type max_size: int, optional
+    :param library_paths: Folders where the included files are searched, after the
+        folder of the netlist and the default library paths of the simulator
+    :type library_paths: Iterable[str | Path], optional
+    :param simulator_version: Identifies the simulator instead of the content of its
+        executable, for example when the machines sharing the cache have different
+        installations of the same version
+    :type simulator_version: str, optional
+    """
+
+    def __init__(
+        self,
+        directory: str | Path | PathLike[str],
+        max_size: int = 10 * 2**30,
+        *,
+        library_paths: Iterable[str | Path] = (),
+        simulator_version: str | None = None,
+    ) -> None:
+        self.directory = Path(directory).expanduser()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_size = max_size
+        self.library_paths = [Path(path) for path in library_paths]
+        self.simulator_version = simulator_version
+        self.stats = CacheStats()
+        self._size: int | None = None
+        self._lock = threading.Lock()
+        self._fingerprints: dict[type[Simulator], str] = {}
+
+    def __repr__(self) -> str:
+        return f"ResultCache({str(self.directory)!r}, max_size={self.max_size})"
+
+    def _entry(self, key: str) -> Path:
+        return self.directory / key[:2] / key
+
+    def _fingerprint(self, simulator: type[Simulator]) -> str:
+        """Identifies the simulator by its class and by the content of its executable."""
+        if self.simulator_version is not None:
+            return self.simulator_version
+        fingerprint = self._fingerprints.get(simulator)
+        if fingerprint is None:
+            parts = [f"{simulator.__module__}.{simulator.__qualname__}"]
+            for part in simulator.spice_exe:
+                path = Path(part)
+                parts.append(_file_digest(path) if path.is_file() else part)
+            fingerprint = self._fingerprints[simulator] = "\n".join(parts)
+        return fingerprint
+
+    def _library_paths(self, simulator: type[Simulator]) -> list[Path]:
+        paths = list(self.library_paths)
+        try:
+            paths.extend(Path(path) for path in simulator.get_default_library_paths())
+        except Exception:  # The default paths are only a help to find the files
+            _logger.debug("No default library paths for %s", simulator.__name__)
+        return paths
+
+    def key(
+        self,
+        netlist_file: str | Path | PathLike[str],
+        switches: Sequence[str] | None,
+        simulator: type[Simulator],
+    ) -> str:
+        """Returns the hash identifying the results of a simulation.
+
+        :param netlist_file: Netlist given to the simulator
+        :type netlist_file: str | Path
+        :param switches: Command line switches given to the simulator
+        :type switches: Sequence[str] | None
+        :param simulator: Simulator class
+        :type simulator: type[Simulator]
+        :return: The SHA-256 hash as an hexadecimal string
+        :rtype: str
+        """
+        netlist_path = Path(netlist_file)
+        sha = hashlib.sha256()
+        sha.update(b"simulator\0" + self._fingerprint(simulator).encode() + b"\0")
+        sha.update(b"switches\0" + "\0".join(switches or ()).encode() + b"\0")
+        data = netlist_path.read_bytes()
+        sha.update(b"netlist\0" + data + b"\0")
+        search_paths = self._library_paths(simulator)
+        visited: set[Path] = set()
+        pending = [(netlist_path.parent, data)]
+        while pending:
+            folder, text = pending.pop()
+            for name in _includes(_decode(text)):
+                sha.update(b"include\0" + name.encode() + b"\0")
+                path = next(
+                    (
+                        candidate
+                        for candidate in (folder / name, *(path / name for path in search_paths))
+                        if candidate.is_file()
+                    ),
+                    None,
+                )
+                if path is None:
+                    continue
+                path = path.resolve()
+                sha.update(_file_digest(path).encode() + b"\0")
+                if path not in visited:
+                    visited.add(path)
+                    pending.append((path.parent, path.read_bytes()))
+        return sha.hexdigest()
+
+    def fetch(self, key: str, raw_file: Path, log_file: Path) -> bool:
+        """Copies the cached results to the given files, if there are any. The operating
+        point RAW file, if it was cached, is copied next to the RAW file.
+
+        :param key: Hash given by :py:meth:`key`
+        :type key: str
+        :param raw_file: Where to copy the RAW file
+        :type raw_file: Path
+        :param log_file: Where to copy the log file
+        :type log_file: Path
+        :return: True if the results were in the cache
+        :rtype: bool
+        """
+        entry = self._entry(key)
+        try:
+            shutil.copyfile(entry / f"result{raw_file.suffix}", raw_file)
+            shutil.copyfile(entry / "result.log", log_file)
+            op_raw = entry / f"result.op{raw_file.suffix}"
+            if op_raw.exists():
+                shutil.copyfile(op_raw, _op_raw_file(raw_file))
+            os.utime(entry)
+        except OSError:
+            # Not cached, or removed by another machine while copying it
+            with self._lock:
+                self.stats.misses += 1
+            return False
+        with self._lock:
+            self.stats.hits += 1
+        _logger.debug("Cache hit %s for %s", key, raw_file.name)
+        return True
+
+    def store(self, key: str, raw_file: Path, log_file: Path) -> None:
+        """Adds the results of a simulation to the cache, with the operating point RAW
+        file next to the RAW file, if any. The files are copied to a temporary folder,
+        which is then renamed, so that the other processes never see an incomplete
+        result.
+
+        :param key: Hash given by :py:meth:`key`
+        :type key: str
+        :param raw_file: RAW file of the simulation
+        :type raw_file: Path
+        :param log_file: Log file of the simulation
+        :type log_file: Path
+        """
+        entry = self._entry(key)
+        if entry.exists():
+            return
+        temporary = self.directory / "tmp" / f"{key}.{uuid.uuid4().hex}"
+        try:
+            temporary.mkdir(parents=True)
+            shutil.copyfile(raw_file, temporary / f"result{raw_file.suffix}")
+            shutil.copyfile(log_file, temporary / "result.log")
+            op_raw = _op_raw_file(raw_file)
+            if op_raw.exists():
+                shutil.copyfile(op_raw, temporary / f"result.op{raw_file.suffix}")
+            size = _folder_size(temporary)
+            entry.parent.mkdir(exist_ok=True)
+            temporary.rename(entry)
+        except OSError as err:
+            # Stored meanwhile by another process, or no space left
+            shutil.rmtree(temporary, ignore_errors=True)
+            if not entry.exists():
+                _logger.warning("Unable to cache the results of %s: %s", raw_file.name, err)
+            return
+        with self._lock:
+            self.stats.stores += 1
+            if self._size is not None:
+                self._size += size
+            full = self._size is None or self._size > self.max_size
+        if full:
+            self._evict()
+
+    def _entries(self) -> list[tuple[float, int, Path]]:
+        """Returns the (access time, size, folder) of the cached results."""
+        entries = []
+        for prefix in self.directory.iterdir():
+            if len(prefix.name) != 2 or not prefix.is_dir():
+                continue
+            for entry in prefix.iterdir():
+                try:
+                    entries.append((entry.stat().st_mtime, _folder_size(entry), entry))
+                except OSError:  # Removed by another process
+                    continue
+        return entries
+
+    def _evict(self) -> None:
+        """Removes the least recently used results until the cache is under 90% of its
+        maximum size, so that the folder isn't scanned again at each store."""
+        entries = self._entries()
+        size = sum(entry_size for _, entry_size, _ in entries)
+        evicted = 0
+        if size > self.max_size:
+            entries.sort()
+            for _, entry_size, entry in entries:
+                if size <= 0.9 * self.max_size:
+                    break
+                shutil.rmtree(entry, ignore_errors=True)
+                size -= entry_size
+                evicted += 1
+            _logger.info("Removed %d results from the cache %s", evicted, self.directory)
+        with self._lock:
+            self._size = size
+            self.stats.evictions += evicted
+
+    @property
+    def size(self) -> int:
+        """Size of the cached results in bytes, those of the other machines included"""
+        return sum(entry_size for _, entry_size, _ in self._entries())
+
+    def __len__(self) -> int:
+        return len(self._entries())
+
+    def clear(self) -> None:
+        """Removes all the cached results."""
+        for _, _, entry in self._entries():
+            shutil.rmtree(entry, ignore_errors=True)
+        with self._lock:
+            self._size = 0
+
+    def wrap(self, simulator: type[Simulator]) -> type[Simulator]:
+        """Returns a simulator class that looks for the results in this cache before
+        running the given simulator, and that stores the results of its successful
+        simulations.
+
+        :param simulator: Simulator class
+        :type simulator: type[Simulator]
+        :return: The caching simulator class
+        :rtype: type[Simulator]
+        """
+        if issubclass(simulator, CachedSimulator):
+            simulator = simulator.simulator
+        return type(
+            f"Cached{simulator.__name__}",
+            (CachedSimulator, simulator),
+            {"result_cache": self, "simulator": simulator},
+        )
+
+
+def _folder_size(folder: Path) -> int:
+    return sum(path.stat().st_size for path in folder.iterdir())
+
+
+class CachedSimulator(Simulator):
+    """Base of the simulator classes returned by :py:meth:`ResultCache.wrap`."""
+
+    result_cache: ClassVar[ResultCache]
+    simulator: ClassVar[type[Simulator]]
+    """The simulator that runs the simulations not found in the cache"""
+
+    @classmethod
+    def run(
+        cls,
+        netlist_file: str | Path | PathLike[str],
+        cmd_line_switches: Sequence[str] | None = None,
+        timeout: float | None = None,
+        stdout: Any | None = None,
+        stderr: Any | None = None,
+        exe_log: bool = False,
+    ) -> int:
+        """Copies the cached results next to the netlist, or runs the simulator.
+
+        :return: 0 if the results were cached, else the return code of the simulator
+        :rtype: int
+        """
+        netlist_path = Path(netlist_file)
+        raw_file = netlist_path.with_suffix(cls.raw_extension)
+        log_file = netlist_path.with_suffix(".log")
+        key = cls.result_cache.key(netlist_path, cmd_line_switches, cls.simulator)
+        if cls.result_cache.fetch(key, raw_file, log_file):
+            if exe_log:
+                _logger.info("Results of %s found in the cache", netlist_path.name)
+            return 0
+        retcode = cls.simulator.run(
+            netlist_file, cmd_line_switches, timeout, stdout=stdout, stderr=stderr, exe_log=exe_log
+        )
+        if retcode == 0 and raw_file.exists() and log_file.exists():
+            cls.result_cache.store(key, raw_file, log_file)
+        return retcode
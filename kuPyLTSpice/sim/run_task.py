@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+
+# -------------------------------------------------------------------------------
+#    ____        _   _____ ____        _
+#   |  _ \ _   _| | |_   _/ ___| _ __ (_) ___ ___
+#   | |_) | | | | |   | | \___ \| '_ \| |/ __/ _ \
+#   |  __/| |_| | |___| |  ___) | |_) | | (_|  __/
+#   |_|    \__, |_____|_| |____/| .__/|_|\___\___|
+#          |___/                |_|
+#
+# Name:        run_task.py
+# Purpose:     Simulation task that monitors the RAW file while it is written
+#
+# Licence:     refer to the LICENSE file
+# -------------------------------------------------------------------------------
+"""Internal classes not to be used directly by the user."""
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import traceback
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+from kupicelib.sim.run_task import RunTask as _RunTask
+
+from kuPyLTSpice.raw.raw_tail import RawTailReader
+
+__all__ = ["RawMonitor", "RunTask"]
+
+_logger = logging.getLogger("kupicelib.RunTask")
+
+RawMonitor = Callable[[dict[str, np.ndarray[Any, Any]]], Any]
+"""Function called with each chunk of new points of the RAW file. The simulation is
+stopped when it returns True."""
+
+
+class RunTask(_RunTask):
+    """Simulation task that, when given a ``raw_monitor``, tails the RAW file while the
+    simulation runs and stops the simulation as soon as the monitor returns True.
+
+    The simulator is stopped through its ``stop(netlist_file)`` class method, see
+    :py:meth:`kuPyLTSpice.sim.ltspice_simulator.LTspiceCustom.stop`. A stopped
+    simulation ends with a non-zero return code and is counted as a failed simulation.
+    """
+
+    def __init__(
+        self,
+        *args: Any,
+        raw_monitor: RawMonitor | None = None,
+        monitor_interval: float = 0.5,
+        on_finish: Callable[[RunTask], Any] | None = None,
+        **kwargs: Any,
+    ) -> None:
+        super().__init__(*args, **kwargs)
+        self.raw_monitor = raw_monitor
+        self.monitor_interval = monitor_interval
+        self.on_finish = on_finish
+        """Function called with the task at the end of its thread"""
+        self.stopped_early = False
+        """True when the simulation was stopped by the raw monitor."""
+        self.finished = False
+        """True once the simulation and its callback are done."""
+        self.priority = 0
+        """Priority given to SimRunner.submit()"""
+        self.cost: float | None = None
+        """Estimated duration in seconds, used by SimRunner.submit() to order the jobs"""
+        self.submit_time: float | None = None
+        """Time at which the task was queued by SimRunner.submit()"""
+        self._simulation_done = threading.Event()
+
+    def run(self) -> None:
+        try:
+            self._run()
+        finally:
+            self.finished = True
+            if self.on_finish is not None:
+                self.on_finish(self)
+
+    def _run(self) -> None:
+        if self.raw_monitor is None:
+            super().run()
+            return
+        raw_file = self.netlist_file.with_suffix(self.simulator.raw_extension)
+        # A RAW file left by a previous run is not to be read
+        previous = raw_file.stat() if raw_file.exists() else None
+        monitor = threading.Thread(
+            target=self._monitor_raw,
+            args=(raw_file, previous),
+            name=f"RawMonitor#{self.runno}",
+            daemon=True,
+        )
+        monitor.start()
+        try:
+            super().run()
+        finally:
+            self._simulation_done.set()
+            monitor.join()
+
+    def _monitor_raw(self, raw_file: Path, previous: os.stat_result | None) -> None:
+        assert self.raw_monitor is not None
+        while not self._simulation_done.is_set():
+            if raw_file.exists():
+                stat = raw_file.stat()
+                if previous is None or (stat.st_mtime_ns, stat.st_ino) != (
+                    previous.st_mtime_ns,
+                    previous.st_ino,
+                ):
+                    break
+            self._simulation_done.wait(self.monitor_interval)
+        else:
+            return
+        reader = RawTailReader(raw_file)
+        try:
+            for chunk in reader.chunks(
+                stop=self._simulation_done.is_set, poll_interval=self.monitor_interval
+            ):
+                if not self.raw_monitor(chunk) or self._simulation_done.is_set():
+                    continue
+                self.stopped_early = True
+                self.print_info(
+                    _logger.info, f"Stopped by the raw monitor after {reader.points} points"
+                )
+                stop = getattr(self.simulator, "stop", None)
+                if stop is None:
+                    self.print_info(
+                        _logger.warning,
+                        f"{self.simulator.__name__} simulations can't be stopped",
+                    )
+                else:
+                    stop(self.netlist_file)
+                return
+        except Exception:
+            self.print_info(_logger.error, traceback.format_exc())
@@ -43,6 +43,9 @@ The recommended way is to set the parameter ``parallel_sims`` in the class const
 
 LTC=SimCommander("my_circuit.asc", parallel_sims=8)
 
+With ``parallel_sims="auto"``, the number of parallel simulations starts at the number of
+CPU cores, and is adapted between simulations to the CPU load and to the free memory.
+
 The user then can launch a simulation with the updates done to the netlist by calling
 the run() method. Since the processes are not executed right away, but rather just
 scheduled for simulation, the wait_completion() function is needed if the user wants to
@@ -70,6 +73,42 @@ rise, measures = log_info.dataset["rise_time"]
 
 The callback function is optional. If  no callback function is given, the thread is
 terminated just after the simulation is finished.
+
+--------- Monitoring the RAW file ---------
+
+Long simulations can be monitored while they run, and stopped as soon as the results
+are known to be useless. The ``raw_monitor`` function given to run() receives the new
+points of the RAW file as a dictionary of numpy arrays, while the simulation is still
+writing it. Returning True stops the simulation, freeing its slot for the next one::
+
+    def runaway(chunk):
+        return np.abs(chunk["V(out)"]).max() > 100
+
+    LTC.run(netlist, raw_monitor=runaway)
+
+--------- Job queue ---------
+
+run() starts the simulations in the order they are given, waiting for a free slot. When
+the simulations have very different durations, submit() queues them instead, and returns
+immediately. The queued simulations are started by decreasing priority, then longest
+first, which shortens the batch: the short simulations end up filling the slots left
+free at the end by the long ones. The cost of a simulation is its expected duration in
+seconds. If not given, it's learned from the previous runs of the same netlist::
+
+    LTC.submit(tran_netlist, cost=1200)
+    LTC.submit(ac_netlist, priority=1)  # Starts before the transients
+    print(LTC.queue_state().queued_cost)
+
+--------- Result cache ---------
+
+With a ``cache`` folder, the results of the successful simulations are kept, and a
+simulation identical to a previous one, same netlist text, included files, simulator and
+switches, gets a copy of the previous results instead of running the simulator. The
+folder can be shared between machines::
+
+    LTC = SimRunner(output_folder="./temp", cache="/mnt/shared/ltspice_cache")
+    ...
+    print(LTC.result_cache.stats.hit_rate)
 """
 
 from __future__ import annotations
@@ -92,15 +131,24 @@ from __future__ import annotations
 # -------------------------------------------------------------------------------
 import logging
 import sys
-from collections.abc import Iterator
+import threading
+import time
+from collections.abc import Callable, Iterator
 from pathlib import Path
-from typing import cast
+from typing import Any, cast
 
+from kupicelib.editor.base_editor import BaseEditor
+from kupicelib.sim.process_callback import ProcessCallback
+from kupicelib.sim.run_task import clock_function
 from kupicelib.sim.sim_runner import RunResult
 from kupicelib.sim.sim_runner import SimRunner as SimRunnerBase
 from kupicelib.sim.simulator import Simulator
 
+from kuPyLTSpice.sim.job_queue import JobInfo, JobQueue, QueueState, RuntimeEstimator
 from kuPyLTSpice.sim.ltspice_simulator import LTspice, LTspiceCustom
+from kuPyLTSpice.sim.parallelism import ParallelismController
+from kuPyLTSpice.sim.result_cache import ResultCache
+from kuPyLTSpice.sim.run_task import RawMonitor, RunTask
 
 __all__ = ["SimRunner"]
 __author__ = "Nuno Canto Brum <nuno.brum@gmail.com>"
@@ -120,8 +168,12 @@ class SimRunner(SimRunnerBase):
 
     :param parallel_sims: Defines the number of parallel simulations that can be
         executed at the same time. Ideally this number should be aligned to the number
-        of CPUs (processor cores) available on the machine.
-    :type parallel_sims: int, optional
+        of CPUs (processor cores) available on the machine. With "auto", the number
+        starts at the number of cores and is adapted to the CPU load and to the free
+        memory between simulations, see
+        :py:class:`kuPyLTSpice.sim.parallelism.ParallelismController`, which can also be
+        given directly.
+    :type parallel_sims: int | str | ParallelismController, optional
     :param timeout: Timeout parameter as specified on the os subprocess.run() function.
         Default is 600 seconds, i.e. 10 minutes. For no timeout, set to None.
     :type timeout: float, optional
@@ -132,18 +184,40 @@ class SimRunner(SimRunnerBase):
     :param output_folder: str
     :param simulator: Forcing a given simulator executable.
     :type simulator: str or Simulator, optional
+    :param cache: Folder of a cache of the simulation results, or a
+        :py:class:`kuPyLTSpice.sim.result_cache.ResultCache` to choose its size. The
+        simulations found in the cache aren't run again.
+    :type cache: str | Path | ResultCache, optional
     """
 
     def __init__(
         self,
         *,
         simulator: str | Path | type[Simulator] | None = None,
-        parallel_sims: int = 4,
+        parallel_sims: int | str | ParallelismController = 4,
         timeout: float = 600.0,
         verbose: bool = False,
         output_folder: str | None = None,
+        cache: str | Path | ResultCache | None = None,
     ):
         # For clarity require named parameters after the leading arguments.
+        if isinstance(parallel_sims, str) and parallel_sims != "auto":
+            raise ValueError(f'parallel_sims must be a number or "auto", not "{parallel_sims}"')
+        self.parallelism: ParallelismController | None = None
+        """Controller of parallel_sims in the adaptive mode"""
+        if parallel_sims == "auto":
+            self.parallelism = ParallelismController()
+        elif isinstance(parallel_sims, ParallelismController):
+            self.parallelism = parallel_sims
+        if self.parallelism is not None:
+            parallel_sims = self.parallelism.limit
+            _logger.info("Adaptive parallelism, starting with %d simulations", parallel_sims)
+        self.job_queue = JobQueue()
+        """Simulations submitted with submit() and waiting for a slot"""
+        self.runtime_estimator = RuntimeEstimator()
+        """Durations learned from the simulations started with submit()"""
+        self._queue_lock = threading.RLock()
+        self._cost_keys: dict[int, str] = {}
 
         # Gets a simulator.
         # Import our custom LTspice implementation which has Mac support
@@ -156,6 +230,12 @@ class SimRunner(SimRunnerBase):
             assert isinstance(simulator, type)
             simulator_cls = simulator
 
+        self.result_cache: ResultCache | None = None
+        """Cache of the simulation results, if any"""
+        if cache is not None:
+            self.result_cache = cache if isinstance(cache, ResultCache) else ResultCache(cache)
+            simulator_cls = self.result_cache.wrap(simulator_cls)
+
         # Log the platform and detected simulator
         if verbose:
             _logger.info("Platform detected: %s", sys.platform)
@@ -172,6 +252,163 @@ class SimRunner(SimRunnerBase):
         self.verbose = verbose
         self.simulator = simulator_cls
 
+    def __del__(self):
+        """Waits for the simulations, unless the constructor failed before any was set up."""
+        if hasattr(self, "active_tasks"):
+            super().__del__()
+
+    def active_threads(self) -> int:
+        """Returns the number of active sim_tasks. In the adaptive mode, parallel_sims
+        is updated from the load of the machine."""
+        active = super().active_threads()
+        if self.parallelism is not None:
+            self.parallel_sims = self.parallelism.update(active)
+        return active
+
+    def update_completed(self) -> None:
+        """Moves the finished tasks to the completed_tasks list, and starts the queued
+        simulations in the freed slots."""
+        with self._queue_lock:
+            super().update_completed()
+            self._dispatch()
+
+    def _dispatch(self) -> None:
+        """Starts queued simulations while there are free slots."""
+        with self._queue_lock:
+            while len(self.job_queue) > 0:
+                busy = sum(
+                    1
+                    for task in self.active_tasks
+                    if task.is_alive() and not getattr(task, "finished", False)
+                )
+                if self.parallelism is not None:
+                    self.parallel_sims = self.parallelism.update(busy)
+                if busy >= self.parallel_sims:
+                    return
+                task = self.job_queue.pop()
+                _logger.debug(
+                    "Starting simulation %d (priority %d, cost %s)",
+                    task.runno,
+                    task.priority,
+                    task.cost,
+                )
+                task.start_time = clock_function()  # Set again by the task, when it runs
+                self.active_tasks.append(task)
+                task.start()
+
+    def _task_finished(self, task: RunTask) -> None:
+        """Called by the submitted tasks when they end: learns their duration and
+        starts the next queued simulation."""
+        key = self._cost_keys.pop(task.runno, None)
+        if (
+            key is not None
+            and task.retcode == 0
+            and not task.stopped_early
+            and task.start_time is not None
+            and task.stop_time is not None
+        ):
+            self.runtime_estimator.record(key, task.stop_time - task.start_time)
+        self._dispatch()
+
+    def submit(
+        self,
+        netlist: str | Path | BaseEditor,
+        *,
+        priority: int = 0,
+        cost: float | None = None,
+        callback: type[ProcessCallback] | Callable[..., Any] | None = None,
+        callback_args: tuple[Any, ...] | dict[str, Any] | None = None,
+        switches: list[str] | None = None,
+        timeout: float | None = None,
+        run_filename: str | None = None,
+        exe_log: bool = False,
+        raw_monitor: RawMonitor | None = None,
+        monitor_interval: float = 0.5,
+    ) -> RunTask:
+        """Queues a simulation, and returns without waiting for a free slot. The netlist
+        is written to the output folder immediately, so an editor can be changed for the
+        next simulation. The queued simulations are started by decreasing priority, then
+        by decreasing cost, then in submission order. See :py:meth:`run` for the other
+        parameters.
+
+        :param priority: Simulations with a higher priority start first
+        :type priority: int, optional
+        :param cost: Expected duration of the simulation in seconds. Defaults to the
+            duration learned from the previous runs of the same netlist, see
+            :py:class:`kuPyLTSpice.sim.job_queue.RuntimeEstimator`.
+        :type cost: float, optional
+        :returns: The task, which starts when a slot is free
+        :rtype: RunTask
+        """
+        callback_kwargs = self.validate_callback_args(callback, callback_args)
+        if cost is None:
+            cost = self.runtime_estimator.estimate(netlist)
+        key = self.runtime_estimator.key(netlist)
+        run_netlist_file = self._prepare_sim(netlist, run_filename)
+        task = RunTask(
+            simulator=self.simulator,
+            runno=self.runno,
+            netlist_file=run_netlist_file,
+            callback=callback if callback is not None else (lambda raw, log: None),
+            callback_args=callback_kwargs,
+            switches=switches or self.cmdline_switches,
+            timeout=timeout if timeout is not None else self.timeout,
+            verbose=self.verbose,
+            exe_log=exe_log,
+            raw_monitor=raw_monitor,
+            monitor_interval=monitor_interval,
+            on_finish=self._task_finished,
+        )
+        task.priority = priority
+        task.cost = cost
+        task.submit_time = clock_function()
+        with self._queue_lock:
+            self._cost_keys[task.runno] = key
+            self.job_queue.push(task)
+            self._dispatch()
+        return task
+
+    def queue_state(self) -> QueueState:
+        """Returns a snapshot of the queued and running simulations, for monitoring.
+
+        :rtype: QueueState
+        """
+        with self._queue_lock:
+            super().update_completed()
+            return QueueState(
+                queued=[JobInfo.from_task(task) for task in self.job_queue.tasks()],
+                running=[JobInfo.from_task(task) for task in self.active_tasks],
+                completed=len(self.completed_tasks),
+                ok=self.okSim,
+                failed=self.failSim,
+                parallel_sims=self.parallel_sims,
+            )
+
+    def clear_queue(self) -> list[RunTask]:
+        """Cancels the simulations that are queued and not started yet.
+
+        :returns: The cancelled tasks
+        :rtype: list[RunTask]
+        """
+        with self._queue_lock:
+            cancelled = self.job_queue.clear()
+            for task in cancelled:
+                self._cost_keys.pop(task.runno, None)
+        if cancelled:
+            _logger.info("Cancelled %d queued simulations", len(cancelled))
+        return cancelled
+
+    def wait_completion(
+        self, timeout: float | None = None, abort_all_on_timeout: bool = False
+    ) -> bool:
+        """Waits for the scheduled and queued simulations to complete. See
+        :py:meth:`kupicelib.sim.sim_runner.SimRunner.wait_completion`. When aborting on
+        timeout, the queued simulations are cancelled as well."""
+        result = super().wait_completion(timeout, abort_all_on_timeout)
+        if abort_all_on_timeout and len(self.job_queue) > 0:
+            self.clear_queue()
+        return result
+
     def create_netlist(
         self, asc_file: str | Path, cmd_line_args: list[str] | None = None
     ) -> Path:
@@ -195,6 +432,75 @@ class SimRunner(SimRunnerBase):
             )
         raise ValueError(f"Unable to create the Netlist from {asc_file}")
 
+    def run(
+        self,
+        netlist: str | Path | BaseEditor,
+        *,
+        wait_resource: bool = True,
+        callback: type[ProcessCallback] | Callable[..., Any] | None = None,
+        callback_args: tuple[Any, ...] | dict[str, Any] | None = None,
+        switches: list[str] | None = None,
+        timeout: float | None = None,
+        run_filename: str | None = None,
+        exe_log: bool = False,
+        raw_monitor: RawMonitor | None = None,
+        monitor_interval: float = 0.5,
+    ) -> RunTask | None:
+        """Executes a simulation run. See :py:meth:`kupicelib.sim.sim_runner.SimRunner.run`
+        for the description of the other parameters.
+
+        :param raw_monitor: Function called with the new points of the RAW file while the
+            simulation is running, as a dictionary of numpy arrays indexed by trace name.
+            If it returns True, the simulation is stopped and the task's
+            ``stopped_early`` attribute is set. Only binary RAW files in the Normal
+            layout can be monitored.
+        :type raw_monitor: Callable[[dict[str, numpy.ndarray]], bool], optional
+        :param monitor_interval: Time in seconds between checks of the RAW file
+        :type monitor_interval: float, optional
+        :returns: The task object of type RunTask
+        """
+        if raw_monitor is None:
+            return super().run(
+                netlist,
+                wait_resource=wait_resource,
+                callback=callback,
+                callback_args=callback_args,
+                switches=switches,
+                timeout=timeout,
+                run_filename=run_filename,
+                exe_log=exe_log,
+            )
+        callback_kwargs = self.validate_callback_args(callback, callback_args)
+        run_netlist_file = self._prepare_sim(netlist, run_filename)
+        if timeout is None:
+            timeout = self.timeout
+        cmdline_switches = switches or self.cmdline_switches
+
+        t0 = time.monotonic()
+        # Give one second slack in relation to the task timeout
+        while time.monotonic() - t0 < timeout + 1:
+            if not wait_resource or self.active_threads() < self.parallel_sims:
+                task = RunTask(
+                    simulator=self.simulator,
+                    runno=self.runno,
+                    netlist_file=run_netlist_file,
+                    callback=callback if callback is not None else (lambda raw, log: None),
+                    callback_args=callback_kwargs,
+                    switches=cmdline_switches,
+                    timeout=timeout,
+                    verbose=self.verbose,
+                    exe_log=exe_log,
+                    raw_monitor=raw_monitor,
+                    monitor_interval=monitor_interval,
+                )
+                self.active_tasks.append(task)
+                task.start()
+                time.sleep(0.01)  # Give slack for the thread to start
+                return task
+            time.sleep(0.1)  # Give Time for other simulations to end
+        _logger.error("Timeout waiting for resources for simulation %d", self.runno)
+        return None
+
     def __iter__(self) -> Iterator[RunResult]:
         return super().__iter__()
 
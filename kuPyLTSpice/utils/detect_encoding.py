@@ -21,9 +21,154 @@
 because we don't need something so complicated.
 
 LTSpice only supports for the time being a reduced set of encodings.
+
+:py:func:`detect_encoding` gives the same answer as the kupicelib function, which
+decodes the whole file with each candidate encoding, but it first tries to decide from
+the beginning of the file: the candidates are tried in the same order on the first
+:py:data:`PREFIX_SIZE` bytes, so that a byte order mark or the null bytes of the UTF-16
+logs written by LTSpice reject the wrong candidates at once. The expected pattern is
+matched on that prefix, which is where the patterns used for the LTSpice files match,
+and the rest of the file is only checked to decode without errors. The complete
+detection runs when no candidate matches in the prefix.
+
+The results are cached by path, size and modification time. The number of calls, of
+cache hits and of complete detections are kept in :py:data:`stats`.
 """
-# Import and re-export the functions from kupicelib
-from kupicelib.utils.detect_encoding import EncodingDetectError, detect_encoding
+from __future__ import annotations
+
+import codecs
+import dataclasses
+import os
+import re
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+from kupicelib.utils.detect_encoding import EncodingDetectError
+from kupicelib.utils.detect_encoding import detect_encoding as _detect_encoding
+
+__all__ = ["EncodingDetectError", "clear_encoding_cache", "detect_encoding", "stats"]
+
+ENCODINGS = ("utf-8", "utf-16", "windows-1252", "utf_16_le", "cp1252", "cp1250", "shift_jis")
+"""Candidate encodings, in the order they are tried"""
+PREFIX_SIZE = 16 * 1024
+"""Number of bytes read to decide on the encoding"""
+CACHE_SIZE = 4096
+"""Maximum number of files whose encoding is cached"""
+_CHUNK_SIZE = 1024 * 1024
+
+
+@dataclasses.dataclass
+class EncodingStats:
+    """Counters of :py:func:`detect_encoding`"""
+
+    calls: int = 0
+    cache_hits: int = 0
+    slow_fallbacks: int = 0
+    """Number of calls that decoded the whole file with each candidate encoding"""
+
+    def reset(self) -> None:
+        """Sets all the counters to zero."""
+        self.calls = self.cache_hits = self.slow_fallbacks = 0
+
+
+stats = EncodingStats()
+_cache: OrderedDict[tuple[str, int, int, str, int], str] = OrderedDict()
+_lock = threading.Lock()
+
+
+def clear_encoding_cache() -> None:
+    """Forgets the encodings detected so far."""
+    with _lock:
+        _cache.clear()
+
+
+def _decodes(fin, encoding: str, prefix: bytes) -> bool:
+    """Checks that the rest of the file decodes, after a prefix that was decoded."""
+    decoder = codecs.getincrementaldecoder(encoding)()
+    try:
+        decoder.decode(prefix)
+        while chunk := fin.read(_CHUNK_SIZE):
+            decoder.decode(chunk)
+        decoder.decode(b"", final=True)
+    except UnicodeError:
+        return False
+    return True
+
+
+def _sniff(file_path: str | Path, expected_pattern: str, re_flags: int) -> str | None:
+    """Tries the candidate encodings on the beginning of the file, and returns None if
+    the whole file is needed to decide.
+
+    :raises EncodingDetectError: If the prefix is the whole file, and no encoding fits
+    """
+    with open(file_path, "rb") as fin:
+        prefix = fin.read(PREFIX_SIZE)
+        complete = len(prefix) < PREFIX_SIZE or not fin.peek(1)
+        for encoding in ENCODINGS:
+            try:
+                text = codecs.getincrementaldecoder(encoding)().decode(prefix, final=complete)
+            except UnicodeError:
+                continue
+            if len(text) == 0:
+                if complete:
+                    continue  # Empty file
+                return None  # Not a single character in the prefix
+            if encoding == "utf-8" and len(text) > 1 and text[1] == "\x00":
+                continue
+            if expected_pattern:
+                # As read in text mode, with the universal newlines
+                text = text.replace("\r\n", "\n").replace("\r", "\n")
+                if not re.match(expected_pattern, text, re_flags):
+                    continue
+            if complete or _decodes(fin, encoding, prefix):
+                return encoding
+            fin.seek(len(prefix))
+    if not complete:
+        return None  # The pattern may match further in the file
+    # The whole file was tried with each encoding, with the same messages as kupicelib
+    if expected_pattern:
+        raise EncodingDetectError(
+            f'Expected pattern "{expected_pattern}" not found in file:{file_path}'
+        )
+    raise EncodingDetectError(f"Unable to detect encoding on log file: {file_path}")
+
+
+def detect_encoding(
+    file_path: str | Path,
+    expected_pattern: str = "",
+    re_flags: int | re.RegexFlag = 0,
+) -> str:
+    """Detects the encoding of a file. See :py:func:`kupicelib.utils.detect_encoding`.
 
-# Re-export these symbols
-__all__ = ["EncodingDetectError", "detect_encoding"]
+    :param file_path: path to the filename
+    :type file_path: str | Path
+    :param expected_pattern: regular expression to match the first line of the file
+    :type expected_pattern: str
+    :param re_flags: flags to be used in the regular expression
+    :type re_flags: int
+    :raises EncodingDetectError: If no candidate encoding decodes the file and matches
+        the pattern
+    :return: detected encoding
+    :rtype: str
+    """
+    stat = os.stat(file_path)
+    path = os.path.abspath(file_path)
+    key = (path, stat.st_size, stat.st_mtime_ns, expected_pattern, int(re_flags))
+    with _lock:
+        stats.calls += 1
+        encoding = _cache.get(key)
+        if encoding is not None:
+            stats.cache_hits += 1
+            _cache.move_to_end(key)
+            return encoding
+    encoding = _sniff(file_path, expected_pattern, re_flags)
+    if encoding is None:
+        with _lock:
+            stats.slow_fallbacks += 1
+        encoding = _detect_encoding(file_path, expected_pattern, re_flags)
+    with _lock:
+        _cache[key] = encoding
+        if len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return encoding
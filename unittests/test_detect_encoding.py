@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+# -------------------------------------------------------------------------------
+#    ____        _   _____ ____        _
+#   |  _ \ _   _| | |_   _/ ___| _ __ (_) ___ ___
+#   | |_) | | | | |   | | \___ \| '_ \| |/ __/ _ \
+#   |  __/| |_| | |___| |  ___) | |_) | | (_|  __/
+#   |_|    \__, |_____|_| |____/| .__/|_|\___\___|
+#          |___/                |_|
+#
+# Name:        test_detect_encoding.py
+# Purpose:     Tests of the cached encoding detection
+#
+# Licence:     refer to the LICENSE file
+# -------------------------------------------------------------------------------
+import glob
+import os
+import re
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+from kupicelib.utils.detect_encoding import detect_encoding as base_detect_encoding
+
+from kuPyLTSpice.utils import detect_encoding as encoding_module
+from kuPyLTSpice.utils.detect_encoding import (
+    PREFIX_SIZE,
+    EncodingDetectError,
+    clear_encoding_cache,
+    detect_encoding,
+    stats,
+)
+
+sys.path.append(
+    os.path.abspath(os.path.dirname(os.path.abspath(__file__)) + "/../")
+)  # add project root to lib search path
+
+test_dir = (
+    "../examples/testfiles/"
+    if os.path.abspath(os.curdir).endswith("unittests")
+    else "./examples/testfiles/"
+)
+
+LOG_PATTERN = r"^((.*\n)?Circuit:|([\s\S]*)--- Expanded Netlist ---)"
+PATTERNS = (("", 0), (LOG_PATTERN, 0), (r"^\*", 0), (r"^VERSION ", re.IGNORECASE))
+
+
+def detect(function, file_path, pattern="", flags=0):
+    """Returns the encoding, or the exception raised."""
+    try:
+        return function(file_path, pattern, flags)
+    except EncodingDetectError as err:
+        return str(err)
+
+
+class DetectEncodingTest(unittest.TestCase):
+
+    def setUp(self):
+        clear_encoding_cache()
+        stats.reset()
+
+    def test_same_as_kupicelib(self):
+        files = [
+            name for name in sorted(glob.glob(test_dir + "*"))
+            if name.endswith((".log", ".net", ".asc", ".asy"))
+        ]
+        for file_path in files:
+            for pattern, flags in PATTERNS:
+                with self.subTest(file=file_path, pattern=pattern):
+                    self.assertEqual(
+                        detect(detect_encoding, file_path, pattern, flags),
+                        detect(base_detect_encoding, file_path, pattern, flags),
+                    )
+        self.assertEqual(stats.slow_fallbacks, 0)
+
+    def test_prefix(self):
+        """Long files are decided on their prefix and checked to decode to the end."""
+        log = Path(test_dir + "TRAN - STEP_1.log").read_text()
+        log = log * (2 * PREFIX_SIZE // len(log))
+        with tempfile.TemporaryDirectory() as tmp:
+            file_path = Path(tmp) / "long.log"
+            for encoding in ("utf_16_le", "utf-16", "utf-8"):
+                with self.subTest(encoding=encoding):
+                    file_path.write_text(log, encoding=encoding)
+                    self.assertEqual(detect_encoding(file_path, LOG_PATTERN), encoding)
+            # A character that isn't UTF-8 after the prefix
+            file_path.write_bytes(log.encode("utf-8") + "µ".encode("windows-1252"))
+            self.assertEqual(detect_encoding(file_path, LOG_PATTERN), "windows-1252")
+            self.assertEqual(stats.slow_fallbacks, 0)
+            # A pattern that only matches after the prefix needs the whole file
+            file_path.write_text(log + "--- Expanded Netlist ---\n", encoding="utf-8")
+            pattern = r"[\s\S]*--- Expanded Netlist ---"
+            self.assertEqual(
+                detect_encoding(file_path, pattern), base_detect_encoding(file_path, pattern)
+            )
+            self.assertEqual(stats.slow_fallbacks, 1)
+            file_path.write_bytes(b"")
+            with self.assertRaises(EncodingDetectError):
+                detect_encoding(file_path)
+
+    def test_cache(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            file_path = Path(tmp) / "netlist.net"
+            file_path.write_text("* netlist\nR1 a b 1k\n", encoding="utf-8")
+            for _ in range(3):
+                self.assertEqual(detect_encoding(file_path, r"^\*"), "utf-8")
+            self.assertEqual((stats.calls, stats.cache_hits), (3, 2))
+            file_path.write_text("* netlist\nR1 a b 1k\n", encoding="utf-16")
+            os.utime(file_path, ns=(0, 0))  # The size and the time change
+            self.assertEqual(detect_encoding(file_path, r"^\*"), "utf-16")
+            self.assertEqual(stats.cache_hits, 2)
+            self.assertEqual(len(encoding_module._cache), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+# -------------------------------------------------------------------------------
+#    ____        _   _____ ____        _
+#   |  _ \ _   _| | |_   _/ ___| _ __ (_) ___ ___
+#   | |_) | | | | |   | | \___ \| '_ \| |/ __/ _ \
+#   |  __/| |_| | |___| |  ___) | |_) | | (_|  __/
+#   |_|    \__, |_____|_| |____/| .__/|_|\___\___|
+#          |___/                |_|
+#
+# Name:        test_log_aggregate.py
+# Purpose:     Tests of the merging of the log files of many runs
+#
+# Licence:     refer to the LICENSE file
+# -------------------------------------------------------------------------------
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+from kuPyLTSpice.log.log_aggregate import LogAggregator, aggregate_logs
+from kuPyLTSpice.log.ltsteps import LTSpiceLogReader
+
+sys.path.append(
+    os.path.abspath(os.path.dirname(os.path.abspath(__file__)) + "/../")
+)  # add project root to lib search path
+
+test_dir = (
+    "../examples/testfiles/"
+    if os.path.abspath(os.curdir).endswith("unittests")
+    else "./examples/testfiles/"
+)
+
+
+class LogAggregateTest(unittest.TestCase):
+
+    def test_aggregate(self):
+        """The runs are merged in the order of the files, with masks where a log has no
+        value."""
+        with tempfile.TemporaryDirectory() as tmp:
+            for run, filename in enumerate(("TRAN - STEP_1.log", "TRAN_1.log")):
+                shutil.copy(test_dir + filename, Path(tmp) / f"run_{run}.log")
+            data = aggregate_logs(tmp, max_workers=2)
+            self.assertListEqual(data.get_step_vars(), ["run_id", "vin", "r1"])
+            self.assertEqual(data.step_count, 5)
+            self.assertEqual(data.stepset["run_id"], [0, 0, 0, 0, 1])
+            self.assertEqual(data.stepset["vin"], [1, 10, 1, 10, None])
+            stepped = LTSpiceLogReader(test_dir + "TRAN - STEP_1.log")
+            single = LTSpiceLogReader(test_dir + "TRAN_1.log")
+            for name in stepped.get_measure_names():
+                with self.subTest(measure=name):
+                    expected = stepped.dataset[name] + single.dataset.get(name, [None])
+                    self.assertEqual(data.dataset[name], expected)
+            self.assertEqual(data.steps_with_conditions(run_id=0, r1=10000), [2, 3])
+            self.assertEqual(data.max_measure_value("t1"), max(stepped.dataset["t1"]))
+
+    def test_cache(self):
+        """Only the new and the modified files are parsed again."""
+        with tempfile.TemporaryDirectory() as tmp:
+            logs = Path(tmp) / "logs"
+            logs.mkdir()
+            for run in range(3):
+                shutil.copy(test_dir + "TRAN - STEP_1.log", logs / f"run_{run}.log")
+            aggregator = LogAggregator(Path(tmp) / "logs.cache", max_workers=2)
+            expected = aggregator.read(logs)
+            self.assertEqual(aggregator.parsed_count, 3)
+            aggregator.save()
+            # Another session reuses the saved cache
+            aggregator = LogAggregator(Path(tmp) / "logs.cache", use_processes=False)
+            data = aggregator.read(logs)
+            self.assertEqual(aggregator.parsed_count, 0)
+            self.assertDictEqual(data.stepset, expected.stepset)
+            self.assertDictEqual(dict(data.dataset), dict(expected.dataset))
+            shutil.copy(test_dir + "TRAN_1.log", logs / "run_3.log")
+            os.utime(logs / "run_0.log", ns=(0, 0))
+            data = aggregator.read(logs)
+            self.assertEqual(aggregator.parsed_count, 2)
+            self.assertEqual(aggregator.files[-1], logs / "run_3.log")
+            np.testing.assert_array_equal(np.bincount(data.stepset["run_id"].values), [4, 4, 4, 1])
+            with self.assertRaises(FileNotFoundError):
+                aggregator.read(Path(tmp) / "*.missing")
+
+
+if __name__ == "__main__":
+    unittest.main()
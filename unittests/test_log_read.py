@@ -0,0 +1,240 @@
+#!/usr/bin/env python
+# -------------------------------------------------------------------------------
+#    ____        _   _____ ____        _
+#   |  _ \ _   _| | |_   _/ ___| _ __ (_) ___ ___
+#   | |_) | | | | |   | | \___ \| '_ \| |/ __/ _ \
+#   |  __/| |_| | |___| |  ___) | |_) | | (_|  __/
+#   |_|    \__, |_____|_| |____/| .__/|_|\___\___|
+#          |___/                |_|
+#
+# Name:        test_log_read.py
+# Purpose:     Tests of the LOG file reading extensions
+#
+# Licence:     refer to the LICENSE file
+# -------------------------------------------------------------------------------
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+from kupicelib.log.logfile_data import LogfileData as BaseLogfileData
+from kupicelib.log.logfile_data import LTComplex
+from kupicelib.log.ltsteps import LTSpiceExport as BaseExport
+from kupicelib.log.ltsteps import LTSpiceLogReader as BaseLogReader
+from kupicelib.log.ltsteps import reformat_LTSpice_export as base_reformat
+
+from kuPyLTSpice.log.logfile_data import LogColumn, LogfileData
+from kuPyLTSpice.log.ltsteps import (
+    LTSpiceExport,
+    LTSpiceLogReader,
+    probe_log,
+    reformat_LTSpice_export,
+)
+
+sys.path.append(
+    os.path.abspath(os.path.dirname(os.path.abspath(__file__)) + "/../")
+)  # add project root to lib search path
+
+test_dir = (
+    "../examples/testfiles/"
+    if os.path.abspath(os.curdir).endswith("unittests")
+    else "./examples/testfiles/"
+)
+
+LOG_FILES = (
+    "AC - STEP_1.log",
+    "Batch_Test_1.log",
+    "TRAN - STEP_1.log",
+    "TRAN_1.log",
+    "testfile.log",
+)
+
+FOURIER_LOG = """Circuit: * fourier.asc
+
+.step r=1
+N-Period=1
+Fourier components of V(out)
+DC component:-0.0015
+
+Harmonic\tFrequency\tFourier\tNormalized\tPhase\tNormalized
+ Number\t[Hz]\tComponent\tComponent\t[degree]\tPhase [deg]
+    1\t1.000e+03\t9.900e-01\t1.000e+00\t-0.50°\t0.00°
+    2\t2.000e+03\t1.000e-03\t1.010e-03\t10.00°\t10.50°
+Total Harmonic Distortion: 0.101000%(0.101000%)
+Partial Harmonic Distortion: 0.101000%(0.101000%)
+
+.step r=2
+Measurement: vmax
+  step\tMAX(v(out))\tFROM\tTO
+     1\t1.5\t0\t0.001
+     2\t2.5\t0\t0.001
+"""
+
+
+def write_export(export_file, steps, rows):
+    """Writes a stepped file as exported by "Export data as text"."""
+    rng = np.random.default_rng(0)
+    with open(export_file, "w") as fout:
+        fout.write("time\tV(out)\tI(R1)\n")
+        for step in range(steps):
+            fout.write(f"Step Information: Vin={step} R1=1K  (Run: {step + 1}/{steps})\n")
+            for row in rng.random((rows, 3)):
+                fout.write("\t".join(f"{value:.15e}" for value in row) + "\n")
+
+
+class LogReadTest(unittest.TestCase):
+
+    def assertSameLog(self, log, expected):
+        self.assertEqual(log.step_count, expected.step_count)
+        self.assertDictEqual(log.stepset, expected.stepset)
+        self.assertDictEqual(dict(log.dataset), dict(expected.dataset))
+        self.assertDictEqual(log.fourier, expected.fourier)
+
+    def test_probe_log(self):
+        """The names found by probe_log are the ones of the complete reader."""
+        for filename in LOG_FILES:
+            with self.subTest(filename=filename):
+                info = probe_log(test_dir + filename)
+                log = LTSpiceLogReader(test_dir + filename)
+                self.assertEqual(info.step_count, log.step_count)
+                self.assertListEqual(info.step_vars, log.get_step_vars())
+                # The complete reader adds the _at, _from and _to columns
+                self.assertListEqual(
+                    info.measure_names,
+                    [
+                        name for name in log.get_measure_names()
+                        if not name.endswith(("_at", "_from", "_to"))
+                    ],
+                )
+        info = probe_log(test_dir + "TRAN - STEP_1.log")
+        self.assertEqual(info.step_count, 4)
+        self.assertListEqual(info.measure_names[:2], ["t1", "t2"])
+
+    def test_log_reader(self):
+        """The log reader gives the same results as the kupicelib reader."""
+        with tempfile.TemporaryDirectory() as tmp:
+            fourier_log = Path(tmp) / "fourier.log"
+            fourier_log.write_text(FOURIER_LOG, encoding="utf_8")
+            for filename in [*(test_dir + name for name in LOG_FILES), fourier_log]:
+                with self.subTest(filename=filename):
+                    self.assertSameLog(LTSpiceLogReader(filename), BaseLogReader(filename))
+            self.assertEqual(LTSpiceLogReader(fourier_log).fourier["V(out)"][0].thd, 0.101)
+
+    def test_refresh(self):
+        """A log written a few bytes at a time is parsed as it grows."""
+        expected = LTSpiceLogReader(test_dir + "TRAN - STEP_1.log")
+        content = Path(test_dir + "TRAN - STEP_1.log").read_text(encoding="utf_8")
+        for encoding in ("utf_8", "utf_16_le"):
+            data = content.encode(encoding)
+            with self.subTest(encoding=encoding), tempfile.TemporaryDirectory() as tmp:
+                log_file = Path(tmp) / "growing.log"
+                log_file.write_bytes(b"")
+                log = LTSpiceLogReader(log_file, encoding=encoding, incremental=True)
+                new_values = 0
+                for start in range(0, len(data), 37):  # Cuts lines and characters
+                    with open(log_file, "ab") as fout:
+                        fout.write(data[start : start + 37])
+                    new_values += log.refresh()
+                    self.assertLessEqual(len(log.dataset.get("t5", [])), 4)
+                    self.assertEqual(log.offset, min(start + 37, len(data)))
+                self.assertSameLog(log, expected)
+                self.assertEqual(new_values, 20)
+                self.assertEqual(log.refresh(), 0)
+                log_file.write_bytes(b"")
+                with self.assertRaises(RuntimeError):
+                    log.refresh()
+
+    def test_columns(self):
+        column = LogColumn([1, 2])
+        self.assertEqual(column.dtype, np.int64)
+        column.append(2.5)
+        column.append("FAILED")
+        self.assertEqual(len(column), 4)
+        self.assertEqual(column.dtype, np.float64)
+        np.testing.assert_array_equal(column.mask, [False, False, False, True])
+        self.assertEqual(column[-1], "FAILED")
+        self.assertEqual(column, [1, 2, 2.5, "FAILED"])
+        self.assertEqual(column.formatted(), ["1.0", "2.0", "2.5", "FAILED"])
+        # Complex values are read back as LTComplex, in the format of the log
+        column = LogColumn([LTComplex("(-6.0206dB,45°)"), LTComplex("(0dB,-90°)")])
+        self.assertEqual(column.dtype, np.complex128)
+        self.assertIsInstance(column[1], LTComplex)
+        self.assertEqual(column[0], LTComplex("(-6.0206dB,45°)"))
+        self.assertEqual(column.formatted(), ["(-6.0206dB,45°)", "(0dB,-90°)"])
+        column = LogColumn.from_array(np.array([1.0, 2.0]), np.array([False, True]))
+        self.assertEqual(column, [1.0, None])
+
+    def test_logfile_data(self):
+        """The measurements give the same results as the kupicelib LogfileData, the
+        failed measurements being ignored."""
+        step_set = {"run": [1, 2, 3, 4], "r": [10, 20, 10, 20]}
+        dataset = {"vout": [1.5, 0.5, "FAILED", 2.5], "n": [3, 1, 4, 1]}
+        data = LogfileData(step_set, dataset)
+        expected = BaseLogfileData(step_set, {"vout": [1.5, 0.5, 2.5], "n": [3, 1, 4, 1]})
+        self.assertEqual(data.max_measure_value("vout"), 2.5)
+        self.assertEqual(data.min_measure_value("vout"), 0.5)
+        self.assertEqual(data.avg_measure_value("vout"), expected.avg_measure_value("vout"))
+        self.assertEqual(data.max_measure_value("vout", [0, 1, 2]), 1.5)
+        self.assertEqual(data.min_measure_value("n", 2), 4)
+        self.assertEqual(data.steps_with_parameter_equal_to("r", "20"), [1, 3])
+        self.assertEqual(data.steps_with_conditions(r=10, n=4), [2])
+        self.assertEqual(data.get_measure_value("vout", r=20, n=1, run=4), 2.5)
+        with self.assertRaises(ValueError):
+            data.avg_measure_value("vout", [2])
+        # AC measurements are split in magnitude and phase
+        data.dataset["gain"] = LogColumn([LTComplex("(6.0206dB,90°)")] * 4)
+        data.obtain_amplitude_and_phase_from_complex_values()
+        np.testing.assert_allclose(data.dataset["gain_mag"].values, 2, rtol=1e-5)
+        np.testing.assert_allclose(data.dataset["gain_ph"].values, 90)
+        with self.assertRaises(TypeError):
+            data.max_measure_value("gain")
+
+    def test_export(self):
+        """The export is the same as the one of the kupicelib reader."""
+        with tempfile.TemporaryDirectory() as tmp:
+            for filename in ("Batch_Test_1.log", "TRAN - STEP_1.log", "TRAN_1.log"):
+                with self.subTest(filename=filename):
+                    LTSpiceLogReader(test_dir + filename).export_data(
+                        f"{tmp}/export.tsv", append_with_line_prefix="run"
+                    )
+                    BaseLogReader(test_dir + filename).export_data(
+                        f"{tmp}/expected.tsv", append_with_line_prefix="run"
+                    )
+                    self.assertEqual(
+                        Path(f"{tmp}/export.tsv").read_text(),
+                        Path(f"{tmp}/expected.tsv").read_text(),
+                    )
+
+    def test_export_file(self):
+        """The export files are read and reformatted as kupicelib does, whatever the size
+        of the chunks."""
+        with tempfile.TemporaryDirectory() as tmp:
+            write_export(f"{tmp}/export.txt", 3, 50)
+            expected = BaseExport(f"{tmp}/export.txt")
+            base_reformat(f"{tmp}/export.txt", f"{tmp}/expected.tsv")
+            for chunk_size in (10, 1000, 1 << 20):
+                export = LTSpiceExport(f"{tmp}/export.txt", chunk_size)
+                self.assertListEqual(export.headers, expected.headers)
+                self.assertListEqual(
+                    list(export.dataset), ["time", "v(out)", "i(r1)", "runno", "vin", "r1"]
+                )
+                for key, values in expected.dataset.items():
+                    if key == "runno":
+                        values = [int(value) for value in values]
+                    self.assertEqual(export.dataset[key.strip()], values)
+                self.assertIsInstance(export.dataset["v(out)"], LogColumn)
+                reformat_LTSpice_export(f"{tmp}/export.txt", f"{tmp}/table.tsv", chunk_size)
+                self.assertEqual(
+                    Path(f"{tmp}/table.tsv").read_text(), Path(f"{tmp}/expected.tsv").read_text()
+                )
+            # Without steps
+            Path(f"{tmp}/flat.txt").write_text("time\tV(out)\n0.0\t1.0\n1e-3\t2.5\n")
+            export = LTSpiceExport(f"{tmp}/flat.txt")
+            self.assertListEqual(list(export.dataset), ["time", "v(out)"])
+            np.testing.assert_array_equal(export.dataset["v(out)"].values, [1.0, 2.5])
+
+
+if __name__ == "__main__":
+    unittest.main()
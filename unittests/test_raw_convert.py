@@ -0,0 +1,178 @@
+#!/usr/bin/env python
+# -------------------------------------------------------------------------------
+#    ____        _   _____ ____        _
+#   |  _ \ _   _| | |_   _/ ___| _ __ (_) ___ ___
+#   | |_) | | | | |   | | \___ \| '_ \| |/ __/ _ \
+#   |  __/| |_| | |___| |  ___) | |_) | | (_|  __/
+#   |_|    \__, |_____|_| |____/| .__/|_|\___\___|
+#          |___/                |_|
+#
+# Name:        test_raw_convert.py
+# Purpose:     Tests of the conversion of RAW files to Parquet and HDF5
+#
+# Licence:     refer to the LICENSE file
+# -------------------------------------------------------------------------------
+import importlib.util
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+
+from kuPyLTSpice.raw.raw_convert import RawChunkReader, convert_raw, convert_raw_files, main
+from kuPyLTSpice.raw.raw_read import RawRead
+from kuPyLTSpice.raw.raw_write import RawWrite, Trace
+
+sys.path.append(
+    os.path.abspath(os.path.dirname(os.path.abspath(__file__)) + "/../")
+)  # add project root to lib search path
+
+test_dir = (
+    "../examples/testfiles/"
+    if os.path.abspath(os.curdir).endswith("unittests")
+    else "./examples/testfiles/"
+)
+
+HAS_PYARROW = importlib.util.find_spec("pyarrow") is not None
+HAS_H5PY = importlib.util.find_spec("h5py") is not None
+
+
+def copy_run(filename, destination):
+    """Copies a RAW file and its log file under another name."""
+    destination.parent.mkdir(parents=True, exist_ok=True)
+    shutil.copy(test_dir + filename, destination)
+    shutil.copy(test_dir + filename.replace(".raw", ".log"), destination.with_suffix(".log"))
+    return destination
+
+
+def read_chunks(raw_file, chunk_points, traces_to_read="*"):
+    """Concatenates the chunks of a RAW file."""
+    chunks = list(RawChunkReader(raw_file, traces_to_read, chunk_points))
+    return chunks, {name: np.concatenate([chunk[name] for chunk in chunks]) for name in chunks[0]}
+
+
+class RawConvertTest(unittest.TestCase):
+
+    def test_chunks(self):
+        """The chunks have the values of the traces, the step number and the parameters."""
+        for filename in ("TRAN - STEP_1.raw", "AC - STEP_1.raw", "TRAN_1.raw"):
+            with self.subTest(filename=filename):
+                raw = RawRead(test_dir + filename, verbose=False)
+                chunks, columns = read_chunks(test_dir + filename, 7)
+                self.assertTrue(all(len(chunk["step"]) <= 7 for chunk in chunks))
+                for name in raw.get_trace_names():
+                    data = raw.get_trace(name).data
+                    expected = np.abs(data) if name == "time" else data
+                    np.testing.assert_array_equal(columns[name], expected)
+                for step, (start, end) in enumerate(zip(*raw.axis.step_bounds(), strict=True)):
+                    np.testing.assert_array_equal(columns["step"][start:end], step)
+                    for name, value in (raw.steps[step] if raw.steps else {}).items():
+                        np.testing.assert_array_equal(columns[name][start:end], value)
+
+    def test_chunks_fast_access(self):
+        """FastAccess files and operating point files are read in chunks too."""
+        time = np.linspace(0, 1e-3, 101)
+        writer = RawWrite(fastacces=True)
+        writer.add_trace(Trace("time", time))
+        writer.add_trace(Trace("V(a)", np.sin(time * 1e4), numerical_type="real"))
+        writer.add_trace(Trace("I(R1)", np.cos(time * 1e4), "current", "real"))
+        with tempfile.TemporaryDirectory() as tmp:
+            raw_file = Path(tmp) / "fast.raw"
+            writer.save(raw_file)
+            _, columns = read_chunks(raw_file, 10, "I(*)")
+            self.assertListEqual(list(columns), ["step", "time", "I(R1)"])
+            np.testing.assert_array_equal(
+                columns["I(R1)"], RawRead(raw_file).get_trace("I(R1)").data
+            )
+        _, columns = read_chunks(test_dir + "DC op point - STEP_1.raw", 3)
+        np.testing.assert_array_equal(columns["step"], np.arange(10))
+
+    @unittest.skipUnless(HAS_PYARROW, "pyarrow is not installed")
+    def test_parquet(self):
+        import pyarrow.dataset as ds
+        import pyarrow.parquet as pq
+
+        with tempfile.TemporaryDirectory() as tmp:
+            parquet_file = convert_raw(
+                test_dir + "AC - STEP_1.raw", Path(tmp) / "ac.parquet", chunk_points=50
+            )
+            table = pq.read_table(parquet_file)
+            raw = RawRead(test_dir + "AC - STEP_1.raw")
+            self.assertEqual(table.num_rows, raw.nPoints)
+            np.testing.assert_array_equal(
+                table["re(V(out))"].to_numpy(), raw.get_trace("V(out)").data.real
+            )
+            files = [test_dir + "TRAN_1.raw", test_dir + "TRAN - STEP_1.raw"]
+            # Parameters given by run name and by RAW file
+            run_params = {"TRAN_1": {"R1": 1000.0}, Path(files[1]): {"R1": 2200.0}}
+            convert_raw_files(files, Path(tmp) / "dataset", chunk_points=50, run_params=run_params)
+            dataset = ds.dataset(Path(tmp) / "dataset", format="parquet", partitioning="hive")
+            table = dataset.to_table(columns=["run", "R1"])
+            runs = table["run"].to_pylist()
+            self.assertEqual(runs.count("TRAN_1"), 23)
+            self.assertEqual(runs.count("TRAN - STEP_1"), 120)
+            r1_by_run = dict(zip(runs, table["R1"].to_pylist(), strict=True))
+            self.assertDictEqual(r1_by_run, {"TRAN_1": 1000.0, "TRAN - STEP_1": 2200.0})
+            # Same from the command line, with the parameters in a JSON file
+            params_file = Path(tmp) / "params.json"
+            params_file.write_text(json.dumps({"TRAN_1": {"R1": 1500.0}}))
+            argv = ["raw_convert", files[0], "-o", f"{tmp}/cli", "--run-params", str(params_file)]
+            with mock.patch.object(sys, "argv", argv):
+                main()
+            table = ds.dataset(Path(tmp) / "cli", partitioning="hive").to_table()
+            self.assertSetEqual(set(table["R1"].to_pylist()), {1500.0})
+
+    @unittest.skipUnless(HAS_PYARROW, "pyarrow is not installed")
+    def test_same_name_runs(self):
+        """Files with the same name in different directories are kept as distinct runs."""
+        import pyarrow.dataset as ds
+
+        with tempfile.TemporaryDirectory() as tmp:
+            files = [
+                copy_run("TRAN - STEP_1.raw", Path(tmp) / "a" / "run.raw"),
+                copy_run("TRAN_1.raw", Path(tmp) / "b" / "run.raw"),
+            ]
+            run_params = {"a-run": {"R1": 1000.0}, files[1]: {"R1": 2200.0}}
+            written = convert_raw_files(files, Path(tmp) / "dataset", run_params=run_params)
+            self.assertEqual(len(set(written)), 2)
+            table = ds.dataset(Path(tmp) / "dataset", partitioning="hive").to_table()
+            runs = table["run"].to_pylist()
+            self.assertEqual(runs.count("a-run"), 120)
+            self.assertEqual(runs.count("b-run"), 23)
+            r1_by_run = dict(zip(runs, table["R1"].to_pylist(), strict=True))
+            self.assertDictEqual(r1_by_run, {"a-run": 1000.0, "b-run": 2200.0})
+            # A name that can't be told apart is rejected before writing anything
+            with self.assertRaises(ValueError):
+                convert_raw_files([files[0], files[0]], Path(tmp) / "twice")
+            self.assertFalse((Path(tmp) / "twice").exists())
+
+    @unittest.skipUnless(HAS_H5PY, "h5py is not installed")
+    def test_hdf5(self):
+        import h5py
+
+        with tempfile.TemporaryDirectory() as tmp:
+            files = [test_dir + "TRAN - STEP_1.raw", test_dir + "AC_1.raw"]
+            h5_file = convert_raw_files(files, Path(tmp) / "dataset.h5", "hdf5", chunk_points=50)[0]
+            with h5py.File(h5_file, "r") as h5:
+                self.assertListEqual(sorted(h5), ["AC_1", "TRAN - STEP_1"])
+                raw = RawRead(test_dir + "AC_1.raw")
+                np.testing.assert_array_equal(h5["AC_1/V(out)"][:], raw.get_trace("V(out)").data)
+                self.assertEqual(h5["TRAN - STEP_1/step"][-1], 3)
+            files = [
+                copy_run("TRAN - STEP_1.raw", Path(tmp) / "a" / "run.raw"),
+                copy_run("TRAN_1.raw", Path(tmp) / "b" / "run.raw"),
+            ]
+            h5_file = convert_raw_files(files, Path(tmp) / "runs.h5", "hdf5")[0]
+            with h5py.File(h5_file, "r") as h5:
+                self.assertListEqual(sorted(h5), ["a-run", "b-run"])
+                self.assertEqual(len(h5["a-run/time"]), 120)
+                self.assertEqual(len(h5["b-run/time"]), 23)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# -------------------------------------------------------------------------------
+#    ____        _   _____ ____        _
+#   |  _ \ _   _| | |_   _/ ___| _ __ (_) ___ ___
+#   | |_) | | | | |   | | \___ \| '_ \| |/ __/ _ \
+#   |  __/| |_| | |___| |  ___) | |_) | | (_|  __/
+#   |_|    \__, |_____|_| |____/| .__/|_|\___\___|
+#          |___/                |_|
+#
+# Name:        test_raw_expr.py
+# Purpose:     Tests of the lazy expressions over the traces of RAW files
+#
+# Licence:     refer to the LICENSE file
+# -------------------------------------------------------------------------------
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+from kuPyLTSpice.raw.raw_expr import iter_expressions, reduce_expressions, ref, write_expressions
+from kuPyLTSpice.raw.raw_read import RawRead
+from kuPyLTSpice.raw.raw_write import RawStreamWrite
+
+sys.path.append(
+    os.path.abspath(os.path.dirname(os.path.abspath(__file__)) + "/../")
+)  # add project root to lib search path
+
+test_dir = (
+    "../examples/testfiles/"
+    if os.path.abspath(os.curdir).endswith("unittests")
+    else "./examples/testfiles/"
+)
+
+TRAN_FILE = test_dir + "TRAN - STEP_1.raw"
+
+
+class RawExprTest(unittest.TestCase):
+
+    def test_expression(self):
+        power = ref("V(out)") * ref("I(R1)")
+        expression = abs(2 * power - ref("r1") / 1000)
+        self.assertEqual(str(expression), "abs(((2*(V(out)*I(R1)))-(r1/1000)))")
+        self.assertSetEqual(expression.names(), {"V(out)", "I(R1)", "r1"})
+        raw = RawRead(TRAN_FILE)
+        chunks = list(iter_expressions(TRAN_FILE, {"P": power, "e": expression}, 16))
+        self.assertTrue(all(len(chunk["step"]) <= 16 for chunk in chunks))
+        values = {name: np.concatenate([chunk[name] for chunk in chunks]) for name in chunks[0]}
+        self.assertListEqual(list(values), ["step", "time", "P", "e"])
+        expected = raw.get_trace("V(out)").data * raw.get_trace("I(R1)").data
+        np.testing.assert_array_equal(values["P"], expected)
+        r1 = np.array([step["r1"] for step in raw.steps])[values["step"]]
+        np.testing.assert_allclose(values["e"], np.abs(2 * expected - r1 / 1000))
+
+    def test_reduce(self):
+        """The reductions don't depend on the size of the chunks."""
+        raw = RawRead(TRAN_FILE)
+        for chunk_points in (7, 1000):
+            results = reduce_expressions(
+                TRAN_FILE, [ref("V(out)")], chunk_points=chunk_points
+            )["V(out)"]
+            for step in range(len(raw.steps)):
+                time = raw.get_axis(step)
+                vout = raw.get_wave("V(out)", step)
+                duration = time[-1] - time[0]
+                self.assertAlmostEqual(results["integral"][step], np.trapezoid(vout, time))
+                self.assertAlmostEqual(
+                    results["mean"][step], np.trapezoid(vout, time) / duration
+                )
+                self.assertAlmostEqual(
+                    results["rms"][step], np.sqrt(np.trapezoid(vout**2, time) / duration)
+                )
+                self.assertEqual(results["max"][step], vout.max())
+                self.assertEqual(results["min"][step], vout.min())
+        # Without an axis, the points of each step are averaged
+        results = reduce_expressions(
+            test_dir + "DC op point - STEP_1.raw", [ref("V(out)")], ["mean", "max"]
+        )
+        np.testing.assert_allclose(results["V(out)"]["mean"], results["V(out)"]["max"])
+        with self.assertRaises(ValueError):
+            reduce_expressions(TRAN_FILE, [ref("V(out)")], ["median"])
+
+    def test_write(self):
+        raw = RawRead(TRAN_FILE)
+        with tempfile.TemporaryDirectory() as tmp:
+            with RawStreamWrite(Path(tmp) / "power.raw") as writer:
+                points = write_expressions(
+                    TRAN_FILE, {"P(R1)": ref("V(out)") * ref("I(R1)")}, writer, 10
+                )
+            self.assertEqual(points, raw.nPoints)
+            power = RawRead(Path(tmp) / "power.raw")
+            self.assertIn("stepped", power.raw_params["Flags"])
+            np.testing.assert_array_equal(power.get_axis(), raw.get_axis())
+            np.testing.assert_allclose(
+                power.get_trace("P(R1)").data,
+                raw.get_trace("V(out)").data * raw.get_trace("I(R1)").data,
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,413 @@
+#!/usr/bin/env python
+# -------------------------------------------------------------------------------
+#    ____        _   _____ ____        _
+#   |  _ \ _   _| | |_   _/ ___| _ __ (_) ___ ___
+#   | |_) | | | | |   | | \___ \| '_ \| |/ __/ _ \
+#   |  __/| |_| | |___| |  ___) | |_) | | (_|  __/
+#   |_|    \__, |_____|_| |____/| .__/|_|\___\___|
+#          |___/                |_|
+#
+# Name:        test_raw_read.py
+# Purpose:     Tests of the RAW file reading extensions
+#
+# Licence:     refer to the LICENSE file
+# -------------------------------------------------------------------------------
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+from kupicelib.raw.raw_read import RawRead as BaseRawRead
+from kupicelib.raw.raw_write import RawWrite, Trace
+
+from kuPyLTSpice.raw import raw_ascii
+from kuPyLTSpice.raw.raw_cache import RawCache
+from kuPyLTSpice.raw.raw_loader import read_traces
+from kuPyLTSpice.raw.raw_read import RawRead, find_binary_start, probe
+from kuPyLTSpice.raw.raw_tail import RawTailReader
+from kuPyLTSpice.raw.raw_write import RawStreamWrite
+
+sys.path.append(
+    os.path.abspath(os.path.dirname(os.path.abspath(__file__)) + "/../")
+)  # add project root to lib search path
+
+test_dir = (
+    "../examples/testfiles/"
+    if os.path.abspath(os.curdir).endswith("unittests")
+    else "./examples/testfiles/"
+)
+
+RAW_FILES = (
+    "AC - STEP_1.raw",
+    "AC_1.raw",
+    "Batch_Test_1.raw",
+    "DC op point - STEP_1.raw",
+    "DC op point_1.raw",
+    "Noise.raw",
+    "PI_Filter.raw",
+    "TRAN - STEP_1.raw",
+    "TRAN_1.raw",
+)
+
+
+def write_ascii_raw(source, destination, encoding="utf_8"):
+    """Writes a binary RAW file in the ASCII format used with the -ascii switch."""
+    raw = BaseRawRead(source, verbose=False)
+    header = Path(source).read_bytes()[: find_binary_start(source, raw.encoding)]
+    header = header.decode(raw.encoding).replace("Binary:", "Values:")
+
+    def value(data, point):
+        if np.iscomplexobj(data):
+            return f"{float(data[point].real)!r},{float(data[point].imag)!r}"
+        return repr(float(data[point]))
+
+    traces = [raw.get_trace(name).data for name in raw.get_trace_names()]
+    lines = []
+    for point in range(raw.nPoints):
+        lines.append(f"{point}\t{value(traces[0], point)}\n")
+        lines.extend(f"\t{value(data, point)}\n" for data in traces[1:])
+        lines.append("\n")
+    Path(destination).write_bytes((header + "".join(lines)).encode(encoding))
+    log_file = Path(source).with_suffix(".log")
+    if log_file.exists():
+        shutil.copy(log_file, Path(destination).with_suffix(".log"))
+
+
+class RawReadTest(unittest.TestCase):
+
+    def assertSameWaves(self, expected, actual):
+        self.assertListEqual(expected.get_trace_names(), actual.get_trace_names())
+        self.assertEqual(expected.steps, actual.steps)
+        for step in range(len(expected.steps) if expected.steps else 1):
+            for name in expected.get_trace_names():
+                wave = actual.get_wave(name, step)
+                self.assertEqual(expected.get_wave(name, step).dtype, wave.dtype)
+                np.testing.assert_array_equal(expected.get_wave(name, step), wave)
+
+    def test_read(self):
+        """The single pass decoding returns the same data as the base class."""
+        for filename in RAW_FILES:
+            with self.subTest(filename=filename):
+                self.assertSameWaves(
+                    BaseRawRead(test_dir + filename, verbose=False),
+                    RawRead(test_dir + filename, verbose=False),
+                )
+
+    def test_read_strided_views(self):
+        """Traces of Normal files are views on the binary section, not copies."""
+        raw = RawRead(test_dir + "Batch_Test_1.raw")
+        wave = raw.get_wave("V(out)")
+        self.assertFalse(wave.flags.c_contiguous)
+        self.assertTrue(np.may_share_memory(wave, raw.get_wave("V(in)")))
+        contiguous = wave.copy()
+        self.assertTrue(contiguous.flags.c_contiguous)
+        np.testing.assert_array_equal(wave, contiguous)
+
+    def test_lazy_read(self):
+        """Lazy reading returns the same data as a complete read."""
+        for filename in RAW_FILES:
+            with self.subTest(filename=filename):
+                self.assertSameWaves(
+                    BaseRawRead(test_dir + filename, verbose=False),
+                    RawRead(test_dir + filename, lazy=True, verbose=False),
+                )
+
+    def test_lazy_read_only_touched_traces(self):
+        """Traces are only decoded when accessed."""
+        raw = RawRead(test_dir + "Batch_Test_1.raw", lazy=True)
+        traces = [raw.get_trace(name) for name in raw.get_trace_names()]
+        self.assertFalse(any(trace.is_loaded for trace in traces))
+        raw.get_wave("V(out)")
+        self.assertListEqual(
+            [trace.name for trace in traces if trace.is_loaded], ["V(out)"]
+        )
+
+    def test_lazy_read_fast_access(self):
+        """Lazy reading of FastAccess files, with a double axis and real traces."""
+        time = np.linspace(0, 1e-3, 1001)
+        writer = RawWrite(fastacces=True)
+        writer.add_trace(Trace("time", time))
+        writer.add_trace(Trace("V(a)", np.sin(time * 1e4), numerical_type="real"))
+        writer.add_trace(Trace("I(R1)", np.cos(time * 1e4), "current", "real"))
+        with tempfile.TemporaryDirectory() as tmp:
+            raw_file = Path(tmp) / "fast.raw"
+            writer.save(raw_file)
+            raw = RawRead(raw_file, lazy=True)
+            self.assertIn("fastaccess", raw.get_raw_property("Flags"))
+            self.assertSameWaves(BaseRawRead(raw_file), raw)
+            del raw
+
+    def test_read_selected_traces(self):
+        """Only the selected traces are read, and patterns can be used to select them."""
+        time = np.linspace(0, 1e-3, 1001)
+        for fast_access in (True, False):
+            writer = RawWrite(fastacces=fast_access)
+            writer.add_trace(Trace("time", time))
+            for i in range(10):
+                writer.add_trace(Trace(f"V(n{i})", np.sin(time * i), numerical_type="real"))
+                writer.add_trace(Trace(f"I(R{i})", np.cos(time * i), "current", "real"))
+            with self.subTest(fast_access=fast_access), tempfile.TemporaryDirectory() as tmp:
+                raw_file = Path(tmp) / "selected.raw"
+                writer.save(raw_file)
+                expected = BaseRawRead(raw_file, verbose=False)
+                raw = RawRead(raw_file, ["I(*)", "V(n3)"], verbose=False)
+                self.assertListEqual(
+                    raw.get_trace_names(),
+                    [
+                        name for name in expected.get_trace_names()
+                        if name in ("time", "V(n3)") or name.startswith("I(")
+                    ],
+                )
+                for name in raw.get_trace_names():
+                    wave = raw.get_wave(name)
+                    self.assertTrue(wave.flags.c_contiguous)
+                    np.testing.assert_array_equal(expected.get_wave(name), wave)
+                stats = raw.read_stats
+                self.assertEqual(stats.traces_read, 12)
+                self.assertEqual(stats.data_size, 1001 * (8 + 20 * 4))
+                if fast_access:
+                    self.assertEqual(stats.bytes_read, 1001 * (8 + 11 * 4))
+                else:
+                    self.assertEqual(stats.bytes_read, stats.data_size)
+        raw = RawRead(test_dir + "TRAN - STEP_1.raw", "V(o*)", verbose=False)
+        self.assertListEqual(raw.get_trace_names(), ["time", "V(out)"])
+        self.assertSameWaves(BaseRawRead(test_dir + "TRAN - STEP_1.raw", "V(out)"), raw)
+
+    def test_read_ascii(self):
+        """ASCII files, real and complex, are parsed in bulk with the same results."""
+        with tempfile.TemporaryDirectory() as tmp:
+            for filename in ("TRAN - STEP_1.raw", "AC_1.raw", "DC op point_1.raw"):
+                with self.subTest(filename=filename):
+                    ascii_file = Path(tmp) / filename
+                    write_ascii_raw(test_dir + filename, ascii_file)
+                    expected = BaseRawRead(ascii_file, verbose=False)
+                    self.assertSameWaves(expected, RawRead(ascii_file, verbose=False))
+                    # Blocks cut in the middle of the lines
+                    with mock.patch.object(raw_ascii, "ASCII_CHUNK_SIZE", 998):
+                        self.assertSameWaves(expected, RawRead(ascii_file, verbose=False))
+                    write_ascii_raw(test_dir + filename, ascii_file, "utf_16_le")
+                    raw = RawRead(ascii_file, verbose=False)
+                    self.assertEqual(raw.encoding, "utf_16_le")
+                    self.assertSameWaves(expected, raw)
+            ascii_file = Path(tmp) / "truncated.raw"
+            write_ascii_raw(test_dir + "AC_1.raw", ascii_file)
+            ascii_file.write_bytes(ascii_file.read_bytes()[:-200])
+            with self.assertRaises(RuntimeError):
+                RawRead(ascii_file, verbose=False)
+            # A corrupt value
+            ascii_file = Path(tmp) / "corrupt.raw"
+            write_ascii_raw(test_dir + "AC_1.raw", ascii_file)
+            contents = ascii_file.read_bytes()
+            values = contents.index(b"Values:")
+            position = contents.index(b"e", values + 20)
+            ascii_file.write_bytes(contents[:position] + b"x" + contents[position + 1 :])
+            with self.assertRaisesRegex(RuntimeError, "Invalid data"):
+                RawRead(ascii_file, verbose=False)
+            with self.assertRaisesRegex(RuntimeError, "Invalid data"):
+                raw_ascii.parse_ascii_values("0\t1.0\n1\t2.x0\n", 2, ["real"])
+
+    def test_read_traces(self):
+        """Reading several files in parallel stacks runs with the same length."""
+        files = [test_dir + "TRAN_1.raw", test_dir + "TRAN.raw"]
+        data = read_traces(files, ["time", "V(out)"], max_workers=2)
+        self.assertEqual(data["V(out)"].shape, (2, 23))
+        np.testing.assert_array_equal(
+            data["V(out)"][0], BaseRawRead(files[0]).get_wave("V(out)")
+        )
+        data = read_traces(test_dir + "Batch_Test_*.raw", "V(out)", use_processes=True)
+        self.assertIsInstance(data["V(out)"], list)
+        self.assertListEqual([len(wave) for wave in data["V(out)"]], [526, 85, 90])
+
+    def test_cache(self):
+        """The cache is written on the first read and reused while the file is unchanged."""
+        with tempfile.TemporaryDirectory() as tmp:
+            raw_file = Path(tmp) / "TRAN - STEP.raw"
+            for suffix in (".raw", ".log"):
+                data = Path(test_dir + "TRAN - STEP_1" + suffix).read_bytes()
+                raw_file.with_suffix(suffix).write_bytes(data)
+            cache = RawCache(Path(tmp) / "cache")
+            expected = RawRead(raw_file, cache=cache)
+            entry = cache.entry_path(raw_file)
+            self.assertTrue(entry.exists())
+            for lazy in (False, True):
+                cached = RawRead(raw_file, lazy=lazy, cache=cache)
+                self.assertSameWaves(expected, cached)
+            # A subset of the traces is read from the complete entry
+            cached = RawRead(raw_file, ["V(out)"], cache=cache)
+            self.assertListEqual(cached.get_trace_names(), ["time", "V(out)"])
+            # Changing the file invalidates the entry
+            os.utime(raw_file, ns=(0, 0))
+            self.assertIsNone(cache.load(raw_file))
+
+    def test_cache_merges_traces(self):
+        """Reading other traces adds them to the entry instead of replacing it."""
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = RawCache(tmp)
+            raw_file = test_dir + "TRAN - STEP_1.raw"
+            expected = RawRead(raw_file)
+            reads = [RawRead(raw_file, [name], cache=cache) for name in ("V(out)", "I(R1)") * 2]
+            self.assertListEqual(
+                [raw.read_stats.bytes_read > 0 for raw in reads], [True, True, False, False]
+            )
+            for raw, name in zip(reads, ("V(out)", "I(R1)") * 2, strict=True):
+                self.assertListEqual(raw.get_trace_names(), ["time", name])
+                np.testing.assert_array_equal(
+                    raw.get_trace(name).data, expected.get_trace(name).data
+                )
+            # The traces are stored in the order of the file
+            header, arrays = cache.load(raw_file)
+            arrays.close()
+            self.assertListEqual(
+                [trace["name"] for trace in header["traces"]], ["time", "V(out)", "I(R1)"]
+            )
+            # A complete read fills the entry, which then serves glob patterns
+            RawRead(raw_file, cache=cache)
+            raw = RawRead(raw_file, ["I(*)"], cache=cache)
+            self.assertEqual(raw.read_stats.bytes_read, 0)
+            self.assertSameWaves(expected, RawRead(raw_file, cache=cache))
+
+    def test_cache_eviction(self):
+        """The least recently used entries are deleted when the cache grows too big."""
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = RawCache(tmp, max_size=None)
+            for filename in ("TRAN_1.raw", "AC_1.raw"):
+                RawRead(test_dir + filename, cache=cache)
+            self.assertEqual(len(list(Path(tmp).iterdir())), 2)
+            # Reading the TRAN file makes it the most recently used
+            os.utime(cache.entry_path(test_dir + "TRAN_1.raw"), (0, 0))
+            os.utime(cache.entry_path(test_dir + "AC_1.raw"), (1, 1))
+            RawRead(test_dir + "TRAN_1.raw", cache=cache)
+            cache.max_size = cache.entry_path(test_dir + "TRAN_1.raw").stat().st_size
+            cache.evict(tmp)
+            self.assertIsNone(cache.load(test_dir + "AC_1.raw"))
+            self.assertIsNotNone(cache.load(test_dir + "TRAN_1.raw"))
+
+    def test_probe(self):
+        """The metadata is read from the header only."""
+        for filename in RAW_FILES:
+            with self.subTest(filename=filename):
+                info = probe(test_dir + filename)
+                raw = RawRead(test_dir + filename, verbose=False)
+                self.assertEqual(info.plot_name, raw.get_raw_property("Plotname"))
+                self.assertEqual(info.flags, raw.get_raw_property("Flags").split())
+                self.assertEqual(info.n_points, raw.nPoints)
+                self.assertEqual(info.n_variables, raw.nVariables)
+                self.assertListEqual(info.trace_names, raw.get_trace_names())
+                if raw.steps or "stepped" not in info.flags:
+                    self.assertEqual(info.n_steps, len(raw.steps) if raw.steps else 1)
+                self.assertEqual(
+                    info.data_offset, find_binary_start(test_dir + filename, raw.encoding)
+                )
+        # The log of stepped operating points doesn't list the steps, one per point
+        self.assertEqual(probe(test_dir + "DC op point - STEP_1.raw").n_steps, 10)
+        with tempfile.TemporaryDirectory() as tmp:
+            raw_file = Path(tmp) / "ascii.raw"
+            raw_file.write_text(
+                "Title: * ascii\nPlotname: Transient Analysis\nFlags: real forward\n"
+                "No. Variables: 2\nNo. Points: 2\nVariables:\n\t0\ttime\ttime\n"
+                "\t1\tV(out)\tvoltage\nValues:\n0\t0.0\n\t1.0\n1\t1e-3\n\t2.0\n"
+            )
+            info = probe(raw_file)
+            self.assertEqual(info.raw_type, "Values:")
+            self.assertListEqual(info.trace_names, ["time", "V(out)"])
+            self.assertEqual(info.n_steps, 1)
+
+    def test_step_index(self):
+        """The step offsets are an array and each step is a view on the trace data."""
+        raw = RawRead(test_dir + "TRAN - STEP_1.raw")
+        expected = BaseRawRead(test_dir + "TRAN - STEP_1.raw", verbose=False)
+        self.assertListEqual(raw.axis.step_offsets.tolist(), expected.axis.step_offsets)
+        wave = raw.get_wave("V(out)", 2)
+        self.assertTrue(np.may_share_memory(wave, raw.get_trace("V(out)").data))
+        matrix = raw.get_wave_matrix("V(out)")
+        self.assertEqual(matrix.shape[0], len(raw.steps))
+        for step in range(len(raw.steps)):
+            length = raw.get_len(step)
+            np.testing.assert_array_equal(matrix[step, :length], raw.get_wave("V(out)", step))
+            self.assertTrue(np.isnan(matrix[step, length:]).all())
+        np.testing.assert_array_equal(raw.get_wave_matrix("time")[0, :raw.get_len(0)],
+                                      raw.get_axis(0))
+        # Without steps, the matrix has a single row
+        raw = RawRead(test_dir + "TRAN_1.raw")
+        np.testing.assert_array_equal(raw.get_wave_matrix("V(out)")[0], raw.get_wave("V(out)"))
+
+    def test_step_index_cache(self):
+        """The step offsets are kept in the cache, so the axis isn't read to find them."""
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = RawCache(tmp)
+            expected = RawRead(test_dir + "AC - STEP_1.raw", cache=cache)
+            raw = RawRead(test_dir + "AC - STEP_1.raw", lazy=True, cache=cache)
+            self.assertFalse(raw.axis.is_loaded)
+            np.testing.assert_array_equal(raw.axis.step_offsets, expected.axis.step_offsets)
+            self.assertSameWaves(expected, raw)
+
+    def test_tail_read(self):
+        """Points are returned as they are appended, incomplete points are left for later."""
+        source = Path(test_dir + "TRAN - STEP_1.raw")
+        expected = RawRead(source)
+        content = source.read_bytes()
+        binary_start = find_binary_start(source, expected.encoding)
+        with tempfile.TemporaryDirectory() as tmp:
+            raw_file = Path(tmp) / "tail.raw"
+            reader = RawTailReader(raw_file, "V(out)")
+            self.assertIsNone(reader.read_new())  # No file yet
+            raw_file.write_bytes(content[: binary_start - 10])
+            self.assertIsNone(reader.read_new())  # Incomplete header
+            chunks = []
+            for end in (binary_start + 1001, binary_start + 2001, len(content)):
+                raw_file.write_bytes(content[:end])
+                chunks.append(reader.read_new())
+            self.assertIsNone(reader.read_new())
+        self.assertEqual(reader.points, expected.nPoints)
+        self.assertListEqual(list(chunks[0]), ["time", "V(out)"])
+        for name in ("time", "V(out)"):
+            np.testing.assert_array_equal(
+                np.concatenate([chunk[name] for chunk in chunks]),
+                np.abs(expected.get_trace(name).data) if name == "time"
+                else expected.get_trace(name).data,
+            )
+
+    def test_tail_read_chunks(self):
+        """The chunks iterator stops when the writing ends."""
+        with tempfile.TemporaryDirectory() as tmp:
+            raw_file = Path(tmp) / "TRAN_1.raw"
+            raw_file.write_bytes(Path(test_dir + "TRAN_1.raw").read_bytes())
+            reader = RawTailReader(raw_file)
+            chunks = list(reader.chunks(stop=lambda: True))
+            self.assertEqual(len(chunks), 1)
+            self.assertEqual(reader.points, RawRead(raw_file).nPoints)
+            chunks = list(reader.chunks(idle_timeout=0, poll_interval=0))
+            self.assertListEqual(chunks, [])
+
+    def test_tail_read_while_writing(self):
+        """A file still open by RawStreamWrite has 0 points in its header."""
+        with tempfile.TemporaryDirectory() as tmp:
+            raw_file = Path(tmp) / "stream.raw"
+            reader = RawTailReader(raw_file, "V(out)")
+            time_axis = np.linspace(0, 1e-3, 200)
+            with RawStreamWrite(raw_file) as writer:
+                writer.add_trace("time")
+                writer.add_trace("V(out)")
+                writer.add_trace("I(R1)", "current")
+                writer.append(time_axis[:120], np.sin(time_axis[:120]), time_axis[:120])
+                writer.flush()
+                first = reader.read_new()
+                writer.append(time_axis[120:], np.sin(time_axis[120:]), time_axis[120:])
+                writer.flush()
+                second = reader.read_new()
+            self.assertIsNone(reader.read_new())
+        self.assertEqual(reader.header.raw_params["Filename"], raw_file)
+        self.assertListEqual(list(first), ["time", "V(out)"])
+        self.assertEqual((len(first["time"]), len(second["time"])), (120, 80))
+        np.testing.assert_allclose(np.concatenate([first["time"], second["time"]]), time_axis)
+        np.testing.assert_allclose(
+            np.concatenate([first["V(out)"], second["V(out)"]]), np.sin(time_axis), rtol=1e-6
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+# -------------------------------------------------------------------------------
+#    ____        _   _____ ____        _
+#   |  _ \ _   _| | |_   _/ ___| _ __ (_) ___ ___
+#   | |_) | | | | |   | | \___ \| '_ \| |/ __/ _ \
+#   |  __/| |_| | |___| |  ___) | |_) | | (_|  __/
+#   |_|    \__, |_____|_| |____/| .__/|_|\___\___|
+#          |___/                |_|
+#
+# Name:        test_raw_reduce.py
+# Purpose:     Tests of the waveform reducers computed while decoding RAW files
+#
+# Licence:     refer to the LICENSE file
+# -------------------------------------------------------------------------------
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+from kuPyLTSpice.raw.raw_expr import ref
+from kuPyLTSpice.raw.raw_read import RawRead
+from kuPyLTSpice.raw.raw_reduce import (
+    RMS,
+    Average,
+    Crossing,
+    FinalValue,
+    Integral,
+    Max,
+    Settling,
+    reduce_raw,
+)
+from kuPyLTSpice.raw.raw_write import RawStreamWrite
+
+sys.path.append(
+    os.path.abspath(os.path.dirname(os.path.abspath(__file__)) + "/../")
+)  # add project root to lib search path
+
+test_dir = (
+    "../examples/testfiles/"
+    if os.path.abspath(os.curdir).endswith("unittests")
+    else "./examples/testfiles/"
+)
+
+TRAN_FILE = test_dir + "TRAN - STEP_1.raw"
+
+
+def write_wave(raw_file, time, *waves):
+    """Writes a transient RAW file, each wave being a list of steps."""
+    with RawStreamWrite(raw_file) as writer:
+        writer.add_trace("time")
+        writer.add_trace("V(a)")
+        writer.flag_stepped = len(waves) > 1
+        for wave in waves:
+            writer.append(time, wave)
+
+
+class RawReduceTest(unittest.TestCase):
+
+    def test_statistics(self):
+        """The reducers match the values computed on the complete waveforms, whatever
+        the size of the chunks."""
+        raw = RawRead(TRAN_FILE)
+        reducers = [
+            RMS("V(out)"),
+            Average("V(out)", start=1e-3, stop=3e-3),
+            Integral("V(out)"),
+            Max(ref("V(out)") * ref("I(R1)"), name="Pmax"),
+            FinalValue("V(out)"),
+        ]
+        for chunk_points in (5, 1000):
+            table = reduce_raw(TRAN_FILE, reducers, chunk_points)
+            self.assertListEqual(
+                list(table),
+                ["step", "vin", "r1", "rms(V(out))", "mean(V(out))", "integral(V(out))",
+                 "Pmax", "final(V(out))"],
+            )
+            np.testing.assert_array_equal(table["r1"], [1000, 1000, 10000, 10000])
+            for step in range(4):
+                time = raw.get_axis(step)
+                vout = raw.get_wave("V(out)", step)
+                window = (time >= 1e-3) & (time <= 3e-3)
+                self.assertAlmostEqual(
+                    table["rms(V(out))"][step],
+                    np.sqrt(np.trapezoid(vout**2, time) / (time[-1] - time[0])),
+                )
+                self.assertAlmostEqual(
+                    table["mean(V(out))"][step],
+                    np.trapezoid(vout[window], time[window])
+                    / (time[window][-1] - time[window][0]),
+                )
+                self.assertAlmostEqual(table["integral(V(out))"][step], np.trapezoid(vout, time))
+                self.assertAlmostEqual(
+                    table["Pmax"][step],
+                    np.max(vout * raw.get_wave("I(R1)", step)),
+                )
+                self.assertEqual(table["final(V(out))"][step], vout[-1])
+
+    def test_crossing_and_settling(self):
+        time = np.linspace(0, 10, 101)
+        ringing = 1 - np.exp(-time / 2) * np.cos(2 * time)
+        with tempfile.TemporaryDirectory() as tmp:
+            raw_file = Path(tmp) / "ringing.raw"
+            write_wave(raw_file, time, ringing, 2 * ringing)
+            for chunk_points in (7, 1000):
+                table = reduce_raw(
+                    raw_file,
+                    [
+                        Crossing("V(a)", 1.0),
+                        Crossing("V(a)", 1.0, edge="fall", name="fall"),
+                        Crossing("V(a)", 1.0, edge="both", occurrence=-1, name="last"),
+                        Settling("V(a)", 1.0, 0.05),
+                        Crossing("V(a)", 5.0, name="never"),
+                    ],
+                    chunk_points,
+                )
+                np.testing.assert_array_equal(table["step"], [0, 1])
+                # 1 - exp(-t/2)·cos(2t) rises through 1 at t = pi/4
+                self.assertAlmostEqual(table["cross(V(a))"][0], np.pi / 4, places=2)
+                self.assertAlmostEqual(table["fall"][0], 3 * np.pi / 4, places=2)
+                self.assertLess(table["cross(V(a))"][1], table["cross(V(a))"][0])
+                outside = np.flatnonzero(np.abs(ringing - 1) > 0.05)[-1]
+                self.assertEqual(table["settle(V(a))"][0], time[outside + 1])
+                self.assertTrue(np.isnan(table["settle(V(a))"][1]))  # Settles at 2 V
+                self.assertGreater(table["last"][0], table["fall"][0])
+                self.assertTrue(np.all(np.isnan(table["never"])))
+
+    def test_raw_read(self):
+        raw = RawRead(TRAN_FILE, reducers=[RMS("V(out)"), Max("V(out)")])
+        expected = reduce_raw(TRAN_FILE, [RMS("V(out)"), Max("V(out)")])
+        self.assertListEqual(list(raw.reductions), list(expected))
+        np.testing.assert_array_equal(raw.reductions["max(V(out))"], expected["max(V(out))"])
+        self.assertIsNone(raw.read_stats)  # The waveforms were not kept
+        with self.assertRaises(ValueError):
+            reduce_raw(test_dir + "DC op point - STEP_1.raw", [Integral("V(out)")])
+        with self.assertRaises(ValueError):
+            Crossing("V(out)", 0.5, edge="up")
+
+
+if __name__ == "__main__":
+    unittest.main()
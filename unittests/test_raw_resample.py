@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+# -------------------------------------------------------------------------------
+#    ____        _   _____ ____        _
+#   |  _ \ _   _| | |_   _/ ___| _ __ (_) ___ ___
+#   | |_) | | | | |   | | \___ \| '_ \| |/ __/ _ \
+#   |  __/| |_| | |___| |  ___) | |_) | | (_|  __/
+#   |_|    \__, |_____|_| |____/| .__/|_|\___\___|
+#          |___/                |_|
+#
+# Name:        test_raw_resample.py
+# Purpose:     Tests of the resampling of traces onto a common axis
+#
+# Licence:     refer to the LICENSE file
+# -------------------------------------------------------------------------------
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+from kuPyLTSpice.raw.raw_read import RawRead
+from kuPyLTSpice.raw.raw_resample import Resampler, resample_raw
+from kuPyLTSpice.raw.raw_write import RawStreamWrite
+
+sys.path.append(
+    os.path.abspath(os.path.dirname(os.path.abspath(__file__)) + "/../")
+)  # add project root to lib search path
+
+test_dir = (
+    "../examples/testfiles/"
+    if os.path.abspath(os.curdir).endswith("unittests")
+    else "./examples/testfiles/"
+)
+
+
+class RawResampleTest(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(1)
+        self.axes = [
+            np.linspace(0, 1, 21),
+            np.concatenate([[0, 1], np.sort(rng.uniform(0, 1, 40))])[::-1],  # Unsorted
+            np.array([0.5]),
+        ]
+        self.grid = np.linspace(-0.2, 1.2, 301)
+
+    def test_linear_and_zoh(self):
+        values = [np.stack([np.sin(3 * axis), axis**2]) for axis in self.axes]
+        linear = Resampler(self.axes, values)(self.grid)
+        zoh = Resampler(self.axes, values, "zoh")(self.grid)
+        self.assertEqual(linear.shape, (2, 3, 301))
+        for series, (axis, data) in enumerate(zip(self.axes, values, strict=True)):
+            order = np.argsort(axis)
+            axis, data = axis[order], data[:, order]
+            last = np.clip(np.searchsorted(axis, self.grid, side="right") - 1, 0, len(axis) - 1)
+            for trace in range(2):
+                np.testing.assert_allclose(
+                    linear[trace, series], np.interp(self.grid, axis, data[trace])
+                )
+                np.testing.assert_array_equal(zoh[trace, series], data[trace, last])
+
+    def test_cubic(self):
+        """Away from the ends of the series, the slopes of numpy.gradient are exact for
+        parabolas, and so is the result."""
+        values = [3 * axis**2 - axis + 1j * axis for axis in self.axes[:2]]
+        start = max(np.sort(axis)[1] for axis in self.axes[:2])
+        stop = min(np.sort(axis)[-2] for axis in self.axes[:2])
+        grid = np.linspace(start, stop, 101)
+        result = Resampler(self.axes[:2], values, "cubic")(grid)
+        self.assertTrue(np.iscomplexobj(result))
+        np.testing.assert_allclose(result[0], np.tile(3 * grid**2 - grid + 1j * grid, (2, 1)))
+
+    def test_fill_value(self):
+        values = [axis + 1 for axis in self.axes]
+        result = Resampler(self.axes, values, fill_value=np.nan)(self.grid)[0]
+        inside = (self.grid >= 0) & (self.grid <= 1)
+        self.assertTrue(np.all(np.isnan(result[:2, ~inside])))
+        np.testing.assert_allclose(result[:2, inside], np.tile(self.grid[inside] + 1, (2, 1)))
+        self.assertTrue(np.all(np.isnan(result[2, self.grid != 0.5])))
+        with self.assertRaises(ValueError):
+            Resampler(self.axes, values)(self.grid[::-1])
+
+    def test_resample_raw(self):
+        """Each step of each file is interpolated on the common grid."""
+        files = [test_dir + "TRAN - STEP_1.raw", test_dir + "TRAN_1.raw"]
+        data = resample_raw(files, "V(o*)", points=200)
+        self.assertEqual(data.axis_name, "time")
+        self.assertListEqual(
+            data.series, [(Path(files[0]), step) for step in range(4)] + [(Path(files[1]), 0)]
+        )
+        self.assertEqual(data.traces["V(out)"].shape, (5, 200))
+        raw = RawRead(files[0])
+        self.assertAlmostEqual(data.grid[-1], raw.get_axis(0)[-1])
+        for step in range(4):
+            np.testing.assert_allclose(
+                data.traces["V(out)"][step],
+                np.interp(data.grid, raw.get_axis(step), raw.get_wave("V(out)", step)),
+                rtol=1e-6,
+            )
+
+    def test_writer(self):
+        ac_file = test_dir + "AC - STEP_1.raw"
+        data = resample_raw(ac_file, "V(out)", points=50)
+        with tempfile.TemporaryDirectory() as tmp:
+            with RawStreamWrite(Path(tmp) / "aligned.raw") as writer:
+                resample_raw(ac_file, "V(out)", points=50, writer=writer)
+            raw = RawRead(Path(tmp) / "aligned.raw")
+            self.assertIn("log", raw.raw_params["Flags"])
+            np.testing.assert_allclose(raw.get_axis().real, data.grid)
+            for step in range(len(data.series)):
+                np.testing.assert_allclose(
+                    raw.get_trace(f"V(out)@AC - STEP_1:{step}").data,
+                    data.traces["V(out)"][step],
+                )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+# -------------------------------------------------------------------------------
+#    ____        _   _____ ____        _
+#   |  _ \ _   _| | |_   _/ ___| _ __ (_) ___ ___
+#   | |_) | | | | |   | | \___ \| '_ \| |/ __/ _ \
+#   |  __/| |_| | |___| |  ___) | |_) | | (_|  __/
+#   |_|    \__, |_____|_| |____/| .__/|_|\___\___|
+#          |___/                |_|
+#
+# Name:        test_raw_write.py
+# Purpose:     Tests of the RAW file writing extensions
+#
+# Licence:     refer to the LICENSE file
+# -------------------------------------------------------------------------------
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+from kupicelib.raw.raw_write import RawWrite as ReferenceRawWrite
+from kupicelib.raw.raw_write import Trace as ReferenceTrace
+
+from kuPyLTSpice.raw.raw_read import RawRead
+from kuPyLTSpice.raw.raw_write import RawStreamWrite, RawWrite, Trace
+
+sys.path.append(
+    os.path.abspath(os.path.dirname(os.path.abspath(__file__)) + "/../")
+)  # add project root to lib search path
+
+test_dir = (
+    "../examples/testfiles/"
+    if os.path.abspath(os.curdir).endswith("unittests")
+    else "./examples/testfiles/"
+)
+
+
+class RawWriteTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def test_write_numpy(self):
+        """Numpy arrays are written unchanged and the file matches the kupicelib writer."""
+        time = np.linspace(0, 1e-3, 1000)
+        sine = np.sin(time * 1e4)
+        trace = Trace("V(out)", sine)
+        self.assertEqual(trace.numerical_type, "real")
+        self.assertIsInstance(trace.data, np.ndarray)
+        for fast_access in (False, True):
+            raw_file = Path(self.tmp.name) / f"numpy_{fast_access}.raw"
+            writer = RawWrite(fastacces=fast_access)
+            writer.add_trace(Trace("time", time))
+            writer.add_trace(Trace("V(out)", sine))
+            writer.save(raw_file)
+            reference_file = Path(self.tmp.name) / f"reference_{fast_access}.raw"
+            writer = ReferenceRawWrite(fastacces=fast_access)
+            writer.add_trace(ReferenceTrace("time", time.tolist()))
+            writer.add_trace(ReferenceTrace("V(out)", sine.tolist(), numerical_type="real"))
+            writer.save(reference_file)
+            # Only the date may differ
+            binary = raw_file.read_bytes().split("Offset".encode("utf_16_le"))[1]
+            reference = reference_file.read_bytes().split("Offset".encode("utf_16_le"))[1]
+            self.assertEqual(binary, reference)
+            raw = RawRead(raw_file)
+            np.testing.assert_array_equal(raw.get_axis(), time)
+            np.testing.assert_array_equal(raw.get_wave("V(out)"), sine.astype(np.float32))
+
+    def test_write_numpy_complex(self):
+        """Complex data is always written in the Normal layout, without the fastaccess flag."""
+        reference = RawRead(test_dir + "AC_1.raw")
+        raw_file = Path(self.tmp.name) / "ac.raw"
+        writer = RawWrite(fastacces=True)
+        writer.add_trace(Trace("frequency", reference.get_axis(), numerical_type="complex"))
+        writer.add_trace(Trace("V(out)", reference.get_wave("V(out)")))
+        writer.save(raw_file)
+        raw = RawRead(raw_file)
+        self.assertNotIn("fastaccess", raw.get_raw_property("Flags"))
+        np.testing.assert_array_equal(raw.get_wave("V(out)"), reference.get_wave("V(out)"))
+
+    def test_stream_write(self):
+        """Points appended in chunks are read back with the right point count."""
+        time = np.linspace(0, 1e-3, 25_000)
+        raw_file = Path(self.tmp.name) / "stream.raw"
+        with RawStreamWrite(raw_file) as writer:
+            writer.add_trace("time")
+            writer.add_trace("V(out)")
+            writer.add_trace("I(R1)", "current")
+            for start in range(0, len(time), 10_000):
+                chunk = time[start : start + 10_000]
+                writer.append(chunk, np.sin(chunk * 1e4), np.cos(chunk * 1e4))
+        raw = RawRead(raw_file)
+        self.assertEqual(raw.nPoints, len(time))
+        self.assertEqual(raw.get_raw_property("Plotname"), "Transient Analysis")
+        np.testing.assert_array_equal(raw.get_axis(), time)
+        np.testing.assert_array_equal(
+            raw.get_wave("I(R1)"), np.cos(time * 1e4).astype(np.float32)
+        )
+
+    def test_stream_write_ac(self):
+        """Complex data is written for .AC plots."""
+        reference = RawRead(test_dir + "AC_1.raw")
+        raw_file = Path(self.tmp.name) / "ac.raw"
+        with RawStreamWrite(raw_file) as writer:
+            writer.add_trace("frequency", numerical_type="complex")
+            writer.add_trace("V(out)")
+            writer.append(reference.get_axis(), reference.get_wave("V(out)"))
+        raw = RawRead(raw_file)
+        self.assertEqual(raw.get_raw_property("Plotname"), "AC Analysis")
+        np.testing.assert_array_equal(raw.get_wave("V(out)"), reference.get_wave("V(out)"))
+
+    def test_stream_write_errors(self):
+        raw_file = Path(self.tmp.name) / "errors.raw"
+        with RawStreamWrite(raw_file) as writer:
+            writer.add_trace("time")
+            writer.add_trace("V(out)")
+            with self.assertRaises(ValueError):
+                writer.append(np.zeros(3))
+            with self.assertRaises(ValueError):
+                writer.append(np.zeros(3), np.zeros(2))
+            writer.append(np.arange(3.0), np.zeros(3))
+            with self.assertRaises(RuntimeError):
+                writer.add_trace("V(in)")
+        self.assertEqual(RawRead(raw_file).nPoints, 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
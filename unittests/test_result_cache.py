@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+# -------------------------------------------------------------------------------
+#    ____        _   _____ ____        _
+#   |  _ \ _   _| | |_   _/ ___| _ __ (_) ___ ___
+#   | |_) | | | | |   | | \___ \| '_ \| |/ __/ _ \
+#   |  __/| |_| | |___| |  ___) | |_) | | (_|  __/
+#   |_|    \__, |_____|_| |____/| .__/|_|\___\___|
+#          |___/                |_|
+#
+# Name:        test_result_cache.py
+# Purpose:     Tests of the cache of the simulation results
+#
+# Licence:     refer to the LICENSE file
+# -------------------------------------------------------------------------------
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+from kuPyLTSpice.raw.raw_read import RawRead
+from kuPyLTSpice.sim.fake_simulator import FakeSimulator
+from kuPyLTSpice.sim.result_cache import ResultCache
+from kuPyLTSpice.sim.sim_runner import SimRunner
+
+sys.path.append(
+    os.path.abspath(os.path.dirname(os.path.abspath(__file__)) + "/../")
+)  # add project root to lib search path
+
+test_dir = (
+    "../examples/testfiles/"
+    if os.path.abspath(os.curdir).endswith("unittests")
+    else "./examples/testfiles/"
+)
+
+
+class ResultCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.folder = Path(self.tmp.name)
+        self.model = self.folder / "models" / "diode.lib"
+        self.model.parent.mkdir()
+        self.model.write_text(".model D1 D(Is=1n)\n")
+        self.netlist = self.folder / "circuit.net"
+        self.netlist.write_text(f'* Circuit\n.include "{self.model}"\n.tran 1m\n.end\n')
+
+    def fake_simulator(self, **kwargs):
+        return FakeSimulator.create(test_dir + "TRAN_1.raw", test_dir + "TRAN_1.log", **kwargs)
+
+    def run_all(self, runner, count=1, **kwargs):
+        tasks = [runner.run(self.netlist, **kwargs) for _ in range(count)]
+        runner.wait_completion(timeout=30)
+        return tasks
+
+    def test_cached_runs(self):
+        simulator = self.fake_simulator(latency=0.2)
+        cache = ResultCache(self.folder / "cache")
+        runner = SimRunner(simulator=simulator, output_folder=f"{self.tmp.name}/runs", cache=cache)
+        first, _ = self.run_all(runner, 2)
+        # The second run, started while the first one is running, isn't cached yet
+        self.assertEqual(len(simulator.records), 2)
+        third, = self.run_all(runner)
+        self.assertEqual(len(simulator.records), 2)
+        self.assertEqual(third.retcode, 0)
+        self.assertEqual(third.raw_file.parent, first.raw_file.parent)
+        self.assertEqual(third.raw_file.read_bytes(), first.raw_file.read_bytes())
+        self.assertEqual(RawRead(third.raw_file).get_trace_names()[0], "time")
+        self.assertEqual((cache.stats.hits, cache.stats.stores), (1, 1))
+        self.assertEqual(len(cache), 1)
+        # Changing the included model or the switches runs the simulation again
+        self.model.write_text(".model D1 D(Is=2n)\n")
+        self.run_all(runner)
+        self.run_all(runner, switches=["-ascii"])
+        self.assertEqual(len(simulator.records), 4)
+        self.assertEqual(len(cache), 3)
+        self.assertEqual(cache.stats.misses, 4)
+        self.assertAlmostEqual(cache.stats.hit_rate, 0.2)
+        # The failed simulations aren't cached
+        failing = SimRunner(
+            simulator=self.fake_simulator(failure_rate=1.0),
+            output_folder=f"{self.tmp.name}/runs",
+            cache=ResultCache(self.folder / "cache2"),
+        )
+        self.run_all(failing, 2)
+        self.assertEqual(failing.failSim, 2)
+        self.assertEqual(len(failing.result_cache), 0)
+
+    def test_shared_folder(self):
+        """A cache folder shared by two runners, as two machines would do."""
+        folder = self.folder / "shared"
+        first = SimRunner(
+            simulator=self.fake_simulator(), output_folder=f"{self.tmp.name}/a", cache=folder
+        )
+        self.run_all(first)
+        simulator = self.fake_simulator()
+        second = SimRunner(simulator=simulator, output_folder=f"{self.tmp.name}/b", cache=folder)
+        task, = self.run_all(second)
+        self.assertEqual(simulator.records, [])
+        self.assertEqual(task.retcode, 0)
+        self.assertTrue(task.raw_file.exists())
+        self.assertEqual(second.result_cache.stats.hits, 1)
+        self.assertFalse(any((folder / "tmp").iterdir()))
+
+    def test_operating_point(self):
+        """The .op.raw file of the transient analyses is restored on a hit."""
+        cache = ResultCache(self.folder / "cache")
+        run = self.folder / "run"
+        run.mkdir()
+        for name in ("TRAN_1.raw", "TRAN_1.log"):
+            shutil.copy(test_dir + name, run / name)
+        shutil.copy(test_dir + "TRAN.op.raw", run / "TRAN_1.op.raw")
+        cache.store("e0", run / "TRAN_1.raw", run / "TRAN_1.log")
+        (run / "TRAN_1.op.raw").unlink()
+        cache.store("a0", run / "TRAN_1.raw", run / "TRAN_1.log")  # Without .op.raw
+        self.assertTrue(cache.fetch("e0", self.folder / "e.raw", self.folder / "e.log"))
+        self.assertEqual(
+            (self.folder / "e.op.raw").read_bytes(), Path(test_dir + "TRAN.op.raw").read_bytes()
+        )
+        self.assertEqual(RawRead(self.folder / "e.op.raw").get_trace_names()[0], "V(in)")
+        self.assertTrue(cache.fetch("a0", self.folder / "a.raw", self.folder / "a.log"))
+        self.assertFalse((self.folder / "a.op.raw").exists())
+
+    def test_least_recently_used(self):
+        entry_size = sum(
+            Path(test_dir + name).stat().st_size for name in ("TRAN_1.raw", "TRAN_1.log")
+        )
+        cache = ResultCache(self.folder / "cache", max_size=int(3.5 * entry_size))
+        raw = Path(test_dir + "TRAN_1.raw")
+        log = Path(test_dir + "TRAN_1.log")
+        for key in ("a0", "b0", "c0"):
+            cache.store(key, raw, log)
+            time.sleep(0.05)  # Distinct access times
+        # Reading the first result makes the second one the least recently used
+        self.assertTrue(cache.fetch("a0", self.folder / "a.raw", self.folder / "a.log"))
+        cache.store("d0", raw, log)
+        self.assertEqual(cache.stats.evictions, 1)
+        self.assertFalse(cache.fetch("b0", self.folder / "b.raw", self.folder / "b.log"))
+        self.assertTrue(cache.fetch("d0", self.folder / "d.raw", self.folder / "d.log"))
+        self.assertLessEqual(cache.size, cache.max_size)
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
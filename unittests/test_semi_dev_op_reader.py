@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+# -------------------------------------------------------------------------------
+#    ____        _   _____ ____        _
+#   |  _ \ _   _| | |_   _/ ___| _ __ (_) ___ ___
+#   | |_) | | | | |   | | \___ \| '_ \| |/ __/ _ \
+#   |  __/| |_| | |___| |  ___) | |_) | | (_|  __/
+#   |_|    \__, |_____|_| |____/| .__/|_|\___\___|
+#          |___/                |_|
+#
+# Name:        test_semi_dev_op_reader.py
+# Purpose:     Tests of the semiconductor operating point tables
+#
+# Licence:     refer to the LICENSE file
+# -------------------------------------------------------------------------------
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+from kupicelib.log.semi_dev_op_reader import opLogReader as base_op_log_reader
+
+from kuPyLTSpice.log.semi_dev_op_reader import SemiDevOpReader, opLogReader
+
+sys.path.append(
+    os.path.abspath(os.path.dirname(os.path.abspath(__file__)) + "/../")
+)  # add project root to lib search path
+
+OP_SECTION = """
+Semiconductor Device Operating Points:
+
+                                --- Diodes ---
+Name:         d:1         d:2
+Model:        dmod        dpar
+Id:           3.45e-19    {id}
+Vd:           3.27e-07    n/a
+
+                        --- MOSFET Transistors ---
+Name:         m1          m2          m3
+Model:        nmos        nmos        pmos
+Id:           1.00e-04    2.00e-05    -1.00e-04
+Gm:           1.00e-03    6.00e-04    {gm}
+Gmb           2.00e-04    1.00e-04    1.00e-04
+Name:         m4
+Model:        nmos
+Id:           1.00e-06
+Gm:           3.00e-05
+Gmb           4.00e-06
+"""
+
+
+def write_op_log(log_file, steps):
+    """Writes a log with the operating points of each step."""
+    with open(log_file, "w") as fout:
+        fout.write("Circuit: * op.asc\n\n")
+        for step in range(steps):
+            fout.write(f".step vdd={step + 1}\n")
+        for step in range(steps):
+            fout.write(OP_SECTION.format(id=1.11e-13 * (step + 1), gm=2.00e-03 * (step + 1)))
+        fout.write("\nTotal elapsed time: 0.1 seconds.\n")
+
+
+class SemiDevOpReaderTest(unittest.TestCase):
+
+    def test_tables(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            write_op_log(f"{tmp}/op.log", 3)
+            op = SemiDevOpReader(f"{tmp}/op.log")
+        self.assertEqual(op.step_count, 3)
+        self.assertIn("mosfet transistors", op)
+        mos = op["MOSFET Transistors"]
+        self.assertListEqual(mos.devices, ["m1", "m2", "m3", "m4"])
+        self.assertListEqual(mos.parameters, ["Model", "Id", "Gm", "Gmb"])
+        self.assertEqual(mos.values.shape, (3, 4, 4))
+        np.testing.assert_allclose(mos["gm"][:, 2], [2e-3, 4e-3, 6e-3])
+        self.assertListEqual(mos.models(), ["nmos", "nmos", "pmos", "nmos"])
+        self.assertEqual(mos.get("m4", "Gmb", step=0), 4e-6)
+        # gm/Id of the devices, in the last step and in the first one
+        gm_id = mos["Gm"] / np.abs(mos["Id"])
+        self.assertListEqual(mos.devices_where(gm_id > 25), ["m2", "m3", "m4"])
+        self.assertListEqual(mos.devices_where(gm_id[0] > 25), ["m2", "m4"])
+        diodes = op["diodes"]
+        self.assertEqual(diodes.get("d:2", "Vd"), "n/a")
+        self.assertTrue(np.isnan(diodes["Vd"][0, 1]))
+        self.assertEqual(diodes.get("d:2", "Id", step=1), 2.22e-13)
+        with self.assertRaises(KeyError):
+            mos["Vth"]
+
+    def test_same_as_kupicelib(self):
+        """The dictionaries are the ones of kupicelib, which gives the last step."""
+        with tempfile.TemporaryDirectory() as tmp:
+            for steps in (1, 3):
+                write_op_log(f"{tmp}/op.log", steps)
+                self.assertDictEqual(
+                    opLogReader(f"{tmp}/op.log"), base_op_log_reader(f"{tmp}/op.log")
+                )
+            Path(f"{tmp}/empty.log").write_text("Circuit: * op.asc\n")
+            self.assertDictEqual(opLogReader(f"{tmp}/empty.log"), {})
+            op = SemiDevOpReader(f"{tmp}/op.log")
+            self.assertEqual(op.to_dict(0)["mosfet transistors"]["m3"]["Gm"], 2e-3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,269 @@
+#!/usr/bin/env python
+# -------------------------------------------------------------------------------
+#    ____        _   _____ ____        _
+#   |  _ \ _   _| | |_   _/ ___| _ __ (_) ___ ___
+#   | |_) | | | | |   | | \___ \| '_ \| |/ __/ _ \
+#   |  __/| |_| | |___| |  ___) | |_) | | (_|  __/
+#   |_|    \__, |_____|_| |____/| .__/|_|\___\___|
+#          |___/                |_|
+#
+# Name:        test_sim_runner.py
+# Purpose:     Tests of the SimRunner extensions
+#
+# Licence:     refer to the LICENSE file
+# -------------------------------------------------------------------------------
+import contextlib
+import os
+import subprocess
+import sys
+import tempfile
+import textwrap
+import threading
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from kuPyLTSpice.raw.raw_read import RawRead, find_binary_start
+from kuPyLTSpice.sim.fake_simulator import STOPPED_RETCODE, FakeSimulator
+from kuPyLTSpice.sim.ltspice_simulator import LTspiceCustom
+from kuPyLTSpice.sim.parallelism import ParallelismController, SystemLoad
+from kuPyLTSpice.sim.sim_runner import SimRunner
+
+sys.path.append(
+    os.path.abspath(os.path.dirname(os.path.abspath(__file__)) + "/../")
+)  # add project root to lib search path
+
+test_dir = (
+    "../examples/testfiles/"
+    if os.path.abspath(os.curdir).endswith("unittests")
+    else "./examples/testfiles/"
+)
+
+# Writes the points of a RAW file slowly, as LTspice does on long simulations
+SLOW_WRITER = """
+import sys, time
+from pathlib import Path
+
+source, binary_start, block_size = sys.argv[1], int(sys.argv[2]), int(sys.argv[3])
+netlist = Path(sys.argv[-1])
+content = Path(source).read_bytes()
+with open(netlist.with_suffix(".raw"), "wb") as raw_file:
+    raw_file.write(content[:binary_start])
+    for _ in range(20):
+        for start in range(binary_start, len(content), block_size):
+            raw_file.write(content[start:start + block_size])
+            raw_file.flush()
+            time.sleep(0.01)
+netlist.with_suffix(".log").write_text("Total elapsed time: 1 seconds.")
+"""
+
+
+class SimRunnerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.netlist = Path(self.tmp.name) / "slow.net"
+        self.netlist.write_text("* Slow circuit\n.tran 1\n.end\n")
+
+    def slow_simulator(self):
+        source = Path(test_dir + "TRAN_1.raw").absolute()
+        script = Path(self.tmp.name) / "slow_writer.py"
+        script.write_text(textwrap.dedent(SLOW_WRITER))
+        binary_start = find_binary_start(source, "utf_16_le")
+        spice_exe = [sys.executable, str(script), str(source), str(binary_start), "28"]
+        return type("SlowSimulator", (LTspiceCustom,), {"spice_exe": spice_exe})
+
+    def test_raw_monitor_stops_simulation(self):
+        """A raw monitor returning True stops the simulation while the RAW is written."""
+        chunks = []
+
+        def monitor(chunk):
+            chunks.append(chunk)
+            return sum(len(chunk["time"]) for chunk in chunks) >= 50
+
+        runner = SimRunner(simulator=self.slow_simulator(), output_folder=self.tmp.name)
+        start = time.monotonic()
+        task = runner.run(self.netlist, raw_monitor=monitor, monitor_interval=0.05)
+        # A stopped simulation counts as failed
+        self.assertFalse(runner.wait_completion(timeout=30))
+        self.assertLess(time.monotonic() - start, 15)
+        self.assertTrue(task.stopped_early)
+        self.assertNotEqual(task.retcode, 0)
+        self.assertEqual(runner.failSim, 1)
+        self.assertListEqual(
+            list(chunks[0]), ["time", "V(in)", "V(out)", "I(C1)", "I(R1)", "I(Vin)"]
+        )
+
+    def fake_simulator(self, **kwargs):
+        return FakeSimulator.create(test_dir + "TRAN_1.raw", test_dir + "TRAN_1.log", **kwargs)
+
+    def test_fake_simulator(self):
+        """SimRunner runs the fake simulations, some of which fail."""
+        simulator = self.fake_simulator(latency=(0.0, 0.02), failure_rate=0.5, seed=3)
+        runner = SimRunner(simulator=simulator, parallel_sims=3, output_folder=self.tmp.name)
+        tasks = [runner.run(self.netlist) for _ in range(8)]
+        runner.wait_completion(timeout=30)
+        self.assertEqual(len(simulator.records), 8)
+        failed = [task for task in tasks if task.retcode != 0]
+        self.assertEqual(runner.failSim, len(failed))
+        self.assertEqual(runner.okSim + runner.failSim, 8)
+        self.assertTrue(0 < len(failed) < 8)
+        for task in tasks:
+            if task.retcode == 0:
+                raw = RawRead(task.raw_file)
+                self.assertEqual(raw.get_trace_names()[0], "time")
+            else:
+                self.assertEqual(task.log_file.suffix, ".fail")
+                self.assertFalse(task.netlist_file.with_suffix(".raw").exists())
+        # Each configuration is independent
+        self.assertListEqual(self.fake_simulator().records, [])
+
+    def test_fake_simulator_options(self):
+        simulator = self.fake_simulator(output_points=1000)
+        self.assertEqual(simulator.run(self.netlist), 0)
+        self.assertEqual(RawRead(self.netlist.with_suffix(".raw")).nPoints, 1000)
+        with self.assertRaises(subprocess.TimeoutExpired):
+            self.fake_simulator(latency=1.0).run(self.netlist, timeout=0.01)
+        # A running simulation is stopped
+        simulator = self.fake_simulator(latency=30.0)
+        threading.Timer(0.1, simulator.stop, args=(self.netlist,)).start()
+        start = time.monotonic()
+        self.assertEqual(simulator.run(self.netlist), STOPPED_RETCODE)
+        self.assertLess(time.monotonic() - start, 10)
+        self.assertFalse(simulator.stop(self.netlist))
+        with self.assertRaises(FileNotFoundError):
+            FakeSimulator.create(test_dir + "missing.raw", test_dir + "TRAN_1.log")
+
+    def test_parallelism_controller(self):
+        samples = [
+            SystemLoad(cpu=0.2, load=0.5, free_memory=0.5),  # Idle, grows if saturated
+            SystemLoad(cpu=0.2, load=0.5, free_memory=0.5),
+            SystemLoad(cpu=1.0, load=2.0, free_memory=0.5),  # Overloaded
+            SystemLoad(cpu=0.5, load=0.5, free_memory=0.05),  # Out of memory
+            SystemLoad(cpu=0.5, load=0.5, free_memory=0.05),
+        ]
+        controller = ParallelismController(
+            initial=4, maximum=5, interval=0, probe=lambda: samples.pop(0)
+        )
+        with self.assertLogs("kupicelib.SimRunner", "INFO") as logs:
+            self.assertEqual(controller.update(active=4), 5)
+            self.assertEqual(controller.update(active=5), 5)  # Maximum
+            self.assertEqual(controller.update(active=5), 4)
+            self.assertEqual(controller.update(active=2), 1)  # Below the running ones
+            self.assertEqual(controller.update(active=1), 1)  # Minimum
+        self.assertEqual(len(logs.output), 3)
+        self.assertIn("Parallel simulations 4 -> 5 (idle CPU", logs.output[0])
+        # Not sampled again before the interval
+        controller = ParallelismController(
+            initial=2, maximum=4, interval=60, probe=lambda: samples[0]
+        )
+        samples.append(SystemLoad(cpu=0.0, load=0.0, free_memory=1.0))
+        self.assertEqual(controller.update(active=2), 3)
+        self.assertEqual(controller.update(active=3), 3)
+
+    def test_parallelism_controller_threads(self):
+        """The threads updating the limit during an interval share a single sample."""
+        threads_count = 8
+        barrier = threading.Barrier(threads_count, timeout=0.2)
+        probes = []
+
+        class Now(float):
+            """Time whose comparison to the next sample waits for the other threads."""
+
+            def __lt__(self, other):
+                # Broken when the other threads are waiting for the lock
+                with contextlib.suppress(threading.BrokenBarrierError):
+                    barrier.wait()
+                return float(self) < other
+
+        def probe():
+            probes.append(threading.get_ident())
+            return SystemLoad(cpu=0.2, load=0.5, free_memory=0.5)
+
+        controller = ParallelismController(initial=2, maximum=8, interval=60, probe=probe)
+        monotonic = time.monotonic
+        threads = [
+            threading.Thread(target=controller.update, kwargs={"active": 2})
+            for _ in range(threads_count)
+        ]
+        with mock.patch("kuPyLTSpice.sim.parallelism.time.monotonic", lambda: Now(monotonic())):
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(len(probes), 1)
+        self.assertEqual(controller.limit, 3)
+
+    def test_auto_parallel_sims(self):
+        runner = SimRunner(
+            simulator=self.fake_simulator(latency=0.01),
+            parallel_sims="auto",
+            output_folder=self.tmp.name,
+        )
+        self.assertEqual(runner.parallel_sims, os.cpu_count())
+        self.assertIsNotNone(runner.parallelism)
+        for _ in range(5):
+            runner.run(self.netlist)
+        self.assertTrue(runner.wait_completion(timeout=30))
+        self.assertEqual(runner.okSim, 5)
+        # Rejected before the output folder is created
+        output_folder = Path(self.tmp.name) / "many"
+        with self.assertRaises(ValueError):
+            SimRunner(
+                simulator=self.fake_simulator(),
+                parallel_sims="many",
+                output_folder=str(output_folder),
+            )
+        self.assertFalse(output_folder.exists())
+
+    def test_submit_order(self):
+        """The queued simulations start by priority, then longest first."""
+        simulator = self.fake_simulator(latency=0.2)
+        runner = SimRunner(simulator=simulator, parallel_sims=1, output_folder=self.tmp.name)
+        first = runner.submit(self.netlist, run_filename="first.net")
+        for name, priority, cost in (("a", 0, 1.0), ("b", 0, 5.0), ("c", 0, 3.0), ("d", 1, 0.5)):
+            runner.submit(self.netlist, priority=priority, cost=cost, run_filename=f"{name}.net")
+        state = runner.queue_state()
+        self.assertListEqual(
+            [job.netlist_file.name for job in state.queued], ["d.net", "b.net", "c.net", "a.net"]
+        )
+        self.assertEqual(state.queued_cost, 9.5)
+        self.assertListEqual([job.runno for job in state.running], [first.runno])
+        self.assertTrue(runner.wait_completion(timeout=30))
+        self.assertListEqual(
+            [run.netlist_file.name for run in simulator.records],
+            ["first.net", "d.net", "b.net", "c.net", "a.net"],
+        )
+        self.assertEqual(runner.okSim, 5)
+        self.assertEqual(len(runner.job_queue), 0)
+        # The duration of the netlist was learned, and is used for the new netlists
+        learned = runner.runtime_estimator.estimate(self.netlist)
+        self.assertGreaterEqual(learned, 0.2)
+        new_netlist = Path(self.tmp.name) / "new.net"
+        self.assertEqual(runner.runtime_estimator.estimate(new_netlist), learned)
+        self.assertEqual(runner.submit(self.netlist).cost, learned)
+        runner.wait_completion(timeout=30)
+
+    def test_clear_queue(self):
+        runner = SimRunner(
+            simulator=self.fake_simulator(latency=30.0),
+            parallel_sims=1,
+            output_folder=self.tmp.name,
+        )
+        self.assertIsNone(runner.runtime_estimator.estimate(self.netlist))
+        running = runner.submit(self.netlist)
+        queued = [runner.submit(self.netlist) for _ in range(2)]
+        self.assertListEqual(runner.clear_queue(), queued)
+        self.assertEqual(runner.queue_state().queued, [])
+        deadline = time.monotonic() + 10
+        while not runner.simulator.stop(running.netlist_file) and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertFalse(runner.wait_completion(timeout=30))
+        self.assertEqual(runner.failSim, 1)
+        self.assertFalse(any(task.is_alive() or task.start_time for task in queued))
+
+
+if __name__ == "__main__":
+    unittest.main()